@@ -4,8 +4,10 @@ from sqlalchemy import engine_from_config, pool
 
 from alembic import context
 from database.db import Base
+from database.shards import shard_urls
 from models.log import SecretLog
 from models.secret import Secret
+from models.secret_chunk import SecretChunk
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -58,17 +60,28 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-
-        with context.begin_transaction():
-            context.run_migrations()
+    # Шард 0 - база из alembic.ini, остальные шарды из DB_SHARDS.
+    # Один шард: alembic -x shard=2 upgrade head
+    urls = {**shard_urls("postgresql"), 0: config.get_main_option("sqlalchemy.url")}
+    shard = context.get_x_argument(as_dictionary=True).get("shard")
+    if shard is not None:
+        urls = {int(shard): urls[int(shard)]}
+
+    for url in urls.values():
+        connectable = engine_from_config(
+            {
+                **config.get_section(config.config_ini_section, {}),
+                "sqlalchemy.url": url,
+            },
+            prefix="sqlalchemy.",
+            poolclass=pool.NullPool,
+        )
+
+        with connectable.connect() as connection:
+            context.configure(connection=connection, target_metadata=target_metadata)
+
+            with context.begin_transaction():
+                context.run_migrations()
 
 
 if context.is_offline_mode():
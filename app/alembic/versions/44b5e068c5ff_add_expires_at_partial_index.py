@@ -0,0 +1,35 @@
+"""Add partial index on secrets.expires_at
+
+Revision ID: 44b5e068c5ff
+Revises: 12b41b0e5b5b
+Create Date: 2026-10-18 10:12:41.207315
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "44b5e068c5ff"
+down_revision: Union[str, None] = "12b41b0e5b5b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_secrets_expires_at",
+        "secrets",
+        ["expires_at"],
+        unique=False,
+        postgresql_where=sa.text("expires_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_secrets_expires_at", table_name="secrets")
@@ -0,0 +1,48 @@
+"""Store secret_key as native uuid
+
+Revision ID: a3c9e1f07b52
+Revises: e5a1c7b93f24
+Create Date: 2026-10-18 18:12:40.551907
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c9e1f07b52"
+down_revision: Union[str, None] = "e5a1c7b93f24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Номер шарда ("3-<uuid>") хранится только в ключе API, в строке - сам UUID.
+    # ALTER TYPE переписывает таблицу и индекс под ACCESS EXCLUSIVE
+    op.alter_column(
+        "secrets",
+        "secret_key",
+        existing_type=sa.String(length=360),
+        type_=sa.Uuid(),
+        postgresql_using="regexp_replace(secret_key, '^[0-9]{1,7}-', '')::uuid",
+        existing_comment="Уникальный ключ доступа к секрету",
+        existing_nullable=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Ключи вернутся без номера шарда, то есть будут верны только для шарда 0
+    op.alter_column(
+        "secrets",
+        "secret_key",
+        existing_type=sa.Uuid(),
+        type_=sa.String(length=360),
+        postgresql_using="secret_key::text",
+        existing_comment="Уникальный ключ доступа к секрету",
+        existing_nullable=False,
+    )
@@ -0,0 +1,65 @@
+"""Store ciphertext as bytea
+
+Revision ID: b7e2d9c41a03
+Revises: 44b5e068c5ff
+Create Date: 2026-10-18 11:04:17.583920
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2d9c41a03"
+down_revision: Union[str, None] = "44b5e068c5ff"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Токены Fernet - ASCII, поэтому существующие записи переносятся байт в байт
+    op.alter_column(
+        "secrets",
+        "secret",
+        existing_type=sa.Text(),
+        type_=sa.LargeBinary(),
+        postgresql_using="convert_to(secret, 'UTF8')",
+        existing_comment="Конфиденциальные данные, хранимые в секрете",
+        existing_nullable=False,
+    )
+    op.alter_column(
+        "secrets",
+        "passphrase",
+        existing_type=sa.String(length=255),
+        type_=sa.LargeBinary(),
+        postgresql_using="convert_to(passphrase, 'UTF8')",
+        existing_comment="Опциональная фраза-пароль для дополнительной защиты",
+        existing_nullable=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Возможен, только если в таблице остались лишь записи Fernet
+    op.alter_column(
+        "secrets",
+        "passphrase",
+        existing_type=sa.LargeBinary(),
+        type_=sa.String(length=255),
+        postgresql_using="convert_from(passphrase, 'UTF8')",
+        existing_comment="Опциональная фраза-пароль для дополнительной защиты",
+        existing_nullable=True,
+    )
+    op.alter_column(
+        "secrets",
+        "secret",
+        existing_type=sa.LargeBinary(),
+        type_=sa.Text(),
+        postgresql_using="convert_from(secret, 'UTF8')",
+        existing_comment="Конфиденциальные данные, хранимые в секрете",
+        existing_nullable=False,
+    )
@@ -0,0 +1,114 @@
+"""Partition secret_logs by timestamp
+
+Revision ID: b84d2f6a1c07
+Revises: a3c9e1f07b52
+Create Date: 2026-10-18 19:03:27.184420
+
+"""
+
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+from database.partitions import ensure_partitions, next_period, period_start
+
+# revision identifiers, used by Alembic.
+revision: str = "b84d2f6a1c07"
+down_revision: Union[str, None] = "a3c9e1f07b52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Прежняя таблица становится секцией за всё время до конца текущего
+    # периода и удаляется по сроку хранения целиком, как и остальные секции
+    op.execute("ALTER TABLE secret_logs RENAME TO secret_logs_legacy")
+    op.drop_index("ix_secret_logs_id", table_name="secret_logs_legacy")
+    op.drop_constraint("secret_logs_pkey", "secret_logs_legacy", type_="primary")
+
+    op.create_table(
+        "secret_logs",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('secret_logs_id_seq'::regclass)"),
+            nullable=False,
+            comment="Уникальный идентификатор записи лога",
+        ),
+        sa.Column(
+            "secret_id", sa.Integer(), nullable=False, comment="ID созданного секрета"
+        ),
+        sa.Column(
+            "action",
+            sa.String(length=50),
+            nullable=False,
+            comment="Тип действия (создание, чтение, удаление)",
+        ),
+        sa.Column(
+            "ip_address",
+            sa.String(length=50),
+            nullable=True,
+            comment="IP-адрес клиента",
+        ),
+        sa.Column(
+            "user_agent",
+            sa.String(length=255),
+            nullable=True,
+            comment="User-Agent клиента",
+        ),
+        sa.Column(
+            "ttl_seconds",
+            sa.Integer(),
+            nullable=True,
+            comment="Время жизни секрета в секундах",
+        ),
+        sa.Column(
+            "timestamp",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+            comment="Время выполнения действия",
+        ),
+        sa.Column(
+            "additional_info",
+            sa.Text(),
+            nullable=True,
+            comment="Дополнительная информация",
+        ),
+        sa.PrimaryKeyConstraint("id", "timestamp"),
+        postgresql_partition_by="RANGE (timestamp)",
+    )
+    op.execute("ALTER SEQUENCE secret_logs_id_seq OWNED BY secret_logs.id")
+
+    # Проверка границы читает всю прежнюю таблицу один раз
+    legacy_end = next_period(period_start(datetime.now(timezone.utc)))
+    op.execute(
+        "ALTER TABLE secret_logs ATTACH PARTITION secret_logs_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{legacy_end.isoformat()}')"
+    )
+    op.create_index(
+        "ix_secret_logs_secret_id_timestamp",
+        "secret_logs",
+        ["secret_id", "timestamp"],
+        unique=False,
+    )
+    ensure_partitions(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Отсоединённые по сроку хранения секции в обычную таблицу не попадают
+    op.execute("ALTER TABLE secret_logs RENAME TO secret_logs_partitioned")
+    op.execute(
+        "CREATE TABLE secret_logs "
+        "(LIKE secret_logs_partitioned INCLUDING DEFAULTS INCLUDING COMMENTS)"
+    )
+    op.execute("INSERT INTO secret_logs SELECT * FROM secret_logs_partitioned")
+    op.execute("ALTER SEQUENCE secret_logs_id_seq OWNED BY secret_logs.id")
+    op.drop_table("secret_logs_partitioned")
+
+    op.create_primary_key("secret_logs_pkey", "secret_logs", ["id"])
+    op.create_index(op.f("ix_secret_logs_id"), "secret_logs", ["id"], unique=False)
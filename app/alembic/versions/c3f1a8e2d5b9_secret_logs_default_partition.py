@@ -0,0 +1,31 @@
+"""Add DEFAULT partition to secret_logs
+
+Revision ID: c3f1a8e2d5b9
+Revises: b84d2f6a1c07
+Create Date: 2026-10-18 22:41:09.513276
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+from database.partitions import DEFAULT_PARTITION, LOG_TABLE
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f1a8e2d5b9"
+down_revision: Union[str, None] = "b84d2f6a1c07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Без секции DEFAULT вставка в журнал падает, когда созданные заранее
+    # секции закончились, а задача maintain_log_partitions не запускалась
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {LOG_TABLE} DEFAULT")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Записи из секции DEFAULT без своей секции теряются
+    op.execute(f"DROP TABLE {DEFAULT_PARTITION}")
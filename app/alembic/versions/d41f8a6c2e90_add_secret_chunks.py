@@ -0,0 +1,58 @@
+"""Add secret chunks for streamed secrets
+
+Revision ID: d41f8a6c2e90
+Revises: b7e2d9c41a03
+Create Date: 2026-10-18 13:22:41.907316
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d41f8a6c2e90"
+down_revision: Union[str, None] = "b7e2d9c41a03"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "secrets",
+        sa.Column(
+            "chunked",
+            sa.Boolean(),
+            server_default=sa.false(),
+            nullable=False,
+            comment="Содержимое хранится фрагментами в secret_chunks",
+        ),
+    )
+    op.create_table(
+        "secret_chunks",
+        sa.Column(
+            "secret_id",
+            sa.Integer(),
+            nullable=False,
+            comment="ID секрета, которому принадлежит фрагмент",
+        ),
+        sa.Column(
+            "seq", sa.Integer(), nullable=False, comment="Порядковый номер фрагмента"
+        ),
+        sa.Column(
+            "data", sa.LargeBinary(), nullable=False, comment="Зашифрованный фрагмент"
+        ),
+        sa.ForeignKeyConstraint(["secret_id"], ["secrets.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("secret_id", "seq"),
+    )
+    # Шифротекст не сжимается, поэтому TOAST хранит его без попытки сжатия
+    op.execute("ALTER TABLE secret_chunks ALTER COLUMN data SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("secret_chunks")
+    op.drop_column("secrets", "chunked")
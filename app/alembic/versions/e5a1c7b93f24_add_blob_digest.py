@@ -0,0 +1,45 @@
+"""Add blob digest for payloads stored on disk
+
+Revision ID: e5a1c7b93f24
+Revises: d41f8a6c2e90
+Create Date: 2026-10-18 15:47:09.318254
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a1c7b93f24"
+down_revision: Union[str, None] = "d41f8a6c2e90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "secrets",
+        sa.Column(
+            "blob_digest",
+            sa.String(length=64),
+            nullable=True,
+            comment="SHA-256 шифротекста, вынесенного в файловое хранилище",
+        ),
+    )
+    op.create_index(
+        "ix_secrets_blob_digest",
+        "secrets",
+        ["blob_digest"],
+        unique=False,
+        postgresql_where=sa.text("blob_digest IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_secrets_blob_digest", table_name="secrets")
+    op.drop_column("secrets", "blob_digest")
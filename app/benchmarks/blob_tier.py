@@ -0,0 +1,106 @@
+"""
+Бенчмарк файлового хранилища крупных шифротекстов.
+
+Заполняет две временные таблицы одинаковыми случайными данными: в одной
+шифротекст лежит в колонке bytea, в другой - в BlobStore, а в строке только
+digest. Сравнивает размер таблиц (вместе с TOAST и индексами) и задержку
+чтения одной записи по id.
+
+    python -m benchmarks.blob_tier --rows 2000 --sizes 65536 1048576
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.stats import summary
+from services.blob_store import BlobStore
+from services.celery_service import DATABASE_URL
+
+SCHEMA_SQL = (
+    text("CREATE TEMP TABLE bench_inline (id serial PRIMARY KEY, secret bytea)"),
+    text("CREATE TEMP TABLE bench_blob (id serial PRIMARY KEY, blob_digest text)"),
+)
+
+
+def latency(read, ids: list[int]) -> dict:
+    samples = []
+    for row_id in ids:
+        started = time.perf_counter()
+        read(row_id)
+        samples.append((time.perf_counter() - started) * 1000)
+
+    return summary(samples)
+
+
+def run(conn, rows: int, size: int, reads: int) -> dict:
+    conn.execute(text("TRUNCATE bench_inline, bench_blob RESTART IDENTITY"))
+
+    for _ in range(rows):
+        payload = os.urandom(size)
+        conn.execute(
+            text("INSERT INTO bench_inline (secret) VALUES (:secret)"),
+            {"secret": payload},
+        )
+        conn.execute(
+            text("INSERT INTO bench_blob (blob_digest) VALUES (:digest)"),
+            {"digest": BlobStore.write(payload)},
+        )
+    conn.execute(text("ANALYZE bench_inline"))
+    conn.execute(text("ANALYZE bench_blob"))
+
+    sizes = conn.execute(text("""
+        SELECT pg_total_relation_size('bench_inline') AS inline,
+               pg_total_relation_size('bench_blob') AS blob
+        """)).one()
+
+    ids = [random.randint(1, rows) for _ in range(reads)]
+
+    def read_inline(row_id: int):
+        conn.execute(
+            text("SELECT secret FROM bench_inline WHERE id = :id"), {"id": row_id}
+        ).scalar_one()
+
+    def read_blob(row_id: int):
+        digest = conn.execute(
+            text("SELECT blob_digest FROM bench_blob WHERE id = :id"), {"id": row_id}
+        ).scalar_one()
+        BlobStore.read(digest)
+
+    return {
+        "rows": rows,
+        "payload_bytes": size,
+        "inline": {"table_bytes": sizes.inline, **latency(read_inline, ids)},
+        "blob": {"table_bytes": sizes.blob, **latency(read_blob, ids)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[65536, 1048576])
+    parser.add_argument("--reads", type=int, default=1000)
+    args = parser.parse_args()
+
+    BlobStore.root = tempfile.mkdtemp(prefix="bench-blobs-")
+    engine = create_engine(DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            for statement in SCHEMA_SQL:
+                conn.execute(statement)
+            report = [run(conn, args.rows, size, args.reads) for size in args.sizes]
+    finally:
+        shutil.rmtree(BlobStore.root, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Бенчмарк форматов записи кеша секретов в Redis: JSON против msgpack.
+
+Для записей с шифротекстом разных размеров (в том виде, в каком их кладёт
+PostgresSecretStore.create) считает размер записи в байтах и время
+кодирования и декодирования одной записи.
+
+    python -m benchmarks.cache_codec --sizes 64 1024 65536
+"""
+
+import argparse
+import json
+import os
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from services.redis_service import CACHE_CODECS, msgpack
+
+
+def cache_entry(size: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "id": 123456,
+        # Шифротекст AES-GCM: случайные байты, JSON кодирует их в base64
+        "secret": os.urandom(size),
+        "blob_digest": None,
+        "passphrase": os.urandom(60),
+        "created_at": now.isoformat(),
+        "expires_at": (now + timedelta(hours=1)).isoformat(),
+        "ttl_seconds": 3600,
+    }
+
+
+def per_call_us(func, repeat: int) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return round(min(timer.repeat(repeat, number)) / number * 1e6, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 1024, 65536])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = {
+        name: codec
+        for name, codec in CACHE_CODECS.items()
+        if name != "msgpack" or msgpack is not None
+    }
+    report = []
+
+    for size in args.sizes:
+        entry = cache_entry(size)
+        for name, codec in codecs.items():
+            encoded = codec.dumps(entry)
+            assert codec.loads(encoded) == entry
+            report.append(
+                {
+                    "codec": name,
+                    "secret_bytes": size,
+                    "entry_bytes": len(encoded),
+                    "encode_us": per_call_us(lambda: codec.dumps(entry), args.repeat),
+                    "decode_us": per_call_us(lambda: codec.loads(encoded), args.repeat),
+                }
+            )
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
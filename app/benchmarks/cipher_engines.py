@@ -0,0 +1,67 @@
+"""
+Бенчмарк движков шифрования: Fernet против конвертного AES-GCM.
+
+Для каждого размера секрета замеряет пропускную способность шифрования и
+расшифровки и число байт, которое секрет занимает в колонке secrets.secret.
+
+    python -m benchmarks.cipher_engines --sizes 256 4096 65536 1048576
+"""
+
+import argparse
+import json
+import os
+import time
+
+from services.encryption_service import EncryptionService
+
+
+def throughput(func, arg, size: int, min_seconds: float) -> float:
+    """МБ/с для func(arg) при повторении не меньше min_seconds"""
+    iterations = 0
+    started = time.perf_counter()
+    while True:
+        func(arg)
+        iterations += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return round(size * iterations / elapsed / 1024 / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[256, 4096, 65536, 1048576]
+    )
+    parser.add_argument("--min-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    engines = {
+        "fernet": EncryptionService._fernet,
+        "aesgcm": EncryptionService._aesgcm,
+    }
+    report = []
+
+    for size in args.sizes:
+        data = os.urandom(size // 2).hex().encode()
+        for name, cipher in engines.items():
+            stored = cipher.encrypt(data)
+            report.append(
+                {
+                    "engine": name,
+                    "size": size,
+                    "stored_bytes": len(stored),
+                    "overhead_bytes": len(stored) - size,
+                    "encrypt_mb_s": throughput(
+                        cipher.encrypt, data, size, args.min_seconds
+                    ),
+                    "decrypt_mb_s": throughput(
+                        cipher.decrypt, stored, size, args.min_seconds
+                    ),
+                }
+            )
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Бенчмарк параллельной очистки просроченных секретов.
+
+Заполняет таблицу secrets просроченными записями и замеряет время их удаления
+для разного числа процессов, вызывающих задачу очистки напрямую (без брокера):
+drain_expired_secrets через индекс истечения в Redis (--mode index) или
+reconcile_expired_secrets полным проходом по таблице (--mode scan).
+Проверяет, что на каждый секрет записан ровно один лог auto_delete.
+
+    python -m benchmarks.cleanup_drain --rows 1000000 --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+
+from sqlalchemy import create_engine, text
+
+from services.celery_service import (DATABASE_URL, drain_expired_secrets,
+                                     rebuild_expiry_index,
+                                     reconcile_expired_secrets)
+
+TASKS = {"index": drain_expired_secrets, "scan": reconcile_expired_secrets}
+
+SEED_SQL = text("""
+    INSERT INTO secrets (secret, secret_key, ttl_seconds, created_at, expires_at)
+    SELECT 'bench', gen_random_uuid(), 60, now() - interval '1 hour', now() - interval '1 minute'
+    FROM generate_series(1, :rows) AS g
+    """)
+
+AUDIT_SQL = text("""
+    SELECT count(*) AS total, count(DISTINCT secret_id) AS distinct_secrets
+    FROM secret_logs
+    WHERE action = 'auto_delete' AND id > :last_log_id
+    """)
+
+
+def seed(engine, rows: int) -> int:
+    """Создаёт просроченные секреты и возвращает последний id журнала до очистки"""
+    with engine.begin() as conn:
+        conn.execute(SEED_SQL, {"rows": rows})
+        return conn.execute(
+            text("SELECT coalesce(max(id), 0) FROM secret_logs")
+        ).scalar_one()
+
+
+def drain(task, workers: int) -> float:
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=task) for _ in range(workers)]
+
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--mode", choices=TASKS, default="index")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    report = []
+
+    for workers in args.workers:
+        last_log_id = seed(engine, args.rows)
+        if args.mode == "index":
+            rebuild_expiry_index()
+        elapsed = drain(TASKS[args.mode], workers)
+
+        with engine.connect() as conn:
+            audit = conn.execute(AUDIT_SQL, {"last_log_id": last_log_id}).one()
+
+        report.append(
+            {
+                "mode": args.mode,
+                "workers": workers,
+                "rows": args.rows,
+                "seconds": round(elapsed, 3),
+                "rows_per_second": round(args.rows / elapsed, 1),
+                "auto_delete_logs": audit.total,
+                "duplicate_logs": audit.total - audit.distinct_secrets,
+            }
+        )
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
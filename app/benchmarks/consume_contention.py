@@ -0,0 +1,88 @@
+"""
+Бенчмарк конкурентного чтения одного секрета.
+
+Создаёт секрет и одновременно отправляет N запросов GET /secrets/{secret_key}.
+Проверяет, что секрет получил ровно один читатель, и считает p50/p99 задержки.
+
+    python -m benchmarks.consume_contention --url http://localhost:8000 --readers 64
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from benchmarks.stats import summary
+
+
+async def read_secret(client: httpx.AsyncClient, secret_key: str, start: asyncio.Event):
+    await start.wait()
+    started = time.perf_counter()
+    response = await client.get(f"/secrets/{secret_key}")
+    return response.status_code, (time.perf_counter() - started) * 1000
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.readers)
+    latencies = []
+    violations = 0
+
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=args.timeout
+    ) as client:
+        for _ in range(args.rounds):
+            response = await client.post(
+                "/secrets/", json={"secret": "x" * args.size, "ttl_seconds": 3600}
+            )
+            response.raise_for_status()
+            secret_key = response.json()["secret_key"]
+
+            start = asyncio.Event()
+            readers = [
+                asyncio.create_task(read_secret(client, secret_key, start))
+                for _ in range(args.readers)
+            ]
+            start.set()
+            results = await asyncio.gather(*readers)
+
+            winners = sum(1 for status_code, _ in results if status_code == 200)
+            if winners != 1:
+                violations += 1
+            latencies.extend(latency for _, latency in results)
+
+    return {
+        "readers": args.readers,
+        "rounds": args.rounds,
+        "requests": len(latencies),
+        **summary(latencies),
+        "max_ms": round(max(latencies), 3),
+        "rounds_without_single_winner": violations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--size", type=int, default=256, help="Размер секрета в байтах")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--max-p99-ms", type=float, default=None, help="Порог p99 для проверки"
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+    failed = report["rounds_without_single_winner"] > 0
+    if args.max_p99_ms is not None and report["p99_ms"] > args.max_p99_ms:
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Бенчмарк задержки event loop при одновременном шифровании крупных секретов.
+
+Параллельно с N задачами шифрования работает heartbeat-задача, которая
+засыпает на 1 мс и замеряет, насколько позже она просыпается. Сравнивается
+синхронный EncryptionService.encrypt и aencrypt с выносом в пул потоков.
+
+    python -m benchmarks.encryption_event_loop --size-mb 8 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from services.encryption_service import EncryptionService
+
+HEARTBEAT_INTERVAL = 0.001
+
+
+async def heartbeat(lags: list[float], stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append((time.perf_counter() - started - HEARTBEAT_INTERVAL) * 1000)
+
+
+async def encrypt_sync(payload: str):
+    EncryptionService.encrypt(payload)
+
+
+async def encrypt_offloaded(payload: str):
+    await EncryptionService.aencrypt(payload)
+
+
+async def run(mode, payload: str, concurrency: int) -> dict:
+    lags = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(mode(payload) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+    lags.sort()
+
+    return {
+        "mode": mode.__name__,
+        "seconds": round(elapsed, 3),
+        "loop_lag_p50_ms": round(statistics.median(lags), 3),
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 3),
+        "loop_lag_max_ms": round(lags[-1], 3),
+    }
+
+
+async def main(args):
+    payload = "x" * (args.size_mb * 1024 * 1024)
+    report = [
+        await run(mode, payload, args.concurrency)
+        for mode in (encrypt_sync, encrypt_offloaded)
+    ]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,287 @@
+"""
+Нагрузочный тест API /secrets.
+
+Отправляет смесь запросов создания, чтения и удаления секретов заданных
+размеров и TTL с заданной конкурентностью и выводит пропускную способность
+и p50/p95/p99 задержки по каждой операции в JSON. Приложение запускается
+в этом же процессе через ASGI (без сети), как отдельный uvicorn (--serve)
+или берётся уже запущенное (--url).
+
+Без Postgres и Redis: --store memory держит секреты в памяти процесса,
+--fakeredis подменяет клиент Redis на fakeredis (--store redis --fakeredis
+работает без сети, скрипты Lua выполняет lupa). Подмены живут в одном
+процессе, поэтому с ними --workers должен быть 1.
+
+    python -m benchmarks.load_test --store memory --requests 20000
+    python -m benchmarks.load_test --serve --workers 4 --mix create=1,read=1
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 128
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import httpx
+
+from benchmarks.stats import summary
+
+OPERATIONS = ("create", "read", "delete")
+
+
+def operation_summary(latencies: list[float], errors: int, elapsed: float) -> dict:
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        **summary(latencies, elapsed, quantiles=(95, 99)),
+    }
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """create=2,read=1,delete=1 - веса операций"""
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def parse_ttl(value: str) -> int | None:
+    return None if value == "none" else int(value)
+
+
+def use_fakeredis():
+    """Подменяет клиент Redis до импорта приложения"""
+    import fakeredis
+    import redis.asyncio
+
+    redis.asyncio.Redis = fakeredis.FakeAsyncRedis
+
+
+def serve(port: int, workers: int, fakeredis: bool):
+    """Точка входа дочернего процесса uvicorn"""
+    import uvicorn
+
+    if fakeredis:
+        use_fakeredis()
+    uvicorn.run(
+        "main:app", port=port, workers=workers, access_log=False, log_level="warning"
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def in_process(args):
+    """Приложение в этом процессе через ASGI-транспорт"""
+    if args.fakeredis:
+        use_fakeredis()
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load-test", timeout=args.timeout
+        ) as client:
+            yield client
+
+
+@asynccontextmanager
+async def http_client(args, url: str):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=url, limits=limits, timeout=args.timeout
+    ) as client:
+        yield client
+
+
+@asynccontextmanager
+async def uvicorn_server(args):
+    """Отдельный процесс uvicorn на свободном порту"""
+    port = free_port()
+    code = (
+        "from benchmarks.load_test import serve; "
+        f"serve({port}, {args.workers}, {args.fakeredis})"
+    )
+    # Журнал сервера уходит в stderr, в stdout остаётся только отчёт
+    server = subprocess.Popen([sys.executable, "-c", code], stdout=sys.stderr)
+    try:
+        async with http_client(args, f"http://127.0.0.1:{port}") as client:
+            deadline = time.monotonic() + args.startup_timeout
+            while True:
+                try:
+                    (await client.get("/health/")).raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise RuntimeError("uvicorn did not start")
+                    await asyncio.sleep(0.2)
+            yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+
+class LoadTest:
+    """Смесь операций над общим пулом созданных, но ещё не прочитанных ключей"""
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.operations = list(args.mix)
+        self.weights = list(args.mix.values())
+        self.payloads = {size: "x" * size for size in args.sizes}
+        self.keys = deque()
+        self.latencies = {operation: [] for operation in OPERATIONS}
+        self.errors = dict.fromkeys(OPERATIONS, 0)
+
+    async def create(self) -> bool:
+        body = {
+            "secret": self.payloads[random.choice(self.args.sizes)],
+            "ttl_seconds": random.choice(self.args.ttls),
+        }
+        response = await self.client.post("/secrets/", json=body)
+        if response.status_code != 201:
+            return False
+        self.keys.append(response.json()["secret_key"])
+        return True
+
+    async def read(self, secret_key: str) -> bool:
+        response = await self.client.get(f"/secrets/{secret_key}")
+        return response.status_code == 200
+
+    async def delete(self, secret_key: str) -> bool:
+        response = await self.client.delete(f"/secrets/{secret_key}")
+        return response.status_code == 200
+
+    async def request(self):
+        operation = random.choices(self.operations, self.weights)[0]
+        # Читать и удалять нечего - сначала создаётся секрет
+        if operation != "create" and not self.keys:
+            operation = "create"
+
+        started = time.perf_counter()
+        try:
+            if operation == "create":
+                ok = await self.create()
+            else:
+                ok = await getattr(self, operation)(self.keys.popleft())
+        except httpx.HTTPError:
+            ok = False
+
+        if ok:
+            self.latencies[operation].append((time.perf_counter() - started) * 1000)
+        else:
+            self.errors[operation] += 1
+
+    async def worker(self, remaining: list[int]):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            await self.request()
+
+    async def run(self) -> dict:
+        # Прогрев: соединения пулов, кеши подготовленных запросов
+        for _ in range(min(self.args.warmup, self.args.requests)):
+            await self.create()
+        self.latencies["create"].clear()
+
+        remaining = [self.args.requests]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(self.worker(remaining) for _ in range(self.args.concurrency))
+        )
+        elapsed = time.perf_counter() - started
+
+        total = sum(map(len, self.latencies.values()))
+        return {
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(total / elapsed, 1),
+            "operations": {
+                operation: operation_summary(latencies, self.errors[operation], elapsed)
+                for operation, latencies in self.latencies.items()
+            },
+        }
+
+
+async def run(args) -> dict:
+    if args.url:
+        target, client = args.url, http_client(args, args.url)
+    elif args.serve:
+        target, client = "uvicorn", uvicorn_server(args)
+    else:
+        target, client = "asgi", in_process(args)
+
+    async with client as connected:
+        result = await LoadTest(connected, args).run()
+
+    return {
+        "target": target,
+        "store": os.environ.get("SECRET_STORE", "postgres"),
+        "mix": args.mix,
+        "sizes": args.sizes,
+        "ttls": args.ttls,
+        "concurrency": args.concurrency,
+        **result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", help="Уже запущенное приложение")
+    parser.add_argument("--serve", action="store_true", help="Запустить uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="Процессы uvicorn")
+    parser.add_argument(
+        "--store",
+        choices=["postgres", "redis", "memory"],
+        help="SECRET_STORE приложения, по умолчанию из окружения",
+    )
+    parser.add_argument("--fakeredis", action="store_true")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix("create=1,read=1,delete=0.2")
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 1024])
+    parser.add_argument(
+        "--ttls", type=parse_ttl, nargs="+", default=[3600], help="Секунды или none"
+    )
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    if args.fakeredis and args.serve and args.workers > 1:
+        # У каждого процесса uvicorn была бы своя подмена Redis
+        parser.error("--fakeredis requires --workers 1")
+
+    if args.store:
+        os.environ["SECRET_STORE"] = args.store
+    # Журнал приложения не должен смешиваться с отчётом в stdout
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    random.seed(args.seed)
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Микробенчмарки горячих путей без сети и БД.
+
+Замеряет время одного вызова (лучшее из --repeat повторов timeit):
+шифрование и расшифровку EncryptionService для разных размеров,
+сериализацию записи кеша RedisService, проверку CreateSecret и построение
+и компиляцию запроса вставки секрета. С --compare сравнивает с сохранённой
+базой и завершается с кодом 1, если какой-то замер медленнее базы больше
+чем на --threshold. База зависит от машины, её пересохраняют (--save) на той
+машине, где выполняется сравнение; вместе с замерами сохраняются хост,
+процессор и версия Python, при расхождении сравнение выводит предупреждение.
+
+    python -m benchmarks.micro --save
+    python -m benchmarks.micro --compare --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+
+from models.secret import Secret
+from schemas import CreateSecret
+from services.encryption_service import EncryptionService
+from services.redis_service import _dumps, _loads
+
+BASELINE = Path(__file__).with_name("micro_baseline.json")
+
+SIZES = (64, 1024, 65536, 1048576)
+
+
+def cache_entry() -> dict:
+    """Запись кеша в том виде, в каком её кладёт PostgresSecretStore.create"""
+    now = datetime.now(timezone.utc)
+    return {
+        "id": 123456,
+        "secret": EncryptionService.encrypt("x" * 256),
+        "blob_digest": None,
+        "passphrase": EncryptionService.encrypt("passphrase"),
+        "created_at": now.isoformat(),
+        "expires_at": (now + timedelta(hours=1)).isoformat(),
+        "ttl_seconds": 3600,
+    }
+
+
+def insert_data() -> dict:
+    return {
+        "secret": os.urandom(256),
+        "blob_digest": None,
+        "passphrase": None,
+        "ttl_seconds": 3600,
+        "secret_key": uuid.uuid4(),
+        "expires_at": None,
+        "chunked": False,
+    }
+
+
+def cases() -> dict:
+    """Имя замера -> функция без аргументов"""
+    result = {}
+
+    for size in SIZES:
+        plaintext = os.urandom(size // 2).hex()
+        encrypted = EncryptionService.encrypt(plaintext)
+        result[f"encrypt_{size}"] = lambda p=plaintext: EncryptionService.encrypt(p)
+        result[f"decrypt_{size}"] = lambda e=encrypted: EncryptionService.decrypt(e)
+
+    entry = cache_entry()
+    dumped = _dumps(entry)
+    result["cache_dumps"] = lambda: _dumps(entry)
+    result["cache_loads"] = lambda: _loads(dumped)
+
+    body = {"secret": "x" * 256, "passphrase": "passphrase", "ttl_seconds": 3600}
+    raw_body = json.dumps(body).encode()
+    result["create_secret_validate"] = lambda: CreateSecret.model_validate(body)
+    result["create_secret_validate_json"] = lambda: CreateSecret.model_validate_json(
+        raw_body
+    )
+
+    # Прежний роутер строил и компилировал insert(...).values(**dict) на каждый
+    # запрос. Запрос из database.queries строится один раз, а скомпилированный
+    # берётся из кеша движка при conn.execute, без базы это не замерить
+    dialect = PGDialect_asyncpg()
+    data = insert_data()
+    result["sql_insert_values_build"] = lambda: insert(Secret).values(**data)
+    result["sql_insert_values_compile"] = lambda: (
+        insert(Secret).values(**data).compile(dialect=dialect)
+    )
+
+    return result
+
+
+def cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine() -> dict:
+    """Где сняты замеры: база с другой машины не годится для сравнения"""
+    return {
+        "host": platform.node(),
+        "cpu": cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def measure(func, repeat: int) -> float:
+    """Наносекунды на вызов, лучшее из repeat повторов"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> dict:
+    report = {}
+    for name, ns in results.items():
+        base = baseline.get(name)
+        if base is None:
+            report[name] = {"ns": ns, "baseline_ns": None}
+            continue
+
+        change = ns / base - 1
+        report[name] = {
+            "ns": ns,
+            "baseline_ns": base,
+            "change": round(change, 3),
+            "regression": change > threshold,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="Префиксы имён замеров")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="Сохранить как базу")
+    parser.add_argument("--compare", action="store_true", help="Сравнить с базой")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Допустимое замедление, доля"
+    )
+    args = parser.parse_args()
+
+    results = {
+        name: round(measure(func, args.repeat), 1)
+        for name, func in cases().items()
+        if not args.only or name.startswith(tuple(args.only))
+    }
+
+    if args.save:
+        baseline = {"machine": machine(), "results": results}
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+
+    if not args.compare:
+        print(json.dumps(results, indent=2))
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["machine"] != machine():
+        print(
+            "warning: baseline was saved on another machine, "
+            f"re-save it with --save: {json.dumps(baseline['machine'])}",
+            file=sys.stderr,
+        )
+
+    report = compare(results, baseline["results"], args.threshold)
+    regressions = [name for name, item in report.items() if item.get("regression")]
+    print(json.dumps({"results": report, "regressions": regressions}, indent=2))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Бенчмарк процессорного времени на запрос: ORM-сессия против Core-запросов.
+
+Прогоняет цикл создание -> чтение -> удаление секрета двумя способами:
+прежним (AsyncSession, insert(...).values(**data), загрузка объекта Secret,
+db.delete) и через заранее построенные запросы database.queries на
+AsyncConnection. Сравнивает process_time на запрос, то есть работу Python
+без ожидания Postgres, и общее время.
+
+    python -m benchmarks.orm_fast_path --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from sqlalchemy import insert, select
+
+from database.db import async_session_maker, engine
+from database.queries import (delete_secret_by_id, insert_secret,
+                              select_passphrase)
+from models.secret import Secret
+
+
+def secret_data() -> dict:
+    return {
+        "secret": os.urandom(128),
+        "blob_digest": None,
+        "passphrase": None,
+        "ttl_seconds": 3600,
+        "secret_key": uuid.uuid4(),
+        "expires_at": None,
+        "chunked": False,
+    }
+
+
+async def orm_cycle():
+    data = secret_data()
+    async with async_session_maker() as session:
+        await session.execute(insert(Secret).values(**data).returning(Secret))
+        await session.commit()
+
+        secret = await session.scalar(
+            select(Secret).where(Secret.secret_key == data["secret_key"])
+        )
+        await session.delete(secret)
+        await session.commit()
+
+
+async def core_cycle():
+    data = secret_data()
+    async with engine.connect() as conn:
+        await conn.execute(insert_secret, data)
+        await conn.commit()
+
+        result = await conn.execute(
+            select_passphrase, {"secret_key": data["secret_key"]}
+        )
+        secret = result.one()
+        await conn.execute(delete_secret_by_id, {"secret_id": secret.id})
+        await conn.commit()
+
+
+async def measure(cycle, requests: int) -> dict:
+    # Прогрев заполняет пул соединений и кеш компиляции
+    for _ in range(50):
+        await cycle()
+
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for _ in range(requests):
+        await cycle()
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+
+    # Каждый цикл - три запроса к API: создание, чтение и удаление
+    return {
+        "cpu_us_per_request": round(cpu / (requests * 3) * 1e6, 1),
+        "wall_us_per_request": round(wall / (requests * 3) * 1e6, 1),
+    }
+
+
+async def run(requests: int) -> dict:
+    report = {
+        "orm": await measure(orm_cycle, requests),
+        "core": await measure(core_cycle, requests),
+    }
+    report["cpu_saved_percent"] = round(
+        (1 - report["core"]["cpu_us_per_request"] / report["orm"]["cpu_us_per_request"])
+        * 100,
+        1,
+    )
+    await engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
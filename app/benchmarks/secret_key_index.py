@@ -0,0 +1,99 @@
+"""
+Бенчмарк индекса secret_key: varchar против uuid.
+
+Создаёт две нежурналируемые таблицы с N строками: ключ как varchar(360)
+с UUID в виде текста (прежняя схема) и как uuid (16 байт). На каждой один
+уникальный индекс. Сравнивает размер индекса и таблицы и задержку поиска
+строки по ключу (p50/p99 по отдельным запросам со случайными ключами).
+
+    python -m benchmarks.secret_key_index --rows 10000000 --lookups 20000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.stats import percentile
+from services.celery_service import DATABASE_URL
+
+SCHEMAS = {
+    "varchar": "secret_key varchar(360) NOT NULL",
+    "uuid": "secret_key uuid NOT NULL",
+}
+
+
+def prepare(conn, table: str, column: str, keys_sql: str, rows: int):
+    conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    conn.execute(text(f"CREATE UNLOGGED TABLE {table} (id bigint, {column})"))
+    conn.execute(
+        text(
+            f"INSERT INTO {table} SELECT g, {keys_sql} FROM generate_series(1, :rows) g"
+        ),
+        {"rows": rows},
+    )
+    conn.execute(text(f"CREATE UNIQUE INDEX {table}_key ON {table} (secret_key)"))
+    conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+
+def measure(engine, kind: str, args) -> dict:
+    table = f"bench_secret_key_{kind}"
+    keys_sql = "gen_random_uuid()" + ("::text" if kind == "varchar" else "")
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        prepare(conn, table, SCHEMAS[kind], keys_sql, args.rows)
+
+        sizes = conn.execute(
+            text(
+                f"SELECT pg_relation_size('{table}_key') AS index_bytes, "
+                f"pg_table_size('{table}') AS table_bytes"
+            )
+        ).one()
+        keys = (
+            conn.execute(
+                text(f"SELECT secret_key FROM {table} TABLESAMPLE SYSTEM (1) LIMIT :n"),
+                {"n": args.lookups},
+            )
+            .scalars()
+            .all()
+        )
+        random.shuffle(keys)
+
+        lookup = text(f"SELECT id FROM {table} WHERE secret_key = :key")
+        latencies = []
+        for key in keys:
+            started = time.perf_counter()
+            conn.execute(lookup, {"key": key}).one()
+            latencies.append((time.perf_counter() - started) * 1e6)
+
+        if not args.keep:
+            conn.execute(text(f"DROP TABLE {table}"))
+
+    return {
+        "index_mb": round(sizes.index_bytes / 2**20, 1),
+        "table_mb": round(sizes.table_bytes / 2**20, 1),
+        "lookup_p50_us": round(statistics.median(latencies), 1),
+        "lookup_p99_us": round(percentile(latencies, 99), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--keep", action="store_true", help="Не удалять таблицы")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    report = {"rows": args.rows}
+    for kind in SCHEMAS:
+        report[kind] = measure(engine, kind, args)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
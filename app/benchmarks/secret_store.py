@@ -0,0 +1,97 @@
+"""
+Бенчмарк хранилищ секретов без HTTP и шифрования.
+
+Для каждого хранилища (postgres, redis, memory) выполняет создание, чтение
+и удаление секретов с заданной конкурентностью и считает пропускную
+способность и p50/p99 каждой операции. HTTP-бенчмарки (consume_contention)
+сравнивают хранилища, если запускать приложение с разным SECRET_STORE.
+
+    python -m benchmarks.secret_store --stores memory redis postgres --secrets 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.stats import summary
+from services.secret_store import create_store
+
+CLIENT = {"ip_address": "127.0.0.1", "user_agent": "benchmark"}
+
+
+async def timed(latencies: list[float], call):
+    started = time.perf_counter()
+    await call
+    latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run_phase(calls, concurrency: int) -> dict:
+    """Выполняет вызовы не более concurrency одновременно"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(call):
+        async with semaphore:
+            await timed(latencies, call)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(call) for call in calls))
+    return summary(latencies, time.perf_counter() - started)
+
+
+async def bench_store(kind: str, args) -> dict:
+    store = create_store(kind)
+    await store.start()
+    try:
+        payload = os.urandom(args.size)
+        keys = [store.new_key() for _ in range(args.secrets)]
+        half = args.secrets // 2
+
+        create = await run_phase(
+            (store.create(key, payload, None, args.ttl, CLIENT) for key in keys),
+            args.concurrency,
+        )
+        # Половина секретов читается, вторая половина удаляется
+        consume = await run_phase(
+            (store.consume(key, CLIENT) for key in keys[:half]), args.concurrency
+        )
+        delete = await run_phase(
+            (store.delete(key, lambda _: None, CLIENT) for key in keys[half:]),
+            args.concurrency,
+        )
+    finally:
+        await store.stop()
+
+    return {"create": create, "consume": consume, "delete": delete}
+
+
+async def run(args) -> dict:
+    return {
+        "secrets": args.secrets,
+        "size": args.size,
+        "concurrency": args.concurrency,
+        "stores": {kind: await bench_store(kind, args) for kind in args.stores},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--stores",
+        nargs="+",
+        choices=["postgres", "redis", "memory"],
+        default=["memory"],
+    )
+    parser.add_argument("--secrets", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=256, help="Размер шифротекста")
+    parser.add_argument("--ttl", type=int, default=3600)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
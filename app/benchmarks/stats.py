@@ -0,0 +1,25 @@
+"""
+Общие расчёты для отчётов бенчмарков: перцентили и сводка задержек.
+"""
+
+import statistics
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль q (0-100) ближайшим рангом"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def summary(
+    latencies: list[float], elapsed: float | None = None, quantiles=(99,)
+) -> dict:
+    """p50 и перцентили quantiles в мс, с elapsed - ещё и операции в секунду"""
+    result = {}
+    if elapsed is not None:
+        result["ops_per_second"] = round(len(latencies) / elapsed, 1)
+    result["p50_ms"] = round(statistics.median(latencies), 3)
+    for q in quantiles:
+        result[f"p{q}_ms"] = round(percentile(latencies, q), 3)
+    return result
@@ -0,0 +1,66 @@
+"""
+Микробенчмарк колеса таймеров ExpiryEngine.
+
+Замеряет стоимость вставки, отмены и срабатывания при N ожидающих таймерах.
+
+    python -m benchmarks.timing_wheel --timers 1000000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from services.timing_wheel import TimingWheel
+
+
+def per_op_ns(elapsed: float, count: int) -> float:
+    return round(elapsed / count * 1e9, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--timers", type=int, default=1_000_000)
+    parser.add_argument("--tick", type=float, default=0.5)
+    parser.add_argument(
+        "--horizon", type=float, default=7 * 24 * 3600, help="Разброс сроков, секунды"
+    )
+    args = parser.parse_args()
+
+    now = time.time()
+    deadlines = [now + random.uniform(1, args.horizon) for _ in range(args.timers)]
+    wheel = TimingWheel(args.tick, now)
+
+    started = time.perf_counter()
+    for key, deadline in enumerate(deadlines):
+        wheel.add(key, deadline)
+    insert_elapsed = time.perf_counter() - started
+
+    cancelled = random.sample(range(args.timers), args.timers // 2)
+    started = time.perf_counter()
+    for key in cancelled:
+        wheel.cancel(key)
+    cancel_elapsed = time.perf_counter() - started
+
+    pending = len(wheel)
+    started = time.perf_counter()
+    fired = len(wheel.advance(now + args.horizon + args.tick))
+    advance_elapsed = time.perf_counter() - started
+
+    print(
+        json.dumps(
+            {
+                "timers": args.timers,
+                "insert_ns_per_op": per_op_ns(insert_elapsed, args.timers),
+                "cancel_ns_per_op": per_op_ns(cancel_elapsed, len(cancelled)),
+                "fire_ns_per_timer": per_op_ns(advance_elapsed, max(fired, 1)),
+                "pending_before_fire": pending,
+                "fired": fired,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import os
+import time
 
 from dotenv import load_dotenv
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
                                     create_async_engine)
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from database.routing import ReplicaRouter, replica_hosts
+from database.shards import ShardRing, shard_urls
 
 load_dotenv()
 
@@ -14,8 +21,139 @@ DB_HOST = os.getenv("DB_HOST", "postgres")
 DB_PORT = os.getenv("DB_PORT", "5432")
 
 DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_HOST}:{DB_PORT}/{POSTGRES_DB}"
+REPLICA_URLS = [
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{host}/{POSTGRES_DB}"
+    for host in replica_hosts()
+]
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# Кеш подготовленных запросов asyncpg и SQLAlchemy, за PgBouncer
+# в режиме transaction оба нужно выставить в 0
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(
+    os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 100)
+)
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", 30))
+
+# Бюджет соединений на все процессы uvicorn (max_connections за вычетом
+# Celery и служебных), делится поровну между WEB_CONCURRENCY процессами
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 0))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Время ожидания соединения из пула",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+# livesum: в режиме нескольких процессов складываются значения живых процессов
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Соединения, выданные из пулов всех движков",
+    multiprocess_mode="livesum",
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Время выполнения SQL-запроса",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+QUERY_OPERATIONS = {
+    operation: QUERY_LATENCY.labels(operation)
+    for operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "OTHER")
+}
+
+
+def pool_limits() -> tuple[int, int]:
+    """
+    pool_size и max_overflow одного процесса. С DB_MAX_CONNECTIONS процессы
+    вместе никогда не открывают больше соединений, чем указано в бюджете.
+    """
+    if DB_MAX_CONNECTIONS <= 0:
+        return DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+    per_process = max(1, DB_MAX_CONNECTIONS // max(1, WEB_CONCURRENCY))
+    pool_size = min(DB_POOL_SIZE, per_process)
+    return pool_size, min(DB_MAX_OVERFLOW, per_process - pool_size)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, который замеряет ожидание свободного соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    # Операция - по первому слову запроса, чтобы число меток было ограничено
+    words = statement.lstrip()[:7].split(None, 1)
+    operation = words[0].upper() if words else "OTHER"
+    latency = QUERY_OPERATIONS.get(operation, QUERY_OPERATIONS["OTHER"])
+    latency.observe(time.perf_counter() - context.query_started)
+
+
+def instrument(engine):
+    """Подключает к движку замеры запросов и учёт выданных соединений"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _query_started)
+    event.listen(engine.sync_engine, "after_cursor_execute", _query_finished)
+    event.listen(engine.pool, "checkout", lambda *args: POOL_CHECKED_OUT.inc())
+    event.listen(engine.pool, "checkin", lambda *args: POOL_CHECKED_OUT.dec())
+    return engine
+
+
+pool_size, max_overflow = pool_limits()
+
+
+def make_engine(url: str):
+    engine = create_async_engine(
+        url,
+        echo=DB_ECHO,
+        # Параметры запросов - шифротексты и ключи секретов, в журнал и
+        # тексты исключений они не попадают даже с DB_ECHO
+        hide_parameters=True,
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args={
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE,
+            "command_timeout": DB_COMMAND_TIMEOUT,
+        },
+    )
+    return instrument(engine)
+
+
+engine = make_engine(DATABASE_URL)
+
+# Шард 0 - основная база, у остальных шардов свои пулы в каждом процессе
+shard_engines = {
+    shard_id: make_engine(url)
+    for shard_id, url in shard_urls("postgresql+asyncpg").items()
+    if shard_id != 0
+}
+shard_engines[0] = engine
+shard_ring = ShardRing(shard_engines)
+
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Чтение, которому не важна задержка репликации: проверки состояния,
+# служебные выборки. Реплики относятся к шарду 0, чтение с удалением
+# секрета всегда идёт на основную базу шарда
+replica_router = ReplicaRouter(engine, [make_engine(url) for url in REPLICA_URLS])
 
 async_session_maker = async_sessionmaker(
     engine, expire_on_commit=False, class_=AsyncSession
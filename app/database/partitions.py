@@ -0,0 +1,165 @@
+"""
+Секции журнала secret_logs по времени.
+
+Журнал секционирован по timestamp (RANGE), секции создаются заранее задачей
+Celery и при запуске приложения, а старые отсоединяются или удаляются
+целиком. Поэтому стоимость вставки и очистки не растёт вместе с историей.
+Записи вне созданных секций попадают в секцию DEFAULT и переносятся
+в свою секцию, когда она создаётся. Функции работают на синхронном
+Connection (Celery, миграции, приложение через run_sync).
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+load_dotenv()
+
+# day или month - на какой период создаётся одна секция
+AUDIT_PARTITION_INTERVAL = os.getenv("AUDIT_PARTITION_INTERVAL", "month")
+# Сколько будущих секций держать созданными, на случай простоя celery-beat
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", 3))
+# Секции старше стольких дней удаляются, 0 - хранить всё
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", 0))
+# drop - удалять старые секции, detach - только отсоединять для архивации
+AUDIT_RETENTION_MODE = os.getenv("AUDIT_RETENTION_MODE", "drop")
+
+LOG_TABLE = "secret_logs"
+DEFAULT_PARTITION = f"{LOG_TABLE}_default"
+
+# Границы секций вычисляет сам Postgres из их определения
+partition_bounds = text(r"""
+    SELECT c.relname AS name,
+           substring(bound FROM $$FROM \('(.*?)'\)$$)::timestamptz AS lower,
+           substring(bound FROM $$TO \('(.*?)'\)$$)::timestamptz AS upper
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid,
+    LATERAL pg_get_expr(c.relpartbound, c.oid) AS bound
+    WHERE i.inhparent = 'secret_logs'::regclass AND bound <> 'DEFAULT'
+    ORDER BY upper
+    """)
+
+
+def period_start(
+    moment: datetime, interval: str = AUDIT_PARTITION_INTERVAL
+) -> datetime:
+    moment = moment.astimezone(timezone.utc)
+    if interval == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(start: datetime, interval: str = AUDIT_PARTITION_INTERVAL) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(start: datetime, interval: str = AUDIT_PARTITION_INTERVAL) -> str:
+    suffix = start.strftime("%Y%m%d" if interval == "day" else "%Y%m")
+    return f"{LOG_TABLE}_p{suffix}"
+
+
+def ensure_partitions(
+    conn, ahead: int = AUDIT_PARTITIONS_AHEAD, now: datetime | None = None
+) -> list[str]:
+    """
+    Создаёт секции текущего и ahead следующих периодов. Периоды, которые
+    пересекаются с уже существующими секциями, пропускаются. Вызывается
+    в транзакции: Celery и процессы приложения создают секции по очереди.
+    """
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": LOG_TABLE}
+    )
+    existing = conn.execute(partition_bounds).all()
+    start = period_start(now or datetime.now(timezone.utc))
+    created = []
+
+    for _ in range(ahead + 1):
+        end = next_period(start)
+        overlaps = any(
+            (row.lower is None or row.lower < end)
+            and (row.upper is None or start < row.upper)
+            for row in existing
+        )
+        if not overlaps:
+            name = partition_name(start)
+            create_partition(conn, name, start, end)
+            created.append(name)
+        start = end
+
+    return created
+
+
+def create_partition(conn, name: str, start: datetime, end: datetime):
+    """
+    Создаёт секцию периода. Записи периода, уже попавшие в секцию DEFAULT,
+    переносятся в новую секцию до её присоединения: иначе Postgres
+    не даст создать секцию
+    """
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    period = {"start": start, "end": end}
+    has_default = conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}
+    ).scalar()
+    misplaced = (
+        has_default
+        and conn.execute(
+            text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                'WHERE "timestamp" >= :start AND "timestamp" < :end)'
+            ),
+            period,
+        ).scalar()
+    )
+
+    if not misplaced:
+        conn.execute(
+            text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {LOG_TABLE} {bounds}")
+        )
+        return
+
+    conn.execute(
+        text(
+            f"CREATE TABLE {name} "
+            f"(LIKE {LOG_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            'WHERE "timestamp" >= :start AND "timestamp" < :end RETURNING *) '
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        period,
+    )
+    conn.execute(
+        text(f"ALTER TABLE {LOG_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}")
+    )
+
+
+def expired_partitions(
+    conn, retention_days: int = AUDIT_RETENTION_DAYS, now: datetime | None = None
+) -> list[str]:
+    """Секции, все записи которых старше срока хранения"""
+    if retention_days <= 0:
+        return []
+
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+    return [
+        row.name
+        for row in conn.execute(partition_bounds)
+        if row.upper is not None and row.upper <= cutoff
+    ]
+
+
+def drop_partition(conn, name: str, mode: str = AUDIT_RETENTION_MODE):
+    """
+    Отсоединяет секцию без блокировки вставок (CONCURRENTLY, поэтому conn
+    должен быть в режиме AUTOCOMMIT) и в режиме drop удаляет её
+    """
+    conn.execute(text(f"ALTER TABLE {LOG_TABLE} DETACH PARTITION {name} CONCURRENTLY"))
+    if mode == "drop":
+        conn.execute(text(f"DROP TABLE {name}"))
@@ -0,0 +1,162 @@
+"""
+Запросы горячих путей, построенные один раз при импорте.
+
+Все параметры передаются через bindparam, поэтому SQLAlchemy компилирует
+каждый запрос один раз и дальше берёт его из кеша компиляции. Запросы
+выполняются на AsyncConnection / Connection и возвращают кортежи без ORM.
+"""
+
+from functools import lru_cache
+
+from sqlalchemy import String, and_, bindparam, case, delete, func, insert, select
+
+from models.log import SecretLog
+from models.secret import Secret
+from models.secret_chunk import SecretChunk
+
+insert_log = insert(SecretLog)
+
+insert_secret = (
+    insert(Secret)
+    .values(
+        secret=bindparam("secret"),
+        blob_digest=bindparam("blob_digest"),
+        passphrase=bindparam("passphrase"),
+        ttl_seconds=bindparam("ttl_seconds"),
+        secret_key=bindparam("secret_key"),
+        expires_at=bindparam("expires_at"),
+        chunked=bindparam("chunked"),
+    )
+    .returning(Secret.id, Secret.created_at, Secret.expires_at)
+)
+
+select_passphrase = select(Secret.id, Secret.passphrase).where(
+    Secret.secret_key == bindparam("secret_key")
+)
+
+delete_secret_by_id = (
+    delete(Secret)
+    .where(Secret.id == bindparam("secret_id"))
+    .returning(Secret.blob_digest)
+)
+
+# Строка потокового секрета блокируется на всё время передачи,
+# параллельный читатель не ждёт, а получает 404
+lock_streamed_secret = (
+    select(Secret.id, Secret.secret, Secret.ttl_seconds, Secret.expires_at)
+    .where(Secret.secret_key == bindparam("secret_key"), Secret.chunked.is_(True))
+    .with_for_update(skip_locked=True)
+)
+
+insert_chunk = insert(SecretChunk).values(
+    secret_id=bindparam("secret_id"), seq=bindparam("seq"), data=bindparam("data")
+)
+
+select_chunks = (
+    select(SecretChunk.data)
+    .where(SecretChunk.secret_id == bindparam("secret_id"))
+    .order_by(SecretChunk.seq)
+)
+
+expired_columns = (
+    Secret.id,
+    Secret.secret_key,
+    Secret.created_at,
+    Secret.expires_at,
+    Secret.ttl_seconds,
+    Secret.blob_digest,
+)
+
+# Удаляет истёкшие секреты из пачки, полученной из индекса истечения
+delete_expired_by_keys = (
+    delete(Secret)
+    .where(
+        Secret.secret_key.in_(bindparam("secret_keys", expanding=True)),
+        Secret.expires_at <= func.now(),
+    )
+    .returning(*expired_columns)
+)
+
+# Удаляет пачку просроченных секретов одним запросом, используя ix_secrets_expires_at.
+# SKIP LOCKED раздаёт параллельным воркерам непересекающиеся пачки
+delete_expired_batch = (
+    delete(Secret)
+    .where(
+        Secret.id.in_(
+            select(Secret.id)
+            .where(Secret.expires_at <= func.now())
+            .order_by(Secret.expires_at)
+            .limit(bindparam("batch_size"))
+            .with_for_update(skip_locked=True)
+        )
+    )
+    .returning(*expired_columns)
+)
+
+# Сроки секретов из пачки, которые ещё не истекли по часам БД
+select_pending_expiry = select(Secret.secret_key, Secret.expires_at).where(
+    Secret.secret_key.in_(bindparam("secret_keys", expanding=True))
+)
+
+
+@lru_cache
+def consume_statement(with_payload: bool, with_audit: bool):
+    """
+    Забирает секрет одним запросом: DELETE ... RETURNING и запись в журнал в CTE.
+    Блокировка строки гарантирует, что секрет получит ровно один читатель.
+    """
+    consumed = (
+        delete(Secret)
+        .where(Secret.secret_key == bindparam("secret_key"), Secret.chunked.is_(False))
+        .returning(
+            Secret.id,
+            Secret.secret,
+            Secret.blob_digest,
+            Secret.ttl_seconds,
+            Secret.expires_at,
+        )
+        .cte("consumed")
+    )
+    expired = and_(
+        consumed.c.expires_at.is_not(None), consumed.c.expires_at < func.now()
+    )
+
+    # blob_digest берётся из строки всегда: ротация ключей переписывает файл
+    # под новым digest, и digest из кеша может указывать на удалённый файл
+    columns = [
+        consumed.c.id,
+        consumed.c.ttl_seconds,
+        consumed.c.blob_digest,
+        expired.label("expired"),
+    ]
+    # При попадании в кеш шифротекст уже получен из Redis, из Postgres он не нужен
+    if with_payload:
+        columns.append(consumed.c.secret)
+
+    if not with_audit:
+        return select(*columns)
+
+    audit = (
+        insert(SecretLog)
+        .from_select(
+            [
+                "secret_id",
+                "action",
+                "ip_address",
+                "user_agent",
+                "ttl_seconds",
+                "additional_info",
+            ],
+            select(
+                consumed.c.id,
+                case((expired, "expired_access"), else_="delete"),
+                bindparam("ip_address", type_=String),
+                bindparam("user_agent", type_=String),
+                consumed.c.ttl_seconds,
+                case((expired, "Attempt to access expired secret"), else_=None),
+            ),
+        )
+        .cte("audit")
+    )
+
+    return select(*columns).add_cte(audit)
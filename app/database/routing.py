@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import DBAPIError
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд недоступная реплика не получает запросов
+DB_REPLICA_EJECT_SECONDS = float(os.getenv("DB_REPLICA_EJECT_SECONDS", 30))
+
+CONNECT_ERRORS = (DBAPIError, OSError, asyncio.TimeoutError)
+
+
+def replica_hosts() -> list[str]:
+    """DB_REPLICA_HOSTS - реплики в виде host:port через запятую"""
+    return [
+        host.strip()
+        for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+        if host.strip()
+    ]
+
+
+class ReplicaRouter:
+    """
+    Раздаёт соединения для чтения по репликам по кругу.
+
+    Реплика, к которой не удалось подключиться, исключается на
+    DB_REPLICA_EJECT_SECONDS. Без доступных реплик чтение идёт на основную базу.
+    Работает как с AsyncEngine (connect), так и с Engine (connect_sync).
+    """
+
+    def __init__(self, primary, replicas: list):
+        self.primary = primary
+        self.replicas = replicas
+        self._next = 0
+        self._ejected_until = {}
+
+    def candidates(self) -> list:
+        """Доступные реплики начиная со следующей по кругу, последней - основная база"""
+        now = time.monotonic()
+        start = self._next
+        if self.replicas:
+            self._next = (start + 1) % len(self.replicas)
+
+        ordered = self.replicas[start:] + self.replicas[:start]
+        healthy = [
+            engine for engine in ordered if self._ejected_until.get(engine, 0) <= now
+        ]
+        return healthy + [self.primary]
+
+    def eject(self, engine, error: Exception):
+        self._ejected_until[engine] = time.monotonic() + DB_REPLICA_EJECT_SECONDS
+        logger.warning(
+            "Replica %s:%s ejected: %s", engine.url.host, engine.url.port, error
+        )
+
+    def status(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "host": f"{engine.url.host}:{engine.url.port}",
+                "healthy": self._ejected_until.get(engine, 0) <= now,
+            }
+            for engine in self.replicas
+        ]
+
+    async def connect(self):
+        """AsyncConnection к первой доступной реплике или к основной базе"""
+        for engine in self.candidates():
+            if engine is self.primary:
+                return await engine.connect()
+            try:
+                return await engine.connect()
+            except CONNECT_ERRORS as e:
+                self.eject(engine, e)
+
+    def connect_sync(self):
+        """То же для синхронных engine воркеров Celery"""
+        for engine in self.candidates():
+            if engine is self.primary:
+                return engine.connect()
+            try:
+                return engine.connect()
+            except CONNECT_ERRORS as e:
+                self.eject(engine, e)
@@ -0,0 +1,112 @@
+import base64
+import binascii
+import bisect
+import hashlib
+import os
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Виртуальных узлов на шард в кольце: чем больше, тем ровнее распределение
+SHARD_VNODES = 64
+
+
+def shard_locations() -> dict[int, str]:
+    """
+    Базы шардов в виде host:port/dbname. Шард 0 - основная база (DB_HOST),
+    остальные задаются в DB_SHARDS как id=host:port/dbname через запятую.
+    """
+    locations = {
+        0: f"{os.getenv('DB_HOST', 'postgres')}:{os.getenv('DB_PORT', '5432')}"
+        f"/{os.getenv('POSTGRES_DB')}"
+    }
+    for item in os.getenv("DB_SHARDS", "").split(","):
+        if item.strip():
+            shard_id, location = item.split("=", 1)
+            locations[int(shard_id)] = location.strip()
+    return locations
+
+
+def shard_urls(driver: str) -> dict[int, str]:
+    user = os.getenv("POSTGRES_USER")
+    password = os.getenv("POSTGRES_PASSWORD")
+    return {
+        shard_id: f"{driver}://{user}:{password}@{location}"
+        for shard_id, location in shard_locations().items()
+    }
+
+
+def _split(secret_key: str) -> tuple[int, str]:
+    prefix, _, rest = secret_key.partition("-")
+    # Первая группа UUID - 8 hex-символов, номер шарда короче
+    if rest and len(prefix) < 8 and prefix.isdigit():
+        return int(prefix), rest
+    return 0, secret_key
+
+
+def encode_uuid(value: uuid.UUID) -> str:
+    """16 байт UUID в 22 символа base64url вместо 36 символов с дефисами"""
+    return base64.urlsafe_b64encode(value.bytes).rstrip(b"=").decode()
+
+
+def format_key(shard_id: int, value: uuid.UUID) -> str:
+    """Ключ секрета для API: номер шарда и UUID строки в base64url"""
+    return f"{shard_id}-{encode_uuid(value)}"
+
+
+def parse_key(secret_key: str) -> tuple[int, uuid.UUID] | None:
+    """
+    Номер шарда и UUID строки из ключа API или None для неверного ключа.
+    Кроме "3-<base64url>" принимаются прежние "3-<uuid>" и "<uuid>" (шард 0).
+    """
+    shard_id, value = _split(secret_key)
+    try:
+        if len(value) == 22:
+            return shard_id, uuid.UUID(bytes=base64.urlsafe_b64decode(value + "=="))
+        return shard_id, uuid.UUID(value)
+    except (ValueError, binascii.Error):
+        return None
+
+
+def _point(value: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "big")
+
+
+class ShardRing:
+    """
+    Консистентное хеширование новых ключей по шардам.
+
+    Номер шарда записывается в сам ключ ("3-<uuid в base64url>"), поэтому для
+    поиска кольцо не нужно: добавление шарда меняет только размещение новых
+    ключей. Ключи без префикса, созданные до шардирования, лежат в шарде 0.
+    """
+
+    def __init__(self, shard_ids):
+        self._ring = sorted(
+            (_point(f"{shard_id}:{vnode}".encode()), shard_id)
+            for shard_id in shard_ids
+            for vnode in range(SHARD_VNODES)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    def place(self, value: bytes) -> int:
+        index = bisect.bisect(self._points, _point(value)) % len(self._ring)
+        return self._ring[index][1]
+
+    def new_key(self) -> str:
+        value = uuid.uuid4()
+        return format_key(self.place(value.bytes), value)
+
+    @staticmethod
+    def shard_of(secret_key: str) -> int:
+        return _split(secret_key)[0]
+
+    @classmethod
+    def group(cls, secret_keys) -> dict[int, list[str]]:
+        """Раскладывает ключи по шардам"""
+        groups = {}
+        for secret_key in secret_keys:
+            groups.setdefault(cls.shard_of(secret_key), []).append(secret_key)
+        return groups
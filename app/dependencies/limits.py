@@ -0,0 +1,79 @@
+import os
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+from fastapi.routing import APIRoute
+
+load_dotenv()
+
+# Максимальный размер JSON-запроса на создание секрета
+SECRET_MAX_BYTES = int(os.getenv("SECRET_MAX_BYTES", 10 * 1024 * 1024))
+# Максимальный размер потокового секрета
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", 100 * 1024 * 1024))
+# Размер открытого текста в одном фрагменте потокового секрета
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 1024 * 1024))
+
+
+def request_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"Request body exceeds {max_bytes} bytes",
+    )
+
+
+def body_limit(max_bytes: int):
+    """Декоратор обработчика: тело запроса не больше max_bytes байт"""
+
+    def decorator(endpoint):
+        endpoint.max_body_bytes = max_bytes
+        return endpoint
+
+    return decorator
+
+
+def limited_receive(receive, max_bytes: int):
+    """receive, который считает байты тела и прерывает чтение при превышении"""
+    received = 0
+
+    async def wrapped():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise request_too_large(max_bytes)
+        return message
+
+    return wrapped
+
+
+class BodyLimitRoute(APIRoute):
+    """
+    Маршрут, который ограничивает размер тела для обработчиков с body_limit.
+    Запрос с большим Content-Length отклоняется до чтения тела, тело без
+    заголовка (chunked) - как только прочитано больше разрешённого.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        max_bytes = getattr(self.endpoint, "max_body_bytes", None)
+        if max_bytes is None:
+            return handler
+
+        async def limited_handler(request: Request):
+            content_length = request.headers.get("Content-Length")
+            if content_length is not None:
+                if not content_length.isdigit():
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid Content-Length",
+                    )
+                if int(content_length) > max_bytes:
+                    raise request_too_large(max_bytes)
+
+            # Заголовку нельзя верить на слово, байты считаются и при чтении
+            return await handler(
+                Request(request.scope, limited_receive(request.receive, max_bytes))
+            )
+
+        return limited_handler
@@ -1,11 +1,16 @@
 from fastapi import Response
 
+# Те же заголовки для ответов, которые создаются вручную (StreamingResponse)
+NO_CACHE_HEADERS = {
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0",
+}
+
 
 def no_cache_headers(response: Response):
     """
     Добавляет заголовки, запрещающие кеширование на клиенте.
     """
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
+    response.headers.update(NO_CACHE_HEADERS)
     return response
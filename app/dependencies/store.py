@@ -0,0 +1,8 @@
+from services.secret_store import SecretStore, create_store
+
+# Хранилище выбирается переменной SECRET_STORE, одно на процесс
+store = create_store()
+
+
+def get_store() -> SecretStore:
+    return store
@@ -1,18 +1,25 @@
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from routers import secret
-from services.redis_service import RedisService
+from dependencies.store import store
+from routers import health, secret
+from services.logging_service import setup_logging
+from services.metrics import mark_process_dead, metrics_app
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Запуск приложения...")
-    await RedisService.ping()
+    logger.info("Запуск приложения...")
+    await store.start()
     yield
-    print("Остановка приложения...")
-    await RedisService.close()
+    logger.info("Остановка приложения...")
+    await store.stop()
+    mark_process_dead()
 
 
 app = FastAPI(
@@ -24,3 +31,5 @@ app = FastAPI(
 
 
 app.include_router(secret.router)
+app.include_router(health.router)
+app.mount("/metrics", metrics_app())
@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy import DateTime, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
@@ -11,9 +11,18 @@ from database.db import Base
 
 class SecretLog(Base):
     __tablename__ = "secret_logs"
+    # Секции по времени создаёт и удаляет database.partitions,
+    # поэтому timestamp входит в первичный ключ
+    __table_args__ = (
+        Index("ix_secret_logs_secret_id_timestamp", "secret_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
     id: Mapped[int] = mapped_column(
-        primary_key=True, index=True, comment="Уникальный идентификатор записи лога"
+        Integer,
+        primary_key=True,
+        autoincrement=True,
+        comment="Уникальный идентификатор записи лога",
     )
     secret_id: Mapped[int] = mapped_column(
         Integer, nullable=False, comment="ID созданного секрета"
@@ -32,6 +41,7 @@ class SecretLog(Base):
     )
     timestamp: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         server_default=func.now(),
         comment="Время выполнения действия",
     )
@@ -1,6 +1,17 @@
+import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Uuid,
+    false,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
@@ -9,15 +20,34 @@ from database.db import Base
 
 class Secret(Base):
     __tablename__ = "secrets"
+    __table_args__ = (
+        # Единственный индекс ключа, он же обеспечивает уникальность
+        Index("ix_secrets_secret_key", "secret_key", unique=True),
+        # Частичный индекс для поиска просроченных секретов
+        Index(
+            "ix_secrets_expires_at",
+            "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+        ),
+        # Поиск строк по файлам хранилища при удалении брошенных файлов
+        Index(
+            "ix_secrets_blob_digest",
+            "blob_digest",
+            postgresql_where=text("blob_digest IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(
         primary_key=True, index=True, comment="Уникальный идентификатор секрета"
     )
-    secret: Mapped[str] = mapped_column(
-        Text, nullable=False, comment="Конфиденциальные данные, хранимые в секрете"
+    # Пусто, если шифротекст вынесен в файловое хранилище (см. blob_digest)
+    secret: Mapped[bytes] = mapped_column(
+        LargeBinary,
+        nullable=False,
+        comment="Конфиденциальные данные, хранимые в секрете",
     )
-    passphrase: Mapped[str | None] = mapped_column(
-        String(255),
+    passphrase: Mapped[bytes | None] = mapped_column(
+        LargeBinary,
         nullable=True,
         comment="Опциональная фраза-пароль для дополнительной защиты",
     )
@@ -36,12 +66,23 @@ class Secret(Base):
         nullable=True,
         comment="Время жизни секрета в секундах от момента создания",
     )
-    secret_key: Mapped[str] = mapped_column(
-        String(360),
-        unique=True,
-        index=True,
+    # В API ключ передаётся вместе с номером шарда (database.shards.format_key)
+    secret_key: Mapped[uuid.UUID] = mapped_column(
+        Uuid,
+        nullable=False,
         comment="Уникальный ключ доступа к секрету",
     )
+    blob_digest: Mapped[str | None] = mapped_column(
+        String(64),
+        nullable=True,
+        comment="SHA-256 шифротекста, вынесенного в файловое хранилище",
+    )
+    chunked: Mapped[bool] = mapped_column(
+        Boolean,
+        nullable=False,
+        server_default=false(),
+        comment="Содержимое хранится фрагментами в secret_chunks",
+    )
 
     def __str__(self):
         return str(self.secret_key)
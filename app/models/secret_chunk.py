@@ -0,0 +1,25 @@
+"""Фрагменты потоковых секретов"""
+
+from sqlalchemy import ForeignKey, Integer, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database.db import Base
+
+
+class SecretChunk(Base):
+    __tablename__ = "secret_chunks"
+
+    secret_id: Mapped[int] = mapped_column(
+        ForeignKey("secrets.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="ID секрета, которому принадлежит фрагмент",
+    )
+    seq: Mapped[int] = mapped_column(
+        Integer, primary_key=True, comment="Порядковый номер фрагмента"
+    )
+    data: Mapped[bytes] = mapped_column(
+        LargeBinary, nullable=False, comment="Зашифрованный фрагмент"
+    )
+
+    def __repr__(self):
+        return f"SecretChunk(secret_id={self.secret_id}, seq={self.seq})"
@@ -0,0 +1,14 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from dependencies.store import get_store
+from services.secret_store import SecretStore
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/")
+async def health(store: Annotated[SecretStore, Depends(get_store)]):
+    """Проверка доступности хранилища"""
+    return {"status": "ok", **await store.health()}
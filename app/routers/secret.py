@@ -1,169 +1,255 @@
-import uuid
-from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy import insert, select
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from dependencies.database import get_db
-from dependencies.security import no_cache_headers
-from models.log import SecretLog
-from models.secret import Secret
-from schemas import CreateSecret
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from dependencies.limits import (
+    SECRET_MAX_BYTES,
+    STREAM_CHUNK_SIZE,
+    STREAM_MAX_BYTES,
+    BodyLimitRoute,
+    body_limit,
+)
+from dependencies.security import NO_CACHE_HEADERS, no_cache_headers
+from dependencies.store import get_store
+from schemas import CreateSecret, SecretKeyResponse, SecretResponse, StatusResponse
 from services.encryption_service import EncryptionService
-from services.redis_service import RedisService
+from services.metrics import (
+    SECRETS_CONSUMED,
+    SECRETS_CREATED,
+    SECRETS_EXPIRED,
+    TimedRoute,
+)
+from services.secret_store import SecretExpired, SecretNotFound, SecretStore
 
-router = APIRouter(prefix="/secrets", tags=["secrets"])
 
+class SecretRoute(TimedRoute, BodyLimitRoute):
+    """Замер времени и ограничение размера тела"""
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_secret(
-    request: Request,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    create_secret: CreateSecret,
-    _: Annotated[None, Depends(no_cache_headers)],
-):
 
-    secret_key = str(uuid.uuid4())
-    encrypted_secret = EncryptionService.encrypt(create_secret.secret)
-    encrypted_passphrase = EncryptionService.encrypt(create_secret.passphrase)
+router = APIRouter(prefix="/secrets", tags=["secrets"], route_class=SecretRoute)
 
-    insert_data = {
-        "secret": encrypted_secret,
-        "passphrase": encrypted_passphrase,
-        "ttl_seconds": create_secret.ttl_seconds,
-        "secret_key": secret_key,
-    }
 
-    if create_secret.ttl_seconds is not None:
-        insert_data["expires_at"] = datetime.now(timezone.utc) + timedelta(
-            seconds=create_secret.ttl_seconds
-        )
+def client_info(request: Request) -> dict:
+    """Кто обратился к секрету, для журнала"""
+    return {
+        "ip_address": request.client.host if request.client else None,
+        "user_agent": request.headers.get("User-Agent", "Unknown"),
+    }
 
-    result = await db.execute(insert(Secret).values(**insert_data).returning(Secret))
-    secret = result.scalar_one()
 
-    client_ip = request.client.host if request.client else None
-    user_agent = request.headers.get("User-Agent", "Unknown")
+@router.post(
+    "/",
+    status_code=status.HTTP_201_CREATED,
+    response_model=SecretKeyResponse,
+)
+@body_limit(SECRET_MAX_BYTES)
+async def create_secret(
+    request: Request,
+    store: Annotated[SecretStore, Depends(get_store)],
+    create_secret: CreateSecret,
+    _: Annotated[None, Depends(no_cache_headers)],
+):
 
-    log_data = {
-        "secret_id": secret.id,
-        "action": "create",
-        "ip_address": client_ip,
-        "user_agent": user_agent,
-        "ttl_seconds": create_secret.ttl_seconds,
-    }
-    await db.execute(insert(SecretLog).values(**log_data))
-    await db.commit()
-
-    # кэша
-    secret_data = {
-        "id": secret.id,
-        "secret": encrypted_secret,
-        "passphrase": encrypted_passphrase,
-        "created_at": secret.created_at.isoformat(),
-        "expires_at": secret.expires_at.isoformat() if secret.expires_at else None,
-        "ttl_seconds": secret.ttl_seconds,
-    }
+    encrypted_secret, encrypted_passphrase = await EncryptionService.aencrypt_many(
+        [create_secret.secret, create_secret.passphrase]
+    )
 
-    await RedisService.cache_secret(str(secret.id), secret_data, secret.ttl_seconds)
+    secret_key = store.new_key()
+    await store.create(
+        secret_key,
+        encrypted_secret,
+        encrypted_passphrase,
+        create_secret.ttl_seconds,
+        client_info(request),
+    )
+    SECRETS_CREATED.inc()
 
     return {"secret_key": secret_key}
 
 
-@router.get("/{secret_key}", status_code=status.HTTP_200_OK)
-async def get_secret(
+@router.post(
+    "/stream",
+    status_code=status.HTTP_201_CREATED,
+    response_model=SecretKeyResponse,
+)
+@body_limit(STREAM_MAX_BYTES)
+async def create_secret_stream(
     request: Request,
+    store: Annotated[SecretStore, Depends(get_store)],
     _: Annotated[None, Depends(no_cache_headers)],
-    db: Annotated[AsyncSession, Depends(get_db)],
-    secret_key: str,
+    ttl_seconds: Annotated[int | None, Query(gt=0)] = None,
+    passphrase: Annotated[
+        str | None, Header(alias="X-Secret-Passphrase", min_length=8)
+    ] = None,
 ):
-    secret = await db.scalar(select(Secret).where(Secret.secret_key == secret_key))
-
-    if secret is None:
+    """
+    Создаёт секрет из сырого тела запроса. Тело читается и шифруется
+    фрагментами по STREAM_CHUNK_SIZE, в памяти не бывает больше одного фрагмента.
+    """
+    if not store.streaming:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Secret not found"
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Streamed secrets are not supported by this store",
+        )
+
+    encryptor = EncryptionService.stream_encryptor()
+    client = client_info(request)
+
+    async def frames():
+        size = 0
+        buffer = bytearray()
+
+        # Размер тела ограничивает BodyLimitRoute
+        async for data in request.stream():
+            size += len(data)
+            buffer += data
+            # Последний фрагмент помечается отдельно, поэтому полный буфер
+            # сбрасывается, только когда за ним пришли ещё данные
+            while len(buffer) > STREAM_CHUNK_SIZE:
+                yield await EncryptionService.aencrypt_chunk(
+                    encryptor, bytes(buffer[:STREAM_CHUNK_SIZE]), final=False
+                )
+                del buffer[:STREAM_CHUNK_SIZE]
+
+        yield await EncryptionService.aencrypt_chunk(
+            encryptor, bytes(buffer), final=True
         )
+        # Хранилище пишет журнал после последнего фрагмента, размер уже известен
+        client["additional_info"] = f"Streamed secret, {size} bytes"
+
+    secret_key = store.new_key()
+    await store.create_stream(
+        secret_key,
+        encryptor.header,
+        EncryptionService.encrypt(passphrase),
+        ttl_seconds,
+        frames(),
+        client,
+    )
+    SECRETS_CREATED.inc()
+
+    return {"secret_key": secret_key}
+
 
-    now = datetime.now(timezone.utc)
-
-    if secret.expires_at < now:
-        client_ip = request.client.host if request.client else None
-        user_agent = request.headers.get("User-Agent", "Unknown")
-        log_data = {
-            "secret_id": secret.id,
-            "action": "expired_access",
-            "ip_address": client_ip,
-            "user_agent": user_agent,
-            "additional_info": "Attempt to access expired secret",
-        }
-        await db.execute(insert(SecretLog).values(**log_data))
-        await db.delete(secret)
-        await RedisService.delete_cached_secret(str(secret.id))
-        await db.commit()
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    Закрывает итератор хранилища после ответа, даже если тело не начали
+    читать: клиент отключился раньше или отправка заголовков не удалась.
+    Хранилище тогда сразу освобождает строку и возвращает секрет.
+    """
 
+    def __init__(self, content, closing, **kwargs):
+        super().__init__(content, **kwargs)
+        self.closing = closing
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.closing.aclose()
+
+
+async def stream_secret(store: SecretStore, secret_key: str, client: dict):
+    """Отдаёт потоковый секрет, расшифровывая фрагменты по мере чтения"""
+    try:
+        opened = await store.open_stream(secret_key, client)
+    except SecretExpired:
+        SECRETS_EXPIRED.inc()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Secret has expired"
         )
+    except SecretNotFound:
+        return None
+    if opened is None:
+        return None
+
+    header, frames = opened
+    try:
+        decryptor = EncryptionService.stream_decryptor(header)
+    except BaseException:
+        await frames.aclose()
+        raise
+    if decryptor is None:
+        # Хранилище сохраняет секрет: поток закрыт до последнего фрагмента
+        await frames.aclose()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Secret cannot be decrypted",
+        )
+    SECRETS_CONSUMED.inc()
 
-    client_ip = request.client.host if request.client else None
-    user_agent = request.headers.get("User-Agent", "Unknown")
-    log_data = {
-        "secret_id": secret.id,
-        "action": "delete",
-        "ip_address": client_ip,
-        "user_agent": user_agent,
-        "ttl_seconds": secret.ttl_seconds,
-        "timestamp": datetime.now(),
-    }
-    await db.execute(insert(SecretLog).values(**log_data))
-
-    decrypted_secret = EncryptionService.decrypt(secret.secret)
-
-    await db.delete(secret)
-    await RedisService.delete_cached_secret(str(secret.id))
-    await db.commit()
+    async def body():
+        async for frame, final in frames:
+            yield await EncryptionService.adecrypt_chunk(decryptor, frame, final)
 
-    return {"secret": decrypted_secret}
+    return ClosingStreamingResponse(
+        body(),
+        closing=frames,
+        media_type="application/octet-stream",
+        headers=NO_CACHE_HEADERS,
+    )
 
 
-@router.delete("/{secret_key}", status_code=status.HTTP_200_OK)
-async def delete_secret(
+@router.get(
+    "/{secret_key}", status_code=status.HTTP_200_OK, response_model=SecretResponse
+)
+async def get_secret(
     request: Request,
     _: Annotated[None, Depends(no_cache_headers)],
-    db: Annotated[AsyncSession, Depends(get_db)],
+    store: Annotated[SecretStore, Depends(get_store)],
     secret_key: str,
-    passphrase: str = None,
 ):
-    secret = await db.scalar(select(Secret).where(Secret.secret_key == secret_key))
+    client = client_info(request)
 
-    if secret is None:
+    try:
+        encrypted_secret = await store.consume(secret_key, client)
+    except SecretExpired:
+        SECRETS_EXPIRED.inc()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Secret not found"
+            status_code=status.HTTP_404_NOT_FOUND, detail="Secret has expired"
         )
-
-    if secret.passphrase:
-        decrypted_passphrase = EncryptionService.decrypt(secret.passphrase)
-        if passphrase != decrypted_passphrase:
+    except SecretNotFound:
+        encrypted_secret = None
+
+    if encrypted_secret is None:
+        response = None
+        if store.streaming:
+            response = await stream_secret(store, secret_key, client)
+        if response is None:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Incorrect passphrase"
+                status_code=status.HTTP_404_NOT_FOUND, detail="Secret not found"
             )
+        return response
 
-    client_ip = request.client.host if request.client else None
-    user_agent = request.headers.get("User-Agent", "Unknown")
-    log_data = {
-        "secret_id": secret.id,
-        "action": "delete",
-        "ip_address": client_ip,
-        "user_agent": user_agent,
-        "additional_info": "Deleted by user request",
-    }
-    await db.execute(insert(SecretLog).values(**log_data))
+    SECRETS_CONSUMED.inc()
+    return {"secret": await EncryptionService.adecrypt(encrypted_secret)}
 
-    await RedisService.delete_cached_secret(str(secret.id))
 
-    await db.delete(secret)
-    await db.commit()
+@router.delete(
+    "/{secret_key}", status_code=status.HTTP_200_OK, response_model=StatusResponse
+)
+async def delete_secret(
+    request: Request,
+    _: Annotated[None, Depends(no_cache_headers)],
+    store: Annotated[SecretStore, Depends(get_store)],
+    secret_key: str,
+    passphrase: str = None,
+):
+    def authorize(encrypted_passphrase: bytes | None):
+        if encrypted_passphrase:
+            decrypted_passphrase = EncryptionService.decrypt(encrypted_passphrase)
+            if passphrase != decrypted_passphrase:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Incorrect passphrase",
+                )
+
+    try:
+        await store.delete(secret_key, authorize, client_info(request))
+    except SecretNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Secret not found"
+        )
 
     return {"status": "secret_deleted"}
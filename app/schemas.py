@@ -1,4 +1,3 @@
-
 from pydantic import BaseModel, Field
 
 
@@ -14,3 +13,15 @@ class CreateSecret(BaseModel):
         gt=0,
         description="Time to live in seconds, must be greater than 0",
     )
+
+
+class SecretKeyResponse(BaseModel):
+    secret_key: str
+
+
+class SecretResponse(BaseModel):
+    secret: str | None
+
+
+class StatusResponse(BaseModel):
+    status: str
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database.queries import insert_log
+from services.metrics import AUDIT_DROPPED, AUDIT_WORKER_RESTARTS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# sync - запись журнала в транзакции запроса, async - фоновая пакетная запись
+AUDIT_MODE = os.getenv("AUDIT_MODE", "async")
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))
+# Сколько раз повторить запись пакета после ошибки, прежде чем отбросить его
+AUDIT_FLUSH_RETRIES = int(os.getenv("AUDIT_FLUSH_RETRIES", 3))
+# Пауза перед повтором записи и перезапуском упавшей фоновой задачи, секунды
+AUDIT_RETRY_DELAY = float(os.getenv("AUDIT_RETRY_DELAY", 0.5))
+
+LOG_DEFAULTS = {"ip_address": None, "ttl_seconds": None, "additional_info": None}
+
+
+class AuditService:
+    """Журнал операций с секретами с пакетной записью вне запроса"""
+
+    _queue: asyncio.Queue | None = None
+    _worker: asyncio.Task | None = None
+    _stopping = False
+
+    @classmethod
+    def in_transaction(cls) -> bool:
+        """Пишется ли журнал в транзакции запроса"""
+        return cls._worker is None
+
+    @classmethod
+    async def record(cls, db: AsyncConnection, log_data: dict):
+        """Добавляет запись в журнал"""
+        if cls.in_transaction():
+            await db.execute(insert_log, log_data)
+            return
+
+        # В пакетной вставке у всех записей должен быть одинаковый набор полей
+        log_data = {**LOG_DEFAULTS, **log_data}
+        log_data.setdefault("timestamp", datetime.now(timezone.utc))
+        # Журнал пишется в шард секрета, поэтому запись идёт вместе с его engine.
+        # При заполненной очереди запрос ждёт, пока фоновая задача её разгрузит
+        await cls._queue.put((db.engine, log_data))
+
+    @classmethod
+    async def commit(cls, db: AsyncConnection, *logs: dict):
+        """
+        Фиксирует транзакцию вместе с записями журнала. В режиме sync записи
+        входят в транзакцию, в async ставятся в очередь только после фиксации,
+        поэтому в журнал не попадает несостоявшаяся операция.
+        """
+        in_transaction = cls.in_transaction()
+        if in_transaction:
+            for log_data in logs:
+                await db.execute(insert_log, log_data)
+        await db.commit()
+        if not in_transaction:
+            for log_data in logs:
+                await cls.record(db, log_data)
+
+    @classmethod
+    async def start(cls):
+        """Запускает фоновую запись журнала"""
+        if AUDIT_MODE != "async" or cls._worker is not None:
+            return
+
+        cls._queue = asyncio.Queue(maxsize=AUDIT_QUEUE_SIZE)
+        cls._stopping = False
+        cls._spawn()
+
+    @classmethod
+    async def stop(cls):
+        """Дописывает накопленные записи и останавливает фоновую запись"""
+        if cls._worker is None:
+            return
+
+        cls._stopping = True
+        await asyncio.wait([cls._worker])
+
+        # Если фоновая задача упала при остановке, остаток дописывается здесь
+        leftover = []
+        while not cls._queue.empty():
+            leftover.append(cls._queue.get_nowait())
+        if leftover:
+            await cls._flush(leftover)
+
+        cls._worker = None
+        cls._queue = None
+
+    @classmethod
+    def _spawn(cls, delay: float = 0):
+        cls._worker = asyncio.create_task(cls._run(delay))
+        cls._worker.add_done_callback(cls._worker_done)
+
+    @classmethod
+    def _worker_done(cls, task: asyncio.Task):
+        """
+        Перезапускает упавшую фоновую задачу: без неё очередь заполнится
+        и запросы будут ждать в record() бесконечно
+        """
+        if task.cancelled() or task.exception() is None or cls._stopping:
+            return
+
+        logger.error("Audit log worker failed", exc_info=task.exception())
+        AUDIT_WORKER_RESTARTS.inc()
+        cls._spawn(AUDIT_RETRY_DELAY)
+
+    @classmethod
+    async def _run(cls, delay: float = 0):
+        if delay:
+            await asyncio.sleep(delay)
+        while True:
+            batch = await cls._next_batch()
+            if batch:
+                await cls._flush(batch)
+            elif cls._stopping:
+                return
+
+    @classmethod
+    async def _next_batch(cls) -> list[tuple]:
+        """Собирает пакет по размеру или по истечении интервала"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + AUDIT_FLUSH_INTERVAL
+        batch = []
+
+        while len(batch) < AUDIT_BATCH_SIZE:
+            try:
+                batch.append(cls._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            timeout = deadline - loop.time()
+            if timeout <= 0 or cls._stopping:
+                break
+            try:
+                batch.append(await asyncio.wait_for(cls._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    @staticmethod
+    async def _flush(batch: list[tuple]):
+        by_shard = {}
+        for shard_engine, log_data in batch:
+            by_shard.setdefault(shard_engine, []).append(log_data)
+
+        for shard_engine, logs in by_shard.items():
+            for attempt in range(AUDIT_FLUSH_RETRIES + 1):
+                try:
+                    async with shard_engine.begin() as conn:
+                        await conn.execute(insert_log, logs)
+                    break
+                except Exception as e:
+                    if attempt == AUDIT_FLUSH_RETRIES:
+                        AUDIT_DROPPED.inc(len(logs))
+                        logger.error(
+                            "Audit log batch dropped (%d records): %s", len(logs), e
+                        )
+                    else:
+                        logger.warning(
+                            "Error writing audit log batch (%d records): %s",
+                            len(logs),
+                            e,
+                        )
+                        await asyncio.sleep(AUDIT_RETRY_DELAY * (attempt + 1))
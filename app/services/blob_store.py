@@ -0,0 +1,113 @@
+import asyncio
+import contextlib
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "/var/lib/secrets/blobs")
+# Шифротексты крупнее порога хранятся файлами, 0 отключает хранилище
+BLOB_THRESHOLD = int(os.getenv("BLOB_THRESHOLD", 256 * 1024))
+
+TEMP_PREFIX = ".tmp-"
+
+
+class BlobStore:
+    """
+    Локальное хранилище крупных шифротекстов, адресуемое по SHA-256.
+
+    Файл лежит в <root>/ab/cd/<digest>. Шифротекст каждого секрета уникален
+    (свой ключ данных и nonce), поэтому файл принадлежит ровно одной строке
+    и удаляется вместе с ней.
+    """
+
+    root = BLOB_STORE_DIR
+
+    @staticmethod
+    def should_store(data: bytes | None) -> bool:
+        return BLOB_THRESHOLD > 0 and data is not None and len(data) > BLOB_THRESHOLD
+
+    @classmethod
+    def path(cls, digest: str) -> str:
+        return os.path.join(cls.root, digest[:2], digest[2:4], digest)
+
+    @classmethod
+    def write(cls, data: bytes) -> str:
+        """Атомарно записывает данные и возвращает их digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = cls.path(digest)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Файл появляется под итоговым именем только целиком и после fsync
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_path)
+            raise
+
+        return digest
+
+    @classmethod
+    def read(cls, digest: str) -> bytes:
+        """Читает файл через mmap и проверяет его digest"""
+        with open(cls.path(digest), "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                if hashlib.sha256(view).hexdigest() != digest:
+                    raise ValueError(f"Blob {digest} is corrupted")
+                return view[:]
+
+    @classmethod
+    def unlink_many(cls, digests):
+        """Удаляет файлы, уже удалённые пропускаются"""
+        for digest in filter(None, digests):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(cls.path(digest))
+
+    @classmethod
+    def scan(cls, older_than: float):
+        """
+        Возвращает digest файлов старше older_than секунд и удаляет брошенные
+        временные файлы. Свежие файлы пропускаются, так как строка для них
+        может быть ещё не закоммичена.
+        """
+        deadline = time.time() - older_than
+        for directory, _, names in os.walk(cls.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_mtime > deadline:
+                        continue
+                except FileNotFoundError:
+                    continue
+
+                if name.startswith(TEMP_PREFIX):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(path)
+                    continue
+                yield name
+
+    @classmethod
+    async def awrite(cls, data: bytes) -> str:
+        return await asyncio.to_thread(cls.write, data)
+
+    @classmethod
+    async def aread(cls, digest: str) -> bytes:
+        return await asyncio.to_thread(cls.read, digest)
+
+    @classmethod
+    async def aunlink_many(cls, digests):
+        digests = list(filter(None, digests))
+        if digests:
+            await asyncio.to_thread(cls.unlink_many, digests)
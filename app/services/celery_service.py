@@ -1,18 +1,36 @@
+import contextlib
+import itertools
 import logging
+import math
 import os
+import time
 from datetime import datetime, timezone
 
 import redis
-from celery import Celery
+from celery import Celery, group
+from celery.signals import setup_logging as setup_logging_signal
+from celery.signals import worker_process_init
 from dotenv import load_dotenv
-from sqlalchemy import and_, create_engine, select
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import bindparam, create_engine, func, select, update
 
-from models.log import SecretLog
+from database.partitions import drop_partition, ensure_partitions, expired_partitions
+from database.queries import (
+    delete_expired_batch,
+    delete_expired_by_keys,
+    insert_log,
+    select_pending_expiry,
+)
+from database.routing import ReplicaRouter, replica_hosts
+from database.shards import format_key, parse_key, shard_urls
 from models.secret import Secret
+from services.blob_store import BlobStore
+from services.encryption_service import EncryptionService
+from services.logging_service import setup_logging
+from services.metrics import SECRETS_EXPIRED
+from services.redis_service import expiry_index_key
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Celery не настраивает журнал сам, если есть обработчик setup_logging
+setup_logging_signal.connect(setup_logging)
 logger = logging.getLogger(__name__)
 
 # Загружаем .env файл
@@ -27,8 +45,22 @@ DB_PORT = os.getenv("DB_PORT")
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = os.getenv("REDIS_PORT", 6379)
 REDIS_DB = os.getenv("REDIS_DB")
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", 1000))
+# Максимальное число параллельных подзадач очистки
+CLEANUP_PARALLELISM = int(os.getenv("CLEANUP_PARALLELISM", 4))
+# Полный проход по таблице страхует индекс истечения в Redis от потерь
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", 3600))
+# Ротация ключей идёт мелкими пачками с паузой, чтобы не мешать чтению секретов
+ROTATION_BATCH_SIZE = int(os.getenv("ROTATION_BATCH_SIZE", 200))
+ROTATION_BATCH_DELAY = float(os.getenv("ROTATION_BATCH_DELAY", 0.5))
+ROTATION_STATEMENT_TIMEOUT = os.getenv("ROTATION_STATEMENT_TIMEOUT", "5s")
+ROTATION_CURSOR_KEY = "rotation:last_id"
+# Файлы хранилища моложе этого возраста не считаются брошенными
+BLOB_SWEEP_GRACE = float(os.getenv("BLOB_SWEEP_GRACE", 3600))
 
 DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_HOST}:{DB_PORT}/{POSTGRES_DB}"
+# Шард 0 - основная база DATABASE_URL
+SHARD_URLS = {**shard_urls("postgresql"), 0: DATABASE_URL}
 
 
 redis_client = redis.Redis(host=REDIS_HOST, port=int(REDIS_PORT), db=int(REDIS_DB))
@@ -47,64 +79,588 @@ celery.conf.beat_schedule = {
         "task": "cleanup_expired_secrets",
         "schedule": 60.0,
     },
+    # Сверка по каждому шарду отдельной задачей, шарды проверяются параллельно
+    **{
+        f"reconcile-expired-secrets-{shard_id}": {
+            "task": "reconcile_expired_secrets",
+            "schedule": RECONCILE_INTERVAL,
+            "args": (shard_id,),
+        }
+        for shard_id in SHARD_URLS
+    },
+    "sweep-orphan-blobs": {
+        "task": "sweep_orphan_blobs",
+        "schedule": RECONCILE_INTERVAL,
+    },
+    **{
+        f"maintain-log-partitions-{shard_id}": {
+            "task": "maintain_log_partitions",
+            "schedule": 3600.0,
+            "args": (shard_id,),
+        }
+        for shard_id in SHARD_URLS
+    },
 }
 celery.conf.timezone = "UTC"
 
 
+REPLICA_URLS = [
+    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{host}/{POSTGRES_DB}"
+    for host in replica_hosts()
+]
+
+_engines = {}
+_read_router = None
+
+
+def get_engine(shard_id: int = 0):
+    """Engine шарда создаётся один раз на процесс воркера"""
+    if shard_id not in _engines:
+        _engines[shard_id] = create_engine(
+            SHARD_URLS[shard_id], pool_pre_ping=True, hide_parameters=True
+        )
+    return _engines[shard_id]
+
+
+def read_connection(shard_id: int = 0):
+    """Соединение для выборок без удаления: реплика, если она доступна"""
+    global _read_router
+    if shard_id != 0:
+        return get_engine(shard_id).connect()
+    if _read_router is None:
+        _read_router = ReplicaRouter(
+            get_engine(),
+            [
+                create_engine(url, pool_pre_ping=True, hide_parameters=True)
+                for url in REPLICA_URLS
+            ],
+        )
+    return _read_router.connect_sync()
+
+
+@worker_process_init.connect
+def _reset_engine(**kwargs):
+    # Соединения, унаследованные от родителя при fork, использовать нельзя
+    global _read_router
+    _engines.clear()
+    _read_router = None
+
+
+# Атомарно забирает из индекса до ARGV[2] ключей с оценкой не больше ARGV[1],
+# поэтому параллельные воркеры получают непересекающиеся пачки
+claim_due_secrets = redis_client.register_script("""
+    local due = redis.call(
+        'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2]
+    )
+    for i = 1, #due, 2 do
+        redis.call('ZREM', KEYS[1], due[i])
+    end
+    return due
+    """)
+
+
+def claim_due(shard_id: int, limit: int) -> dict[str, float]:
+    """Забирает из индекса истечения шарда ключи секретов, срок которых наступил"""
+    due = claim_due_secrets(
+        keys=[expiry_index_key(shard_id)], args=[time.time(), limit]
+    )
+    return {due[i].decode(): float(due[i + 1]) for i in range(0, len(due), 2)}
+
+
+def log_auto_delete(conn, expired):
+    """Пишет в журнал записи auto_delete одной пачкой"""
+    if not expired:
+        return
+
+    now = datetime.now(timezone.utc)
+    conn.execute(
+        insert_log,
+        [
+            {
+                "secret_id": row.id,
+                "action": "auto_delete",
+                "ip_address": "system",
+                "user_agent": "Celery Task",
+                "ttl_seconds": row.ttl_seconds,
+                "timestamp": now,
+                "additional_info": f"Secret expired. Created: {row.created_at}, Expires: {row.expires_at}",
+            }
+            for row in expired
+        ],
+    )
+
+
+def unlink_cached(shard_id: int, expired):
+    if expired:
+        redis_client.unlink(
+            *(f"secret:{format_key(shard_id, row.secret_key)}" for row in expired)
+        )
+        # Файлы удаляются только после коммита, иначе откат оставил бы строки без них
+        BlobStore.unlink_many(row.blob_digest for row in expired)
+        SECRETS_EXPIRED.inc(len(expired))
+
+
+def report(deleted: int, started: float) -> dict:
+    elapsed = time.perf_counter() - started
+    rows_per_second = deleted / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Удалено {deleted} просроченных секретов за {elapsed:.3f} с "
+        f"({rows_per_second:.0f} строк/с)"
+    )
+
+    return {
+        "deleted": deleted,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows_per_second, 1),
+    }
+
+
 @celery.task(name="cleanup_expired_secrets")
 def cleanup_expired_secrets():
-    logger.info("Начинаем проверку просроченных секретов")
+    """Проверяет индексы истечения шардов и раздаёт очистку подзадачам"""
+    try:
+        now = time.time()
+        backlog = 0
+        subtasks = []
+
+        # Пустой тик стоит одного ZCOUNT на шард и не обращается к Postgres
+        for shard_id in SHARD_URLS:
+            shard_backlog = redis_client.zcount(expiry_index_key(shard_id), "-inf", now)
+            workers = min(
+                CLEANUP_PARALLELISM, math.ceil(shard_backlog / CLEANUP_BATCH_SIZE)
+            )
+            subtasks.extend(drain_expired_secrets.s(shard_id) for _ in range(workers))
+            backlog += shard_backlog
+
+        if not subtasks:
+            return {"backlog": 0, "dispatched": 0}
 
+        # Подзадачи всех шардов выполняются параллельно
+        group(subtasks).apply_async()
+        logger.info(
+            f"Истёкших секретов в индексах: {backlog}, подзадач: {len(subtasks)}"
+        )
+
+        return {"backlog": backlog, "dispatched": len(subtasks)}
+    except Exception as e:
+        logger.exception("Ошибка при очистке просроченных секретов: %s", e)
+        raise
+
+
+@celery.task(name="drain_expired_secrets")
+def drain_expired_secrets(shard_id: int = 0):
+    """Удаляет секреты шарда из индекса истечения пачками, пока они не закончатся"""
     try:
-        engine = create_engine(DATABASE_URL)
-        SessionLocal = sessionmaker(engine)
-
-        with SessionLocal() as db:
-            now = datetime.now(timezone.utc)
-            logger.info(f"Текущее время UTC: {now}")
-
-            # Получаем просроченные секреты с явным приведением времени
-            expired_secrets = (
-                db.execute(
-                    select(Secret).where(
-                        and_(
-                            Secret.expires_at != None,
-                            Secret.expires_at
-                            <= now,  # Используем прямое сравнение с now
+        started = time.perf_counter()
+        deleted = 0
+        index_key = expiry_index_key(shard_id)
+
+        with get_engine(shard_id).connect() as conn:
+            while True:
+                claimed = claim_due(shard_id, CLEANUP_BATCH_SIZE)
+                if not claimed:
+                    break
+
+                # В индексе ключи API, в запросах - UUID строк
+                keys = {parse_key(secret_key)[1]: secret_key for secret_key in claimed}
+
+                try:
+                    with conn.begin():
+                        expired = conn.execute(
+                            delete_expired_by_keys, {"secret_keys": list(keys)}
+                        ).all()
+                        log_auto_delete(conn, expired)
+
+                        # Уже прочитанные секреты просто выпадают из индекса, а
+                        # не истёкшие по часам БД возвращаются в него
+                        leftover = keys.keys() - {row.secret_key for row in expired}
+                        pending = (
+                            conn.execute(
+                                select_pending_expiry, {"secret_keys": list(leftover)}
+                            ).all()
+                            if leftover
+                            else []
                         )
+                except Exception:
+                    redis_client.zadd(index_key, claimed)
+                    raise
+
+                if pending:
+                    redis_client.zadd(
+                        index_key,
+                        {
+                            keys[row.secret_key]: row.expires_at.timestamp()
+                            for row in pending
+                        },
                     )
-                )
-                .scalars()
-                .all()
+                unlink_cached(shard_id, expired)
+                deleted += len(expired)
+
+                if len(claimed) < CLEANUP_BATCH_SIZE:
+                    break
+                # Все ключи пачки вернулись в индекс: часы БД отстают от часов
+                # воркера, и следующий проход забрал бы те же ключи
+                if len(pending) == len(claimed):
+                    break
+
+        return report(deleted, started)
+    except Exception as e:
+        logger.exception("Ошибка при очистке просроченных секретов: %s", e)
+        raise
+
+
+@celery.task(name="reconcile_expired_secrets")
+def reconcile_expired_secrets(shard_id: int = 0):
+    """Удаляет просроченные секреты шарда полным проходом по таблице"""
+    logger.info(f"Начинаем сверку просроченных секретов с таблицей шарда {shard_id}")
+
+    try:
+        started = time.perf_counter()
+        deleted = 0
+
+        with get_engine(shard_id).connect() as conn:
+            while True:
+                # Каждая пачка в своей короткой транзакции
+                with conn.begin():
+                    expired = conn.execute(
+                        delete_expired_batch, {"batch_size": CLEANUP_BATCH_SIZE}
+                    ).all()
+                    log_auto_delete(conn, expired)
+
+                unlink_cached(shard_id, expired)
+                deleted += len(expired)
+
+                if len(expired) < CLEANUP_BATCH_SIZE:
+                    break
+
+        return report(deleted, started)
+    except Exception as e:
+        logger.exception("Ошибка при очистке просроченных секретов: %s", e)
+        raise
+
+
+@celery.task(name="rebuild_expiry_index")
+def rebuild_expiry_index():
+    """
+    Заново заполняет индексы истечения из таблиц secrets всех шардов,
+    например после очистки Redis:
+    celery -A services.celery_service call rebuild_expiry_index
+    """
+    try:
+        indexed = 0
+        for shard_id in SHARD_URLS:
+            indexed += rebuild_shard_expiry_index(shard_id)
+
+        logger.info(f"В индекс истечения добавлено {indexed} секретов")
+        return {"indexed": indexed}
+    except Exception as e:
+        logger.exception("Ошибка при перестроении индекса истечения: %s", e)
+        raise
+
+
+def rebuild_shard_expiry_index(shard_id: int) -> int:
+    indexed = 0
+    last_id = 0
+
+    with read_connection(shard_id) as conn:
+        while True:
+            rows = conn.execute(
+                select(Secret.id, Secret.secret_key, Secret.expires_at)
+                .where(Secret.expires_at.is_not(None), Secret.id > last_id)
+                .order_by(Secret.id)
+                .limit(CLEANUP_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+
+            redis_client.zadd(
+                expiry_index_key(shard_id),
+                {
+                    format_key(shard_id, row.secret_key): row.expires_at.timestamp()
+                    for row in rows
+                },
+            )
+            indexed += len(rows)
+            last_id = rows[-1].id
+
+    return indexed
+
+
+update_rotated_secret = (
+    update(Secret)
+    .where(Secret.id == bindparam("row_id"))
+    .values(
+        secret=bindparam("new_secret"),
+        passphrase=bindparam("new_passphrase"),
+        blob_digest=bindparam("new_blob_digest"),
+    )
+)
+
+
+def rotated(encrypted_data: bytes | None) -> bytes | None:
+    if EncryptionService.needs_rotation(encrypted_data):
+        return EncryptionService.rotate(encrypted_data)
+    return encrypted_data
+
+
+def rotated_blob(blob_digest: str | None) -> str | None:
+    """Перешифрованная копия файла пишется рядом, прежний удаляется после коммита"""
+    if blob_digest is None:
+        return None
+
+    encrypted_data = BlobStore.read(blob_digest)
+    if not EncryptionService.needs_rotation(encrypted_data):
+        return blob_digest
+    return BlobStore.write(EncryptionService.rotate(encrypted_data))
+
+
+@celery.task(name="rotate_encryption_keys", bind=True)
+def rotate_encryption_keys(self):
+    """
+    Перешифровывает secrets.secret, secrets.passphrase и файлы хранилища
+    основным ключом во всех шардах.
+    Идёт пачками по id и хранит позицию шарда в Redis, поэтому после остановки
+    продолжает с того же места:
+    celery -A services.celery_service call rotate_encryption_keys
+    """
+    try:
+        scanned = 0
+        rewritten = 0
+        started = time.perf_counter()
+
+        for shard_id in SHARD_URLS:
+            shard_scanned, shard_rewritten = rotate_shard(self, shard_id)
+            scanned += shard_scanned
+            rewritten += shard_rewritten
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Ротация ключей завершена за %.1f с: перешифровано %s из %s",
+            elapsed,
+            rewritten,
+            scanned,
+        )
+
+        return {"scanned": scanned, "rotated": rewritten, "seconds": round(elapsed, 3)}
+    except Exception as e:
+        logger.exception("Ошибка при ротации ключей: %s", e)
+        raise
+
+
+def rotate_batch(conn, shard_id: int, condition, skip_locked: bool = True):
+    """
+    Перешифровывает пачку строк по условию в одной транзакции. Возвращает
+    строки пачки, число переписанных и id строк, пропущенных из-за блокировки
+    """
+    with conn.begin():
+        conn.execute(
+            select(
+                func.set_config("statement_timeout", ROTATION_STATEMENT_TIMEOUT, True)
+            )
+        )
+        rows = conn.execute(
+            select(
+                Secret.id,
+                Secret.secret_key,
+                Secret.secret,
+                Secret.passphrase,
+                Secret.blob_digest,
             )
+            .where(condition)
+            .order_by(Secret.id)
+            .limit(ROTATION_BATCH_SIZE)
+            .with_for_update(skip_locked=skip_locked)
+        ).all()
 
-            logger.info(f"Найдено просроченных секретов: {len(expired_secrets)}")
-
-            for secret in expired_secrets:
-                redis_client.delete(f"secret:{secret.id}")
-
-                logger.info(f"Удаляем просроченный секрет:")
-                logger.info(f"  ID: {secret.id}")
-                logger.info(f"  Создан: {secret.created_at}")
-                logger.info(f"  Истекает: {secret.expires_at}")
-                logger.info(f"  Текущее время: {now}")
-
-                log_entry = SecretLog(
-                    secret_id=secret.id,
-                    action="auto_delete",
-                    ip_address="system",
-                    user_agent="Celery Task",
-                    ttl_seconds=secret.ttl_seconds,
-                    timestamp=now,
-                    additional_info=f"Secret expired. Created: {secret.created_at}, Expires: {secret.expires_at}",
+        # Строки, которые сейчас читают или удаляют, пропускаются. Если чтение
+        # откатится, строка останется со старым ключом, поэтому их id возвращаются
+        skipped = []
+        if skip_locked:
+            bounds = [condition] + ([Secret.id <= rows[-1].id] if rows else [])
+            locked = {row.id for row in rows}
+            skipped = [
+                row_id
+                for row_id in conn.execute(select(Secret.id).where(*bounds)).scalars()
+                if row_id not in locked
+            ]
+
+        updates = []
+        rotated_keys = []
+        replaced_blobs = []
+        for row in rows:
+            new_secret = rotated(row.secret)
+            new_passphrase = rotated(row.passphrase)
+            new_blob_digest = rotated_blob(row.blob_digest)
+            if new_blob_digest != row.blob_digest:
+                replaced_blobs.append(row.blob_digest)
+            if (
+                new_secret is not row.secret
+                or new_passphrase is not row.passphrase
+                or new_blob_digest != row.blob_digest
+            ):
+                updates.append(
+                    {
+                        "row_id": row.id,
+                        "new_secret": new_secret,
+                        "new_passphrase": new_passphrase,
+                        "new_blob_digest": new_blob_digest,
+                    }
                 )
-                db.add(log_entry)
-                db.delete(secret)
+                rotated_keys.append(row.secret_key)
+        if updates:
+            conn.execute(update_rotated_secret, updates)
+
+    BlobStore.unlink_many(replaced_blobs)
+    # В кеше копия прежнего шифротекста и digest удалённого файла
+    if rotated_keys:
+        redis_client.unlink(
+            *(
+                f"secret:{format_key(shard_id, secret_key)}"
+                for secret_key in rotated_keys
+            )
+        )
+    return rows, len(updates), skipped
+
+
+def rotate_shard(task, shard_id: int) -> tuple[int, int]:
+    cursor_key = (
+        ROTATION_CURSOR_KEY if shard_id == 0 else f"{ROTATION_CURSOR_KEY}:{shard_id}"
+    )
+    # Пропущенные строки хранятся рядом с позицией и переживают перезапуск задачи
+    skipped_key = f"{cursor_key}:skipped"
+    last_id = int(redis_client.get(cursor_key) or 0)
+    scanned = 0
+    rewritten = 0
+
+    with get_engine(shard_id).connect() as conn:
+        max_id = conn.execute(select(func.max(Secret.id))).scalar() or 0
+        conn.commit()
+        logger.info(
+            "Ротация ключей шарда %s: продолжаем с id %s из %s",
+            shard_id,
+            last_id,
+            max_id,
+        )
+
+        while True:
+            rows, updated, skipped = rotate_batch(conn, shard_id, Secret.id > last_id)
+            if skipped:
+                redis_client.sadd(skipped_key, *skipped)
+            if not rows:
+                break
+
+            last_id = rows[-1].id
+            scanned += len(rows)
+            rewritten += updated
+            redis_client.set(cursor_key, last_id)
+
+            progress = {
+                "shard": shard_id,
+                "last_id": last_id,
+                "max_id": max_id,
+                "scanned": scanned,
+                "rotated": rewritten,
+            }
+            if task.request.id:
+                task.update_state(state="PROGRESS", meta=progress)
+            logger.info(
+                "Ротация ключей шарда %s: id %s из %s, перешифровано %s из %s",
+                shard_id,
+                last_id,
+                max_id,
+                rewritten,
+                scanned,
+            )
+
+            time.sleep(ROTATION_BATCH_DELAY)
+
+        # Пропущенные строки дожидаются снятия блокировки. Прочитанные
+        # за это время секреты удалены и просто не находятся
+        while True:
+            skipped = [
+                int(row_id)
+                for row_id in redis_client.srandmember(skipped_key, ROTATION_BATCH_SIZE)
+            ]
+            if not skipped:
+                break
+
+            rows, updated, _ = rotate_batch(
+                conn, shard_id, Secret.id.in_(skipped), skip_locked=False
+            )
+            scanned += len(rows)
+            rewritten += updated
+            redis_client.srem(skipped_key, *skipped)
 
-            db.commit()
-            logger.info(f"Удалено {len(expired_secrets)} просроченных секретов")
+    redis_client.delete(cursor_key, skipped_key)
+    return scanned, rewritten
 
-        return f"Удалено {len(expired_secrets)} просроченных секретов"
+
+@celery.task(name="sweep_orphan_blobs")
+def sweep_orphan_blobs():
+    """
+    Удаляет файлы хранилища без строки в secrets: они остаются, если процесс
+    упал между коммитом и удалением файла или запись строки не удалась
+    """
+    try:
+        checked = 0
+        removed = 0
+
+        # Хранилище общее для всех шардов: файл брошен, если на него
+        # не ссылается ни один шард
+        with contextlib.ExitStack() as stack:
+            connections = [
+                stack.enter_context(read_connection(shard_id))
+                for shard_id in SHARD_URLS
+            ]
+            digests = BlobStore.scan(BLOB_SWEEP_GRACE)
+            while batch := list(itertools.islice(digests, CLEANUP_BATCH_SIZE)):
+                known = set()
+                for conn in connections:
+                    known.update(
+                        conn.execute(
+                            select(Secret.blob_digest).where(
+                                Secret.blob_digest.in_(batch)
+                            )
+                        ).scalars()
+                    )
+                    conn.commit()
+
+                orphans = [digest for digest in batch if digest not in known]
+                BlobStore.unlink_many(orphans)
+                checked += len(batch)
+                removed += len(orphans)
+
+        logger.info(
+            f"Проверено файлов хранилища: {checked}, удалено брошенных: {removed}"
+        )
+        return {"checked": checked, "removed": removed}
+    except Exception as e:
+        logger.exception("Ошибка при очистке файлового хранилища: %s", e)
+        raise
+
+
+@celery.task(name="maintain_log_partitions")
+def maintain_log_partitions(shard_id: int = 0):
+    """
+    Создаёт будущие секции журнала шарда и удаляет секции старше
+    AUDIT_RETENTION_DAYS целиком, без построчного DELETE
+    """
+    try:
+        with get_engine(shard_id).begin() as conn:
+            created = ensure_partitions(conn)
+
+        removed = []
+        with get_engine(shard_id).connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT")
+            for name in expired_partitions(conn):
+                drop_partition(conn, name)
+                removed.append(name)
+
+        if created or removed:
+            logger.info(
+                f"Секции журнала шарда {shard_id}: создано {created}, удалено {removed}"
+            )
+        return {"created": created, "removed": removed}
     except Exception as e:
-        logger.error(f"Ошибка при очистке просроченных секретов: {e}", exc_info=True)
+        logger.exception("Ошибка при обслуживании секций журнала: %s", e)
         raise
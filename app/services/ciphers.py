@@ -0,0 +1,159 @@
+import os
+
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.keywrap import aes_key_unwrap, aes_key_wrap
+
+# Первый байт шифротекста AES-GCM. Токены Fernet начинаются с "g" (0x67),
+# поэтому форматы различаются без отдельной колонки
+AESGCM_ENVELOPE = 0x01
+# Заголовок потокового секрета, сами фрагменты хранятся отдельно
+AESGCM_STREAM = 0x02
+
+HEADER_SIZE = 2
+NONCE_SIZE = 12
+WRAPPED_KEY_SIZE = 40
+STREAM_NONCE_PREFIX_SIZE = 7
+
+
+class FernetCipher:
+    """Fernet (AES-CBC + HMAC) со списком ключей, первый ключ - основной"""
+
+    def __init__(self, keys: list[bytes]):
+        self._primary = Fernet(keys[0])
+        self._fernet = MultiFernet([Fernet(key) for key in keys])
+
+    def encrypt(self, data: bytes) -> bytes:
+        return self._fernet.encrypt(data)
+
+    def decrypt(self, token: bytes) -> bytes:
+        return self._fernet.decrypt(token)
+
+    def needs_rotation(self, token: bytes) -> bool:
+        try:
+            self._primary.decrypt(token)
+            return False
+        except Exception:
+            return True
+
+    def rotate(self, token: bytes) -> bytes:
+        return self._fernet.rotate(token)
+
+
+class AesGcmStreamFrames:
+    """
+    Шифрование потока фрагментами (конструкция STREAM).
+
+    Nonce фрагмента: префикс (7) | номер фрагмента (4) | признак последнего (1),
+    поэтому перестановка, пропуск и обрезка фрагментов обнаруживаются при расшифровке.
+    """
+
+    def __init__(self, header: bytes, data_key: bytes, nonce_prefix: bytes):
+        self.header = header
+        self._aead = AESGCM(data_key)
+        self._nonce_prefix = nonce_prefix
+        # В AAD не входит id мастер-ключа, чтобы ротация меняла только заголовок
+        self._aad = bytes((AESGCM_STREAM,)) + nonce_prefix
+        self._seq = 0
+
+    def encrypt_chunk(self, data: bytes, final: bool) -> bytes:
+        return self._aead.encrypt(self._next_nonce(final), data, self._aad)
+
+    def decrypt_chunk(self, frame: bytes, final: bool) -> bytes:
+        return self._aead.decrypt(self._next_nonce(final), frame, self._aad)
+
+    def _next_nonce(self, final: bool) -> bytes:
+        nonce = self._nonce_prefix + self._seq.to_bytes(4, "big") + bytes((final,))
+        self._seq += 1
+        return nonce
+
+
+class AesGcmEnvelopeCipher:
+    """
+    Конвертное шифрование AES-256-GCM.
+
+    Каждый секрет шифруется своим ключом данных, который заворачивается
+    мастер-ключом (AES Key Wrap). Формат:
+    версия (1) | id мастер-ключа (1) | ключ данных (40) | nonce (12) | шифротекст и тег
+    """
+
+    def __init__(self, master_keys: dict[int, bytes], primary_key_id: int):
+        for key_id, master_key in master_keys.items():
+            if len(master_key) != 32:
+                raise ValueError(f"Master key {key_id} must be 32 bytes")
+        if primary_key_id not in master_keys:
+            raise ValueError(f"Primary master key {primary_key_id} is not configured")
+
+        self._master_keys = master_keys
+        self._primary_key_id = primary_key_id
+
+    def encrypt(self, data: bytes) -> bytes:
+        header = bytes((AESGCM_ENVELOPE, self._primary_key_id))
+        data_key = AESGCM.generate_key(bit_length=256)
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = AESGCM(data_key).encrypt(nonce, data, header)
+
+        return b"".join(
+            (
+                header,
+                aes_key_wrap(self._master_keys[self._primary_key_id], data_key),
+                nonce,
+                ciphertext,
+            )
+        )
+
+    def decrypt(self, blob: bytes) -> bytes:
+        data_key = self._unwrap(blob)
+        offset = HEADER_SIZE + WRAPPED_KEY_SIZE
+        nonce = blob[offset : offset + NONCE_SIZE]
+        offset += NONCE_SIZE
+
+        return AESGCM(data_key).decrypt(nonce, blob[offset:], blob[:HEADER_SIZE])
+
+    def needs_rotation(self, blob: bytes) -> bool:
+        return blob[1] != self._primary_key_id
+
+    def rotate(self, blob: bytes) -> bytes:
+        """Перешифровывает данные новым ключом данных под основным мастер-ключом"""
+        return self.encrypt(self.decrypt(blob))
+
+    def stream_encryptor(self) -> AesGcmStreamFrames:
+        """
+        Новый поток под основным мастер-ключом. Заголовок:
+        версия (1) | id мастер-ключа (1) | ключ данных (40) | префикс nonce (7)
+        """
+        data_key = AESGCM.generate_key(bit_length=256)
+        nonce_prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+        header = b"".join(
+            (
+                bytes((AESGCM_STREAM, self._primary_key_id)),
+                aes_key_wrap(self._master_keys[self._primary_key_id], data_key),
+                nonce_prefix,
+            )
+        )
+        return AesGcmStreamFrames(header, data_key, nonce_prefix)
+
+    def stream_decryptor(self, header: bytes) -> AesGcmStreamFrames:
+        return AesGcmStreamFrames(
+            header, self._unwrap(header), header[HEADER_SIZE + WRAPPED_KEY_SIZE :]
+        )
+
+    def rotate_stream_header(self, header: bytes) -> bytes:
+        """Перезаворачивает ключ потока основным мастер-ключом, фрагменты не меняются"""
+        return b"".join(
+            (
+                bytes((AESGCM_STREAM, self._primary_key_id)),
+                aes_key_wrap(
+                    self._master_keys[self._primary_key_id], self._unwrap(header)
+                ),
+                header[HEADER_SIZE + WRAPPED_KEY_SIZE :],
+            )
+        )
+
+    def _unwrap(self, blob: bytes) -> bytes:
+        key_id = blob[1]
+        if key_id not in self._master_keys:
+            raise ValueError(f"Unknown master key id {key_id}")
+
+        wrapped_key = blob[HEADER_SIZE : HEADER_SIZE + WRAPPED_KEY_SIZE]
+        return aes_key_unwrap(self._master_keys[key_id], wrapped_key)
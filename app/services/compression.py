@@ -0,0 +1,74 @@
+import os
+import zlib
+
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+# off - без сжатия; auto - zstd, если установлен, иначе zlib; zlib или zstd.
+# Выключено по умолчанию: длина шифротекста выдаёт сжимаемость секрета
+COMPRESSION = os.getenv("COMPRESSION", "off")
+# Меньшие данные не сжимаются: выигрыш не окупает заголовок и время
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 512))
+# Сжатый результат сохраняется, только если он не больше этой доли исходного
+COMPRESSION_MAX_RATIO = float(os.getenv("COMPRESSION_MAX_RATIO", 0.9))
+
+# Байты 0xFE и 0xFF не встречаются в UTF-8, поэтому открытый текст записей,
+# созданных до сжатия, никогда не начинается с них
+ZLIB = 0xFE
+ZSTD = 0xFF
+
+SAMPLE_SIZE = 4096
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _algorithm() -> int | None:
+    if COMPRESSION == "off":
+        return None
+    if COMPRESSION == "zlib" or zstandard is None:
+        return ZLIB
+    return ZSTD
+
+
+def _compressible(data: bytes) -> bool:
+    """Пробное быстрое сжатие начала данных отсекает случайные и уже сжатые данные"""
+    sample = data[:SAMPLE_SIZE]
+    return len(zlib.compress(sample, 1)) <= len(sample) * COMPRESSION_MAX_RATIO
+
+
+def compress(data: bytes) -> bytes:
+    """Сжимает открытый текст перед шифрованием, если это выгодно"""
+    algorithm = _algorithm()
+    if algorithm is None or len(data) < COMPRESSION_MIN_SIZE:
+        return data
+    if not _compressible(data):
+        return data
+
+    if algorithm == ZSTD:
+        compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    else:
+        compressed = zlib.compress(data, ZLIB_LEVEL)
+
+    if len(compressed) + 1 > len(data) * COMPRESSION_MAX_RATIO:
+        return data
+    return bytes((algorithm,)) + compressed
+
+
+def decompress(data: bytes) -> bytes:
+    """Разжимает данные по байту заголовка, несжатые возвращает как есть"""
+    if not data:
+        return data
+
+    if data[0] == ZLIB:
+        return zlib.decompress(data[1:])
+    if data[0] == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this secret")
+        return zstandard.ZstdDecompressor().decompress(data[1:])
+    return data
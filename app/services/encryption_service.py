@@ -1,36 +1,224 @@
+import asyncio
+import base64
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 
+from services.ciphers import (
+    AESGCM_ENVELOPE,
+    AESGCM_STREAM,
+    AesGcmEnvelopeCipher,
+    AesGcmStreamFrames,
+    FernetCipher,
+)
+from services.compression import compress, decompress
+from services.metrics import DECRYPT_LATENCY, ENCRYPT_LATENCY
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# aesgcm - конвертное шифрование AES-GCM, fernet - прежний формат
+ENCRYPTION_ENGINE = os.getenv("ENCRYPTION_ENGINE", "aesgcm")
+
+# Данные крупнее порога шифруются в пуле потоков, чтобы не блокировать event loop
+ENCRYPTION_OFFLOAD_THRESHOLD = int(os.getenv("ENCRYPTION_OFFLOAD_THRESHOLD", 64 * 1024))
+ENCRYPTION_THREADS = int(os.getenv("ENCRYPTION_THREADS", min(4, os.cpu_count() or 1)))
+
+
+def _fernet_keys() -> list[bytes]:
+    """ENCRYPTION_KEYS - ключи Fernet через запятую, первый основной"""
+    keys = os.getenv("ENCRYPTION_KEYS") or os.getenv("ENCRYPTION_KEY")
+    return [key.strip().encode() for key in keys.split(",") if key.strip()]
+
+
+def _master_keys() -> dict[int, bytes]:
+    """MASTER_KEYS - мастер-ключи в виде id:base64 через запятую"""
+    keys = {}
+    for item in os.getenv("MASTER_KEYS", "").split(","):
+        if item.strip():
+            key_id, key = item.split(":", 1)
+            keys[int(key_id)] = base64.urlsafe_b64decode(key.strip())
+
+    if os.getenv("MASTER_KEY"):
+        keys[MASTER_KEY_ID] = base64.urlsafe_b64decode(os.getenv("MASTER_KEY"))
+    return keys
+
+
+# Основной мастер-ключ, которым шифруются новые данные
+MASTER_KEY_ID = int(os.getenv("MASTER_KEY_ID", 1))
+MASTER_KEYS = _master_keys()
+
 
 class EncryptionService:
     """Простой сервис шифрования"""
 
-    ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
+    # Fernet остаётся для чтения записей, созданных до перехода на AES-GCM
+    _fernet = FernetCipher(_fernet_keys())
+    _aesgcm = AesGcmEnvelopeCipher(MASTER_KEYS, MASTER_KEY_ID) if MASTER_KEYS else None
+    _cipher = _fernet if ENCRYPTION_ENGINE == "fernet" else _aesgcm
+    if _cipher is None:
+        raise RuntimeError("MASTER_KEY is required for the aesgcm encryption engine")
 
-    _cipher = Fernet(
-        ENCRYPTION_KEY.encode() if isinstance(ENCRYPTION_KEY, str) else ENCRYPTION_KEY
+    _executor = ThreadPoolExecutor(
+        max_workers=ENCRYPTION_THREADS, thread_name_prefix="encryption"
     )
 
     @classmethod
-    def encrypt(cls, data: str) -> str:
-        """Шифрует текст"""
-        if not data:
-            return data
+    def encrypt(cls, data: str) -> bytes:
+        """Сжимает, если это выгодно, и шифрует текст"""
+        if data is None:
+            return None
+
+        started = time.perf_counter()
+        encrypted = cls._cipher.encrypt(compress(data.encode()))
+        ENCRYPT_LATENCY.observe(time.perf_counter() - started)
+        return encrypted
+
+    @classmethod
+    def decrypt(cls, encrypted_data: bytes | str) -> str:
+        """Расшифровывает текст в любом из поддерживаемых форматов"""
+        if encrypted_data is None:
+            return None
+        if not encrypted_data:
+            # Пустые значения до перехода на AES-GCM хранились без шифрования
+            return ""
+
+        if isinstance(encrypted_data, str):
+            encrypted_data = encrypted_data.encode()
 
-        return cls._cipher.encrypt(data.encode()).decode()
+        started = time.perf_counter()
+        try:
+            plaintext = cls._cipher_for(encrypted_data).decrypt(encrypted_data)
+            return decompress(plaintext).decode()
+        except Exception as e:
+            # Текст исключения не содержит данных, только его тип
+            logger.warning("Ошибка расшифровки: %s", type(e).__name__)
+            return None
+        finally:
+            DECRYPT_LATENCY.observe(time.perf_counter() - started)
 
     @classmethod
-    def decrypt(cls, encrypted_data: str) -> str:
-        """Расшифровывает текст"""
+    def needs_rotation(cls, encrypted_data: bytes | None) -> bool:
+        """Зашифрованы ли данные не основным ключом или не текущим движком"""
         if not encrypted_data:
-            return encrypted_data
+            return False
+
+        if cls.is_stream(encrypted_data):
+            return cls._aesgcm.needs_rotation(encrypted_data)
+
+        cipher = cls._cipher_for(encrypted_data)
+        return cipher is not cls._cipher or cipher.needs_rotation(encrypted_data)
+
+    @classmethod
+    def rotate(cls, encrypted_data: bytes) -> bytes:
+        """Перешифровывает данные основным ключом текущего движка"""
+        if cls.is_stream(encrypted_data):
+            return cls._aesgcm.rotate_stream_header(encrypted_data)
+
+        cipher = cls._cipher_for(encrypted_data)
+        if cipher is cls._cipher:
+            return cipher.rotate(encrypted_data)
+        return cls._cipher.encrypt(cipher.decrypt(encrypted_data))
+
+    @classmethod
+    def is_stream(cls, encrypted_data: bytes | None) -> bool:
+        """Является ли значение заголовком потокового секрета"""
+        return bool(encrypted_data) and encrypted_data[0] == AESGCM_STREAM
 
+    @classmethod
+    def stream_encryptor(cls) -> AesGcmStreamFrames:
+        """Шифратор потока фрагментами, заголовок доступен в .header"""
+        return cls._stream_cipher().stream_encryptor()
+
+    @classmethod
+    def stream_decryptor(cls, header: bytes) -> AesGcmStreamFrames | None:
+        """
+        Расшифровщик потока по сохранённому заголовку или None, если заголовок
+        повреждён или зашифрован неизвестным ключом
+        """
+        cipher = cls._stream_cipher()
         try:
-            return cls._cipher.decrypt(encrypted_data.encode()).decode()
+            return cipher.stream_decryptor(header)
         except Exception as e:
-            print(f"Ошибка расшифровки: {e}")
+            logger.warning("Ошибка расшифровки заголовка потока: %s", type(e).__name__)
             return None
+
+    @classmethod
+    def _stream_cipher(cls) -> AesGcmEnvelopeCipher:
+        if cls._aesgcm is None:
+            raise RuntimeError("MASTER_KEY is required for streamed secrets")
+        return cls._aesgcm
+
+    @classmethod
+    def _cipher_for(cls, encrypted_data: bytes):
+        if encrypted_data[0] == AESGCM_ENVELOPE:
+            return cls._aesgcm
+        return cls._fernet
+
+    @classmethod
+    def encrypt_many(cls, values: list[str]) -> list[bytes]:
+        """Шифрует список значений"""
+        return [cls.encrypt(value) for value in values]
+
+    @classmethod
+    def decrypt_many(cls, values: list[bytes]) -> list[str]:
+        """Расшифровывает список значений"""
+        return [cls.decrypt(value) for value in values]
+
+    @classmethod
+    async def aencrypt(cls, data: str) -> bytes:
+        """Шифрует текст, крупные данные - в пуле потоков"""
+        return await cls._offload(cls.encrypt, data, _size(data))
+
+    @classmethod
+    async def adecrypt(cls, encrypted_data: bytes | str) -> str:
+        """Расшифровывает текст, крупные данные - в пуле потоков"""
+        return await cls._offload(cls.decrypt, encrypted_data, _size(encrypted_data))
+
+    @classmethod
+    async def aencrypt_many(cls, values: list[str]) -> list[bytes]:
+        """Шифрует список значений одним заданием пула потоков"""
+        return await cls._offload(cls.encrypt_many, values, sum(map(_size, values)))
+
+    @classmethod
+    async def adecrypt_many(cls, values: list[bytes]) -> list[str]:
+        """Расшифровывает список значений одним заданием пула потоков"""
+        return await cls._offload(cls.decrypt_many, values, sum(map(_size, values)))
+
+    @classmethod
+    async def aencrypt_chunk(
+        cls, frames: AesGcmStreamFrames, data: bytes, final: bool
+    ) -> bytes:
+        """Шифрует очередной фрагмент потока, крупные фрагменты - в пуле потоков"""
+        return await cls._offload(
+            partial(frames.encrypt_chunk, final=final), data, len(data)
+        )
+
+    @classmethod
+    async def adecrypt_chunk(
+        cls, frames: AesGcmStreamFrames, frame: bytes, final: bool
+    ) -> bytes:
+        """Расшифровывает очередной фрагмент потока"""
+        return await cls._offload(
+            partial(frames.decrypt_chunk, final=final), frame, len(frame)
+        )
+
+    @classmethod
+    async def _offload(cls, func, arg, size: int):
+        if size < ENCRYPTION_OFFLOAD_THRESHOLD:
+            return func(arg)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls._executor, func, arg)
+
+
+def _size(value) -> int:
+    """Размер в байтах: порог сравнивается с объёмом данных, а не числом символов"""
+    if not value:
+        return 0
+    return len(value.encode()) if isinstance(value, str) else len(value)
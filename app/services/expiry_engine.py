@@ -0,0 +1,93 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from services.timing_wheel import TimingWheel
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# celery - истечение через задачи Celery, inprocess - колесо таймеров в приложении
+EXPIRY_ENGINE = os.getenv("EXPIRY_ENGINE", "celery")
+EXPIRY_TICK = float(os.getenv("EXPIRY_TICK", 0.5))
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", 1000))
+# Через сколько секунд повторить удаление пачки после ошибки
+EXPIRY_RETRY_DELAY = 5.0
+
+
+class ExpiryEngine:
+    """Истечение секретов внутри приложения на иерархическом колесе таймеров"""
+
+    _wheel: TimingWheel | None = None
+    _task: asyncio.Task | None = None
+    _store = None
+
+    @classmethod
+    def schedule(cls, secret_key: str, expires_at):
+        """Ставит таймер истечения секрета"""
+        if cls._wheel is not None and expires_at is not None:
+            cls._wheel.add(secret_key, expires_at.timestamp())
+
+    @classmethod
+    def cancel(cls, secret_key: str):
+        """Снимает таймер прочитанного или удалённого секрета"""
+        if cls._wheel is not None:
+            cls._wheel.cancel(secret_key)
+
+    @classmethod
+    async def start(cls, store):
+        """Загружает предстоящие истечения из хранилища и запускает колесо"""
+        if EXPIRY_ENGINE != "inprocess" or cls._task is not None:
+            return
+
+        cls._store = store
+        cls._wheel = TimingWheel(EXPIRY_TICK, time.time())
+        await cls._load()
+        cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls):
+        if cls._task is None:
+            return
+
+        cls._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await cls._task
+        cls._task = None
+        cls._wheel = None
+        cls._store = None
+
+    @classmethod
+    async def _load(cls):
+        async for secret_key, expires_at in cls._store.pending_expiry():
+            cls._wheel.add(secret_key, expires_at)
+
+        logger.info("Expiry engine loaded %d timers", len(cls._wheel))
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            await asyncio.sleep(EXPIRY_TICK)
+            due = cls._wheel.advance(time.time())
+
+            for i in range(0, len(due), EXPIRY_BATCH_SIZE):
+                batch = due[i : i + EXPIRY_BATCH_SIZE]
+                try:
+                    await cls._expire(batch)
+                except Exception as e:
+                    logger.error("Error expiring secrets: %s", e)
+                    retry_at = time.time() + EXPIRY_RETRY_DELAY
+                    for secret_key in batch:
+                        cls._wheel.add(secret_key, retry_at)
+
+    @classmethod
+    async def _expire(cls, secret_keys: list[str]):
+        """Удаляет пачку истёкших секретов, не истёкшие ставятся обратно на их срок"""
+        pending = await cls._store.expire(secret_keys)
+        for secret_key, expires_at in pending.items():
+            cls._wheel.add(secret_key, expires_at)
@@ -0,0 +1,201 @@
+"""
+Журналирование приложения и воркеров Celery.
+
+Записи кладутся в очередь в потоке, который пишет в журнал, а форматируются
+в JSON и выводятся отдельным потоком (QueueListener), поэтому запрос не ждёт
+вывода в stdout. При переполнении очереди записи отбрасываются. Повторяющиеся
+предупреждения и ошибки ограничиваются LOG_RATE_LIMIT записями на шаблон
+сообщения за LOG_RATE_INTERVAL секунд.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Уровни отдельных модулей: services.redis_service=WARNING,uvicorn.access=ERROR
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", 10))
+LOG_RATE_INTERVAL = float(os.getenv("LOG_RATE_INTERVAL", 60))
+
+# Поля, значения которых никогда не попадают в журнал: ключ секрета даёт
+# доступ к нему так же, как сам секрет
+SENSITIVE_FIELDS = frozenset({"secret", "passphrase", "secret_key"})
+
+# Ключ секрета в пути и фраза в строке запроса журнала доступа uvicorn
+_SECRET_PATH = re.compile(r"(/secrets/)(?!stream(?:[/?]|$))[^/?]+")
+_PASSPHRASE_QUERY = re.compile(r"(passphrase=)[^&]*")
+
+# Атрибуты LogRecord, остальные атрибуты пришли через extra=. color_message
+# добавляет uvicorn для цветного вывода в консоль
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "color_message",
+}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON, поля из extra= добавляются как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS:
+                entry[name] = "***" if name in SENSITIVE_FIELDS else value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Пропускает не больше limit записей одного шаблона за interval секунд.
+    Ограничиваются только WARNING и выше: ошибки при недоступном Redis или
+    базе повторяются на каждом запросе, а число отброшенных записей
+    сообщается в поле suppressed следующей пропущенной.
+    """
+
+    def __init__(
+        self, limit: int = LOG_RATE_LIMIT, interval: float = LOG_RATE_INTERVAL
+    ):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        # (логгер, шаблон) -> [начало окна, пропущено, отброшено]
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.limit <= 0:
+            return True
+
+        now = time.monotonic()
+        key = (record.name, record.msg)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+
+            window[2] += 1
+            return False
+
+
+class AccessLogFilter(logging.Filter):
+    """
+    Скрывает ключ секрета в пути и фразу в строке запроса журнала доступа
+    uvicorn: аргументы записи (клиент, метод, путь, версия HTTP, статус)
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        args = record.args
+        if isinstance(args, tuple) and len(args) == 5 and isinstance(args[2], str):
+            path = _SECRET_PATH.sub(r"\1***", args[2])
+            path = _PASSPHRASE_QUERY.sub(r"\1***", path)
+            record.args = (*args[:2], path, *args[3:])
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не блокирует и не падает при полной очереди"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы подставляются здесь: они могут измениться, пока запись
+        # ждёт в очереди. Трассировка форматируется сразу, в JSON - отдельным полем
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def module_levels(value: str = LOG_LEVELS) -> dict[str, str]:
+    levels = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(**kwargs):
+    """
+    Настраивает корневой логгер на очередь с фоновым выводом. Повторный
+    вызов ничего не делает. Подключается и как обработчик сигнала Celery
+    setup_logging, поэтому принимает лишние аргументы.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    # uvicorn выводит свои журналы сам и синхронно, они переводятся на очередь.
+    # Логгер без обработчиков (--no-access-log) остаётся выключенным
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+    logging.getLogger("uvicorn.access").addFilter(AccessLogFilter())
+
+    for name, level in module_levels().items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Дописывает оставшиеся в очереди записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,105 @@
+import heapq
+import os
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+from services.metrics import SECRETS_EXPIRED
+from services.secret_store import (
+    SYSTEM_CLIENT,
+    SecretExpired,
+    SecretNotFound,
+    SecretStore,
+)
+
+load_dotenv()
+
+# Сколько последних записей журнала держать в памяти
+MEMORY_AUDIT_SIZE = int(os.getenv("MEMORY_AUDIT_SIZE", 100000))
+
+
+class MemorySecretStore(SecretStore):
+    """
+    Секреты в памяти процесса: для одного узла с одним процессом uvicorn
+    и для бенчмарков. После перезапуска секреты и журнал теряются.
+
+    Между чтением и удалением записи нет await, поэтому операции атомарны
+    в пределах цикла событий. Истёкшие секреты удаляются при создании новых.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        # secret_key -> (шифротекст, фраза, ttl_seconds, expires_at)
+        self._secrets = {}
+        # Куча (expires_at, secret_key), записи прочитанных секретов пропускаются
+        self._expiry = []
+        self.audit_log = deque(maxlen=MEMORY_AUDIT_SIZE)
+
+    async def health(self) -> dict:
+        return {"store": self.name, "secrets": len(self._secrets)}
+
+    def _audit(self, secret_key: str, action: str, client: dict, **extra):
+        self.audit_log.append(
+            {
+                "secret_key": secret_key,
+                "action": action,
+                **client,
+                "timestamp": time.time(),
+                **extra,
+            }
+        )
+
+    def _sweep(self, now: float):
+        """Удаляет секреты, срок которых наступил"""
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, secret_key = heapq.heappop(self._expiry)
+            record = self._secrets.get(secret_key)
+            if record is not None and record[3] == expires_at:
+                del self._secrets[secret_key]
+                self._audit(
+                    secret_key, "auto_delete", SYSTEM_CLIENT, ttl_seconds=record[2]
+                )
+                SECRETS_EXPIRED.inc()
+
+    async def create(self, secret_key, secret, passphrase, ttl_seconds, client):
+        now = time.time()
+        self._sweep(now)
+
+        expires_at = None if ttl_seconds is None else now + ttl_seconds
+        self._secrets[secret_key] = (secret, passphrase, ttl_seconds, expires_at)
+        if expires_at is not None:
+            heapq.heappush(self._expiry, (expires_at, secret_key))
+        self._audit(secret_key, "create", client, ttl_seconds=ttl_seconds)
+
+    async def consume(self, secret_key, client) -> bytes:
+        record = self._secrets.pop(secret_key, None)
+        if record is None:
+            raise SecretNotFound(secret_key)
+
+        secret, _, ttl_seconds, expires_at = record
+        if expires_at is not None and expires_at < time.time():
+            self._audit(
+                secret_key,
+                "expired_access",
+                client,
+                ttl_seconds=ttl_seconds,
+                additional_info="Attempt to access expired secret",
+            )
+            raise SecretExpired(secret_key)
+
+        self._audit(secret_key, "delete", client, ttl_seconds=ttl_seconds)
+        return secret
+
+    async def delete(self, secret_key, authorize, client):
+        record = self._secrets.get(secret_key)
+        if record is None:
+            raise SecretNotFound(secret_key)
+
+        authorize(record[1])
+
+        del self._secrets[secret_key]
+        self._audit(
+            secret_key, "delete", client, additional_info="Deleted by user request"
+        )
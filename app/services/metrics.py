@@ -0,0 +1,118 @@
+"""
+Метрики Prometheus.
+
+С несколькими процессами uvicorn каждый процесс пишет значения в файлы
+каталога PROMETHEUS_MULTIPROC_DIR, а /metrics любого процесса собирает
+их вместе. Переменная должна быть в окружении до запуска процессов, каталог
+очищается перед каждым запуском. Метки дочерних метрик создаются заранее,
+на горячем пути остаются только observe() и inc().
+"""
+
+import os
+import time
+
+from fastapi.routing import APIRoute
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    make_asgi_app,
+    multiprocess,
+)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+
+SECRETS_CREATED = Counter("secrets_created_total", "Созданные секреты")
+SECRETS_CONSUMED = Counter("secrets_consumed_total", "Прочитанные секреты")
+SECRETS_EXPIRED = Counter(
+    "secrets_expired_total", "Секреты, удалённые по истечении срока"
+)
+
+AUDIT_DROPPED = Counter(
+    "audit_records_dropped_total", "Записи журнала, отброшенные после всех попыток"
+)
+AUDIT_WORKER_RESTARTS = Counter(
+    "audit_worker_restarts_total", "Перезапуски упавшей фоновой записи журнала"
+)
+
+CACHE_REQUESTS = Counter(
+    "secret_cache_requests_total", "Обращения к кешу секретов", ["result"]
+)
+CACHE_HITS = CACHE_REQUESTS.labels("hit")
+CACHE_MISSES = CACHE_REQUESTS.labels("miss")
+
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Время выполнения команд Redis",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_ERRORS = Counter(
+    "redis_command_errors_total", "Ошибки команд Redis", ["operation"]
+)
+
+ENCRYPTION_LATENCY = Histogram(
+    "encryption_duration_seconds",
+    "Время шифрования и расшифровки одного значения",
+    ["operation"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+    + LATENCY_BUCKETS[4:],
+)
+ENCRYPT_LATENCY = ENCRYPTION_LATENCY.labels("encrypt")
+DECRYPT_LATENCY = ENCRYPTION_LATENCY.labels("decrypt")
+
+
+class TimedRoute(APIRoute):
+    """Маршрут, который замеряет время обработки запроса"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        latency = REQUEST_LATENCY.labels(",".join(sorted(self.methods)), self.path)
+
+        async def timed_handler(request):
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                latency.observe(time.perf_counter() - started)
+
+        return timed_handler
+
+
+def metrics_app():
+    """ASGI-приложение /metrics, в режиме нескольких процессов - общее для всех"""
+    if not MULTIPROC_DIR:
+        return make_asgi_app()
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return make_asgi_app(registry)
+
+
+def mark_process_dead():
+    """Убирает значения live-метрик остановленного процесса"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,409 @@
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import select, text
+
+from database.db import replica_router, shard_engines, shard_ring
+from database.partitions import ensure_partitions
+from database.queries import (
+    consume_statement,
+    delete_expired_by_keys,
+    delete_secret_by_id,
+    insert_chunk,
+    insert_secret,
+    lock_streamed_secret,
+    select_chunks,
+    select_passphrase,
+    select_pending_expiry,
+)
+from database.shards import ShardRing, format_key, parse_key
+from models.secret import Secret
+from services.audit_service import AuditService
+from services.blob_store import BlobStore
+from services.expiry_engine import EXPIRY_BATCH_SIZE, ExpiryEngine
+from services.metrics import SECRETS_EXPIRED
+from services.redis_service import RedisService
+from services.secret_store import (
+    SYSTEM_CLIENT,
+    SecretExpired,
+    SecretNotFound,
+    SecretStore,
+    expires_at_for,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PostgresSecretStore(SecretStore):
+    """
+    Секреты в шардах Postgres, кеш и индекс истечения в Redis, крупные
+    шифротексты в BlobStore, журнал в secret_logs через AuditService
+    """
+
+    name = "postgres"
+    streaming = True
+
+    def new_key(self) -> str:
+        return shard_ring.new_key()
+
+    async def start(self):
+        await RedisService.ping()
+        await self._ensure_partitions()
+        await AuditService.start()
+        await ExpiryEngine.start(self)
+
+    @staticmethod
+    async def _ensure_partitions():
+        """
+        Секции журнала на AUDIT_PARTITIONS_AHEAD периодов вперёд при каждом
+        запуске: без Celery beat их больше никто не создаст. Ошибка не мешает
+        запуску, записи журнала тогда попадают в секцию DEFAULT
+        """
+        for shard_id, shard_engine in shard_engines.items():
+            try:
+                async with shard_engine.begin() as conn:
+                    created = await conn.run_sync(ensure_partitions)
+                if created:
+                    logger.info("Log partitions of shard %d: %s", shard_id, created)
+            except Exception as e:
+                logger.exception("Error creating log partitions: %s", e)
+
+    async def stop(self):
+        await ExpiryEngine.stop()
+        await AuditService.stop()
+        await RedisService.close()
+
+    async def health(self) -> dict:
+        """Запрос идёт на реплику, если она есть"""
+        conn = await replica_router.connect()
+        try:
+            await conn.execute(text("SELECT 1"))
+        finally:
+            await conn.close()
+
+        return {
+            "store": self.name,
+            "database": f"{conn.engine.url.host}:{conn.engine.url.port}",
+            "replicas": replica_router.status(),
+        }
+
+    @staticmethod
+    def _locate(secret_key: str):
+        """
+        Engine шарда из ключа, ключ в каноническом виде для Redis и UUID строки.
+        Для неверного ключа и неизвестного шарда - SecretNotFound.
+        """
+        parsed = parse_key(secret_key)
+        shard_engine = None if parsed is None else shard_engines.get(parsed[0])
+        if shard_engine is None:
+            raise SecretNotFound(secret_key)
+        return shard_engine, format_key(*parsed), parsed[1]
+
+    async def create(self, secret_key, secret, passphrase, ttl_seconds, client):
+        # Крупный шифротекст уходит в файловое хранилище, в строке остаётся digest
+        blob_digest = None
+        if BlobStore.should_store(secret):
+            blob_digest = await BlobStore.awrite(secret)
+            secret = None
+
+        shard_engine, secret_key, key_uuid = self._locate(secret_key)
+        insert_data = {
+            "secret": secret or b"",
+            "blob_digest": blob_digest,
+            "passphrase": passphrase,
+            "ttl_seconds": ttl_seconds,
+            "secret_key": key_uuid,
+            "expires_at": expires_at_for(ttl_seconds),
+            "chunked": False,
+        }
+
+        async with shard_engine.connect() as db:
+            result = await db.execute(insert_secret, insert_data)
+            row = result.one()
+
+            log_data = {
+                "secret_id": row.id,
+                "action": "create",
+                **client,
+                "ttl_seconds": ttl_seconds,
+            }
+            await AuditService.commit(db, log_data)
+
+        # кэша
+        secret_data = {
+            "id": row.id,
+            "secret": secret,
+            "blob_digest": blob_digest,
+            "passphrase": passphrase,
+            "created_at": row.created_at.isoformat(),
+            "expires_at": row.expires_at.isoformat() if row.expires_at else None,
+            "ttl_seconds": ttl_seconds,
+        }
+
+        await RedisService.cache_secret(secret_key, secret_data, row.expires_at)
+        ExpiryEngine.schedule(secret_key, row.expires_at)
+
+    async def consume(self, secret_key, client) -> bytes:
+        shard_engine, secret_key, key_uuid = self._locate(secret_key)
+        cached = await RedisService.pop_cached_secret(secret_key)
+
+        with_audit = AuditService.in_transaction()
+        params = {"secret_key": key_uuid}
+        if with_audit:
+            params.update(client)
+
+        async with shard_engine.connect() as db:
+            result = await db.execute(
+                consume_statement(with_payload=cached is None, with_audit=with_audit),
+                params,
+            )
+            consumed = result.one_or_none()
+            await db.commit()
+
+            if consumed is not None and not with_audit:
+                log_data = {
+                    "secret_id": consumed.id,
+                    "action": "expired_access" if consumed.expired else "delete",
+                    **client,
+                    "ttl_seconds": consumed.ttl_seconds,
+                    "additional_info": (
+                        "Attempt to access expired secret" if consumed.expired else None
+                    ),
+                }
+                await AuditService.record(db, log_data)
+        ExpiryEngine.cancel(secret_key)
+
+        if consumed is None:
+            raise SecretNotFound(secret_key)
+
+        blob_digest = consumed.blob_digest
+        encrypted_secret = consumed.secret if cached is None else cached["secret"]
+
+        if consumed.expired:
+            await BlobStore.aunlink_many([blob_digest])
+            raise SecretExpired(secret_key)
+
+        # Строка уже удалена, поэтому файл больше никто не прочитает
+        if blob_digest is not None:
+            try:
+                encrypted_secret = await BlobStore.aread(blob_digest)
+            finally:
+                await BlobStore.aunlink_many([blob_digest])
+
+        return encrypted_secret
+
+    async def delete(self, secret_key, authorize, client):
+        shard_engine, secret_key, key_uuid = self._locate(secret_key)
+        cached = await RedisService.get_cached_secret(secret_key)
+
+        async with shard_engine.connect() as db:
+            if cached is not None:
+                secret_id = cached["id"]
+                encrypted_passphrase = cached["passphrase"]
+            else:
+                result = await db.execute(select_passphrase, {"secret_key": key_uuid})
+                secret = result.one_or_none()
+                if secret is None:
+                    raise SecretNotFound(secret_key)
+
+                secret_id = secret.id
+                encrypted_passphrase = secret.passphrase
+
+            authorize(encrypted_passphrase)
+
+            result = await db.execute(delete_secret_by_id, {"secret_id": secret_id})
+            deleted = result.one_or_none()
+            if deleted is None:
+                raise SecretNotFound(secret_key)
+
+            log_data = {
+                "secret_id": secret_id,
+                "action": "delete",
+                **client,
+                "additional_info": "Deleted by user request",
+            }
+            await RedisService.delete_cached_secret(secret_key)
+
+            await AuditService.commit(db, log_data)
+        ExpiryEngine.cancel(secret_key)
+        await BlobStore.aunlink_many([deleted.blob_digest])
+
+    async def create_stream(
+        self, secret_key, header, passphrase, ttl_seconds, frames, client
+    ):
+        shard_engine, secret_key, key_uuid = self._locate(secret_key)
+        insert_data = {
+            "secret": header,
+            "blob_digest": None,
+            "passphrase": passphrase,
+            "ttl_seconds": ttl_seconds,
+            "secret_key": key_uuid,
+            "expires_at": expires_at_for(ttl_seconds),
+            "chunked": True,
+        }
+
+        async with shard_engine.connect() as db:
+            result = await db.execute(insert_secret, insert_data)
+            row = result.one()
+
+            seq = 0
+            async for frame in frames:
+                await db.execute(
+                    insert_chunk, {"secret_id": row.id, "seq": seq, "data": frame}
+                )
+                seq += 1
+
+            log_data = {
+                "secret_id": row.id,
+                "action": "create",
+                **client,
+                "ttl_seconds": ttl_seconds,
+            }
+            await AuditService.commit(db, log_data)
+
+        await RedisService.index_expiry(secret_key, row.expires_at)
+        ExpiryEngine.schedule(secret_key, row.expires_at)
+
+    async def open_stream(self, secret_key, client):
+        """
+        Строка потокового секрета блокируется до конца передачи и удаляется
+        после последнего фрагмента. Если передача не завершена, секрет
+        сохраняется, когда итератор закрыт через aclose()
+        """
+        shard_engine, secret_key, key_uuid = self._locate(secret_key)
+        conn = await shard_engine.connect()
+        try:
+            result = await conn.execute(lock_streamed_secret, {"secret_key": key_uuid})
+            secret = result.one_or_none()
+        except BaseException:
+            await conn.close()
+            raise
+
+        if secret is None:
+            await conn.close()
+            return None
+
+        log_data = {
+            "secret_id": secret.id,
+            "action": "delete",
+            **client,
+            "ttl_seconds": secret.ttl_seconds,
+        }
+
+        if secret.expires_at is not None and secret.expires_at < datetime.now(
+            timezone.utc
+        ):
+            try:
+                await conn.execute(delete_secret_by_id, {"secret_id": secret.id})
+                log_data["action"] = "expired_access"
+                log_data["additional_info"] = "Attempt to access expired secret"
+                await AuditService.commit(conn, log_data)
+            finally:
+                await conn.close()
+            ExpiryEngine.cancel(secret_key)
+            raise SecretExpired(secret_key)
+
+        frames = self._frames(conn, secret, secret_key, log_data)
+        # Генератор запускается сразу: дальше соединение и блокировку
+        # освобождает его finally, в том числе при aclose() до чтения фрагментов
+        await anext(frames)
+        return secret.secret, frames
+
+    @staticmethod
+    async def _frames(conn, secret, secret_key: str, log_data: dict):
+        completed = False
+        try:
+            yield
+            chunks = await conn.stream_scalars(
+                select_chunks.execution_options(yield_per=1),
+                {"secret_id": secret.id},
+            )
+            # Признак последнего фрагмента известен, только когда прочитан следующий
+            previous = None
+            async for frame in chunks:
+                if previous is not None:
+                    yield previous, False
+                previous = frame
+            yield previous, True
+
+            await conn.execute(delete_secret_by_id, {"secret_id": secret.id})
+            await AuditService.commit(conn, log_data)
+            completed = True
+            ExpiryEngine.cancel(secret_key)
+        finally:
+            await conn.close()
+            if not completed:
+                # Чтение из кеша уже сняло секрет с индекса истечения
+                await RedisService.index_expiry(secret_key, secret.expires_at)
+                ExpiryEngine.schedule(secret_key, secret.expires_at)
+
+    async def pending_expiry(self):
+        for shard_id, shard_engine in shard_engines.items():
+            last_id = 0
+            async with shard_engine.connect() as conn:
+                while True:
+                    rows = (
+                        await conn.execute(
+                            select(Secret.id, Secret.secret_key, Secret.expires_at)
+                            .where(Secret.expires_at.is_not(None), Secret.id > last_id)
+                            .order_by(Secret.id)
+                            .limit(EXPIRY_BATCH_SIZE)
+                        )
+                    ).all()
+                    if not rows:
+                        break
+
+                    for row in rows:
+                        yield (
+                            format_key(shard_id, row.secret_key),
+                            row.expires_at.timestamp(),
+                        )
+                    last_id = rows[-1].id
+
+    async def expire(self, secret_keys) -> dict[str, float]:
+        """Один запрос на шард"""
+        pending = {}
+        for shard_id, keys in ShardRing.group(secret_keys).items():
+            pending.update(await self._expire_shard(shard_engines[shard_id], keys))
+        return pending
+
+    @staticmethod
+    async def _expire_shard(shard_engine, secret_keys: list[str]) -> dict[str, float]:
+        # Ключи из индекса приходят в каноническом виде, в запросах - UUID строк
+        keys = {parse_key(secret_key)[1]: secret_key for secret_key in secret_keys}
+
+        async with shard_engine.connect() as conn:
+            result = await conn.execute(
+                delete_expired_by_keys, {"secret_keys": list(keys)}
+            )
+            expired = result.all()
+            logs = [
+                {
+                    "secret_id": row.id,
+                    "action": "auto_delete",
+                    **SYSTEM_CLIENT,
+                    "ttl_seconds": row.ttl_seconds,
+                    "additional_info": f"Secret expired. Created: {row.created_at}, Expires: {row.expires_at}",
+                }
+                for row in expired
+            ]
+
+            # Не истёкшие по часам БД секреты возвращаются со своим сроком
+            pending = {}
+            leftover = keys.keys() - {row.secret_key for row in expired}
+            if leftover:
+                rows = await conn.execute(
+                    select_pending_expiry, {"secret_keys": list(leftover)}
+                )
+                pending = {
+                    keys[row.secret_key]: row.expires_at.timestamp() for row in rows
+                }
+
+            await AuditService.commit(conn, *logs)
+
+        await RedisService.delete_cached_secrets(
+            [keys[row.secret_key] for row in expired]
+        )
+        await BlobStore.aunlink_many(row.blob_digest for row in expired)
+        SECRETS_EXPIRED.inc(len(expired))
+        return pending
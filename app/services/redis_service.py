@@ -1,64 +1,254 @@
 import asyncio
+import base64
 import json
+import logging
+import math
 import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
 import redis.asyncio as redis
 from dotenv import load_dotenv
 
+from database.shards import ShardRing
+from services.metrics import CACHE_HITS, CACHE_MISSES, REDIS_ERRORS, REDIS_LATENCY
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = os.getenv("REDIS_PORT", 6379)  # Стандартный порт Redis
 REDIS_DB = os.getenv("REDIS_DB", 0)
 
-print(f"Redis config: {REDIS_HOST}:{REDIS_PORT}")
-
 redis_client = redis.Redis(
     host=REDIS_HOST,
     port=int(REDIS_PORT),
     db=int(REDIS_DB),
-    decode_responses=True,
     socket_timeout=10.0,  # Добавляем таймаут
 )
 
-MIN_CACHE_TTL = 300
+# TTL кеша для секретов без срока действия
+DEFAULT_CACHE_TTL = int(os.getenv("REDIS_CACHE_TTL", 3600))
+# msgpack - двоичный формат записи кеша (если установлен), json - прежний текстовый
+REDIS_CACHE_CODEC = os.getenv("REDIS_CACHE_CODEC", "msgpack")
+
+# ZSET ключей секретов с оценкой по expires_at, из него очистка берёт истёкшие
+EXPIRY_INDEX_KEY = "secrets:expiry"
+
+
+def expiry_index_key(shard_id: int) -> str:
+    """Свой индекс у каждого шарда, у шарда 0 - прежнее имя ключа"""
+    return EXPIRY_INDEX_KEY if shard_id == 0 else f"{EXPIRY_INDEX_KEY}:{shard_id}"
+
+
+def _index_key(secret_key: str) -> str:
+    return expiry_index_key(ShardRing.shard_of(secret_key))
+
+
+def _cache_key(secret_key: str) -> str:
+    return f"secret:{secret_key}"
+
+
+def _encode_bytes(value):
+    # JSON не хранит байты: шифротекст кладётся в base64
+    if isinstance(value, bytes):
+        return {"$b64": base64.b64encode(value).decode()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_bytes(obj: dict):
+    if len(obj) == 1 and "$b64" in obj:
+        return base64.b64decode(obj["$b64"])
+    return obj
+
+
+class JsonCodec:
+    """Прежний формат: JSON, шифротекст в base64"""
+
+    name = "json"
+
+    @staticmethod
+    def dumps(data: dict) -> bytes:
+        return json.dumps(data, default=_encode_bytes).encode()
+
+    @staticmethod
+    def loads(data: bytes) -> dict:
+        return json.loads(data, object_hook=_decode_bytes)
+
+
+class MsgpackCodec:
+    """msgpack: байты хранятся как есть, без base64 и разбора JSON"""
+
+    name = "msgpack"
+
+    @staticmethod
+    def dumps(data: dict) -> bytes:
+        return msgpack.packb(data)
+
+    @staticmethod
+    def loads(data: bytes) -> dict:
+        return msgpack.unpackb(data)
+
+
+CACHE_CODECS = {codec.name: codec for codec in (JsonCodec, MsgpackCodec)}
+
+
+def cache_codec(name: str = REDIS_CACHE_CODEC):
+    if name == "msgpack" and msgpack is None:
+        return JsonCodec
+    return CACHE_CODECS[name]
+
+
+_codec = cache_codec()
+
+
+def _dumps(data: dict) -> bytes:
+    return _codec.dumps(data)
+
+
+def _loads(data: bytes) -> dict:
+    # Формат определяется по первому байту: JSON-объект начинается с "{",
+    # а словарь в msgpack - с 0x80-0x8f или 0xde, поэтому записи обоих
+    # форматов читаются при любом REDIS_CACHE_CODEC
+    if data[:1] == b"{":
+        return JsonCodec.loads(data)
+    return MsgpackCodec.loads(data)
+
+
+def _cache_ttl(expires_at: datetime | None) -> int:
+    """TTL записи кеша, совпадающий с реальным сроком жизни секрета"""
+    if expires_at is None:
+        return DEFAULT_CACHE_TTL
+    return math.ceil((expires_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Дочерние метрики по операциям создаются один раз
+_latency = {}
+_errors = {}
+
+
+@contextmanager
+def _observe(operation: str):
+    """Замеряет команду (или конвейер) Redis и считает её ошибки"""
+    if operation not in _latency:
+        _latency[operation] = REDIS_LATENCY.labels(operation)
+        _errors[operation] = REDIS_ERRORS.labels(operation)
+
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        _errors[operation].inc()
+        raise
+    finally:
+        _latency[operation].observe(time.perf_counter() - started)
 
 
 class RedisService:
     """Простой сервис для работы с Redis"""
 
     @staticmethod
-    async def cache_secret(secret_id: str, data: dict, ttl_seconds: int = None):
-        """Кеширует секрет в Redis"""
-        json_data = json.dumps(data)
-        actual_ttl = max(MIN_CACHE_TTL, ttl_seconds or MIN_CACHE_TTL)
+    async def cache_secret(
+        secret_key: str, data: dict, expires_at: datetime | None = None
+    ):
+        """Кеширует секрет до его истечения и добавляет в индекс истечения"""
+        actual_ttl = _cache_ttl(expires_at)
 
         try:
-            await redis_client.set(f"secret:{secret_id}", json_data, ex=actual_ttl)
-            print(f"Secret {secret_id} cached successfully")
+            with _observe("cache"):
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    if actual_ttl > 0:
+                        pipe.set(_cache_key(secret_key), _dumps(data), ex=actual_ttl)
+                    if expires_at is not None:
+                        pipe.zadd(
+                            _index_key(secret_key),
+                            {secret_key: expires_at.timestamp()},
+                        )
+                    await pipe.execute()
         except Exception as e:
-            print(f"Error caching secret: {e}")
+            logger.warning("Error caching secret: %s", e)
 
     @staticmethod
-    async def get_cached_secret(secret_id: str) -> dict:
+    async def index_expiry(secret_key: str, expires_at: datetime | None):
+        """Добавляет секрет в индекс истечения без кеширования содержимого"""
+        if expires_at is None:
+            return
+
+        try:
+            with _observe("index"):
+                await redis_client.zadd(
+                    _index_key(secret_key), {secret_key: expires_at.timestamp()}
+                )
+        except Exception as e:
+            logger.warning("Error indexing secret expiry: %s", e)
+
+    @staticmethod
+    async def get_cached_secret(secret_key: str) -> dict:
         """Получает секрет из Redis"""
         try:
-            data = await redis_client.get(f"secret:{secret_id}")
+            with _observe("get"):
+                data = await redis_client.get(_cache_key(secret_key))
             if data:
-                return json.loads(data)
+                CACHE_HITS.inc()
+                return _loads(data)
+            CACHE_MISSES.inc()
             return None
         except Exception as e:
-            print(f"Error getting cached secret: {e}")
+            logger.warning("Error getting cached secret: %s", e)
             return None
 
     @staticmethod
-    async def delete_cached_secret(secret_id: str):
+    async def pop_cached_secret(secret_key: str) -> dict:
+        """Атомарно забирает секрет из Redis (GETDEL)"""
+        try:
+            with _observe("pop"):
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.getdel(_cache_key(secret_key))
+                    pipe.zrem(_index_key(secret_key), secret_key)
+                    data, _ = await pipe.execute()
+            if data:
+                CACHE_HITS.inc()
+                return _loads(data)
+            CACHE_MISSES.inc()
+            return None
+        except Exception as e:
+            logger.warning("Error popping cached secret: %s", e)
+            return None
+
+    @staticmethod
+    async def delete_cached_secret(secret_key: str):
         """Удаляет секрет из Redis"""
         try:
-            await redis_client.delete(f"secret:{secret_id}")
-            print(f"Secret {secret_id} deleted from cache")
+            with _observe("delete"):
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.delete(_cache_key(secret_key))
+                    pipe.zrem(_index_key(secret_key), secret_key)
+                    await pipe.execute()
+        except Exception as e:
+            logger.warning("Error deleting cached secret: %s", e)
+
+    @staticmethod
+    async def delete_cached_secrets(secret_keys: list[str]):
+        """Удаляет пачку секретов из кеша и индекса истечения"""
+        if not secret_keys:
+            return
+
+        try:
+            with _observe("delete_many"):
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.unlink(*(_cache_key(secret_key) for secret_key in secret_keys))
+                    for shard_id, keys in ShardRing.group(secret_keys).items():
+                        pipe.zrem(expiry_index_key(shard_id), *keys)
+                    await pipe.execute()
         except Exception as e:
-            print(f"Error deleting cached secret: {e}")
+            logger.warning("Error deleting cached secrets: %s", e)
 
     @staticmethod
     async def ping():
@@ -66,17 +256,18 @@ class RedisService:
         try:
             for i in range(5):  # Попробуем 5 раз с интервалом
                 try:
-                    result = await redis_client.ping()
-                    print(f"Redis ping successful: {result}")
+                    with _observe("ping"):
+                        result = await redis_client.ping()
+                    logger.info("Redis %s:%s ping successful", REDIS_HOST, REDIS_PORT)
                     return result
                 except Exception as e:
-                    print(f"Redis ping attempt {i+1} failed: {e}")
+                    logger.warning("Redis ping attempt %d failed: %s", i + 1, e)
                     if i < 4:  # Не ждем после последней попытки
                         await asyncio.sleep(2)
-            print("All Redis ping attempts failed")
+            logger.error("All Redis ping attempts failed")
             return False
         except Exception as e:
-            print(f"Error pinging Redis: {e}")
+            logger.error("Error pinging Redis: %s", e)
             return False
 
     @staticmethod
@@ -84,6 +275,6 @@ class RedisService:
         """Закрывает соединение с Redis"""
         try:
             await redis_client.close()
-            print("Redis connection closed")
+            logger.info("Redis connection closed")
         except Exception as e:
-            print(f"Error closing Redis connection: {e}")
+            logger.warning("Error closing Redis connection: %s", e)
@@ -0,0 +1,120 @@
+import os
+
+import redis.asyncio as redis
+from dotenv import load_dotenv
+
+from services.redis_service import REDIS_DB, REDIS_HOST, REDIS_PORT
+from services.secret_store import SecretNotFound, SecretStore
+
+load_dotenv()
+
+# Журнал - Redis Stream, старые записи обрезаются по длине
+REDIS_AUDIT_MAXLEN = int(os.getenv("REDIS_AUDIT_MAXLEN", 1000000))
+AUDIT_STREAM_KEY = "secrets:audit"
+
+# Забирает секрет и пишет запись в журнал одним скриптом, поэтому секрет
+# получает ровно один читатель и журнал не расходится с данными.
+# ARGV: предел длины журнала, ключ секрета, действие, ip, user agent, пояснение
+POP_SECRET = """
+    local secret = redis.call('HMGET', KEYS[1], 'secret', 'ttl_seconds')
+    if not secret[1] then
+        return false
+    end
+    redis.call('DEL', KEYS[1])
+    redis.call(
+        'XADD', KEYS[2], 'MAXLEN', '~', ARGV[1], '*',
+        'secret_key', ARGV[2], 'action', ARGV[3], 'ip_address', ARGV[4],
+        'user_agent', ARGV[5], 'ttl_seconds', secret[2], 'additional_info', ARGV[6]
+    )
+    return secret[1]
+    """
+
+
+def _store_key(secret_key: str) -> str:
+    # Отдельное пространство имён, чтобы не пересекаться с кешем secret:*
+    return f"secret-store:{secret_key}"
+
+
+class RedisSecretStore(SecretStore):
+    """
+    Секреты только в Redis: без Postgres и Celery. Срок жизни - TTL ключа,
+    поэтому истёкший секрет неотличим от прочитанного и auto_delete
+    в журнал не пишется.
+    """
+
+    name = "redis"
+
+    def __init__(self):
+        # Шифротексты хранятся как есть, без base64 и декодирования ответов
+        self._redis = redis.Redis(
+            host=REDIS_HOST,
+            port=int(REDIS_PORT),
+            db=int(REDIS_DB),
+            socket_timeout=10.0,
+        )
+        self._pop_secret = self._redis.register_script(POP_SECRET)
+
+    async def start(self):
+        await self._redis.ping()
+
+    async def stop(self):
+        await self._redis.close()
+
+    async def health(self) -> dict:
+        await self._redis.ping()
+        return {"store": self.name, "redis": f"{REDIS_HOST}:{REDIS_PORT}"}
+
+    @staticmethod
+    def _audit(pipe, secret_key: str, action: str, client: dict, **extra):
+        entry = {"secret_key": secret_key, "action": action, **client, **extra}
+        pipe.xadd(
+            AUDIT_STREAM_KEY,
+            {field: "" if value is None else value for field, value in entry.items()},
+            maxlen=REDIS_AUDIT_MAXLEN,
+            approximate=True,
+        )
+
+    async def create(self, secret_key, secret, passphrase, ttl_seconds, client):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                _store_key(secret_key),
+                mapping={
+                    "secret": secret,
+                    "passphrase": passphrase or b"",
+                    "ttl_seconds": ttl_seconds or "",
+                },
+            )
+            if ttl_seconds is not None:
+                pipe.expire(_store_key(secret_key), ttl_seconds)
+            self._audit(pipe, secret_key, "create", client, ttl_seconds=ttl_seconds)
+            await pipe.execute()
+
+    async def _pop(self, secret_key: str, client: dict, additional_info: str = ""):
+        return await self._pop_secret(
+            keys=[_store_key(secret_key), AUDIT_STREAM_KEY],
+            args=[
+                REDIS_AUDIT_MAXLEN,
+                secret_key,
+                "delete",
+                client["ip_address"] or "",
+                client["user_agent"] or "",
+                additional_info,
+            ],
+        )
+
+    async def consume(self, secret_key, client) -> bytes:
+        secret = await self._pop(secret_key, client)
+        if secret is None:
+            raise SecretNotFound(secret_key)
+        return secret
+
+    async def delete(self, secret_key, authorize, client):
+        passphrase = await self._redis.hget(_store_key(secret_key), "passphrase")
+        if passphrase is None:
+            raise SecretNotFound(secret_key)
+
+        authorize(passphrase or None)
+
+        # Секрет могли прочитать после проверки фразы, тогда удалять нечего
+        if await self._pop(secret_key, client, "Deleted by user request") is None:
+            raise SecretNotFound(secret_key)
@@ -0,0 +1,129 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from database.shards import encode_uuid
+
+load_dotenv()
+
+# postgres - Postgres с кешем в Redis, redis - только Redis с его TTL,
+# memory - память процесса (один узел без внешних зависимостей, бенчмарки)
+SECRET_STORE = os.getenv("SECRET_STORE", "postgres")
+
+# Источник записей журнала об автоматическом удалении
+SYSTEM_CLIENT = {"ip_address": "system", "user_agent": "Expiry Engine"}
+
+
+class SecretNotFound(Exception):
+    """Секрета нет или его уже прочитали"""
+
+
+class SecretExpired(SecretNotFound):
+    """Срок жизни секрета истёк"""
+
+
+def expires_at_for(ttl_seconds: int | None) -> datetime | None:
+    if ttl_seconds is None:
+        return None
+    return datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+
+
+class SecretStore:
+    """
+    Хранилище зашифрованных секретов.
+
+    Принимает и отдаёт уже зашифрованные данные, сроки жизни и журнал
+    обращений ведёт само. client - ip_address и user_agent для журнала.
+    """
+
+    name = ""
+    # Поддерживаются ли потоковые секреты (POST /secrets/stream)
+    streaming = False
+
+    def new_key(self) -> str:
+        return encode_uuid(uuid.uuid4())
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def health(self) -> dict:
+        return {"store": self.name}
+
+    async def create(
+        self,
+        secret_key: str,
+        secret: bytes,
+        passphrase: bytes | None,
+        ttl_seconds: int | None,
+        client: dict,
+    ):
+        """Сохраняет секрет и пишет create в журнал"""
+        raise NotImplementedError
+
+    async def consume(self, secret_key: str, client: dict) -> bytes:
+        """
+        Забирает секрет, его получает ровно один читатель.
+        Выбрасывает SecretNotFound, для истёкшего секрета - SecretExpired.
+        """
+        raise NotImplementedError
+
+    async def delete(self, secret_key: str, authorize, client: dict):
+        """
+        Удаляет секрет, если authorize(зашифрованная фраза) не выбросила
+        исключение. Выбрасывает SecretNotFound.
+        """
+        raise NotImplementedError
+
+    async def create_stream(
+        self,
+        secret_key: str,
+        header: bytes,
+        passphrase: bytes | None,
+        ttl_seconds: int | None,
+        frames,
+        client: dict,
+    ):
+        """Сохраняет потоковый секрет из асинхронного итератора фрагментов"""
+        raise NotImplementedError
+
+    async def open_stream(self, secret_key: str, client: dict):
+        """
+        Заголовок и асинхронный итератор (фрагмент, последний ли) потокового
+        секрета или None. Секрет удаляется после выдачи последнего фрагмента.
+        Вызывающий закрывает итератор через aclose(), даже если не читал его.
+        """
+        raise NotImplementedError
+
+    async def pending_expiry(self):
+        """Сроки истечения (ключ, timestamp) для колеса таймеров ExpiryEngine"""
+        return
+        yield
+
+    async def expire(self, secret_keys: list[str]) -> dict[str, float]:
+        """
+        Удаляет истёкшие секреты из пачки и пишет auto_delete в журнал.
+        Возвращает секреты, срок которых ещё не наступил, с их сроками.
+        """
+        return {}
+
+
+def create_store(kind: str = SECRET_STORE) -> SecretStore:
+    # Реализации импортируются по требованию: memory не тянет за собой Postgres
+    if kind == "postgres":
+        from services.postgres_store import PostgresSecretStore
+
+        return PostgresSecretStore()
+    if kind == "redis":
+        from services.redis_store import RedisSecretStore
+
+        return RedisSecretStore()
+    if kind == "memory":
+        from services.memory_store import MemorySecretStore
+
+        return MemorySecretStore()
+    raise RuntimeError(f"Unknown secret store: {kind}")
@@ -0,0 +1,102 @@
+import math
+
+
+class TimingWheel:
+    """
+    Иерархическое колесо таймеров.
+
+    Вставка и отмена работают за O(1), сдвиг на один тик - за O(1) плюс
+    перенос таймеров с верхних уровней, когда наступает их интервал.
+    """
+
+    def __init__(self, tick: float, now: float, level_bits=(8, 6, 6, 6)):
+        self._tick = tick
+        self._current = math.floor(now / tick)
+        # (сдвиг, маска, слоты) для каждого уровня
+        self._levels = []
+        shift = 0
+        for bits in level_bits:
+            self._levels.append(
+                (shift, (1 << bits) - 1, [{} for _ in range(1 << bits)])
+            )
+            shift += bits
+        self._span = 1 << shift
+        self._overflow = {}
+        self._ready = {}
+        # Ключ таймера -> словарь (слот), в котором он лежит
+        self._index = {}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def add(self, key, deadline: float):
+        """Ставит таймер на момент deadline (unix time), заменяя прежний"""
+        self.cancel(key)
+        self._place(key, math.ceil(deadline / self._tick))
+
+    def cancel(self, key) -> bool:
+        """Снимает таймер, если он есть"""
+        slot = self._index.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def advance(self, now: float) -> list:
+        """Сдвигает колесо до момента now и возвращает ключи сработавших таймеров"""
+        target = math.floor(now / self._tick)
+        due = []
+
+        while self._current < target:
+            if not self._index:
+                self._current = target
+                break
+
+            self._current += 1
+            self._cascade()
+
+            shift, mask, slots = self._levels[0]
+            slot = slots[self._current & mask]
+            if slot:
+                self._fire(slot, due)
+
+        self._fire(self._ready, due)
+        return due
+
+    def _place(self, key, tick: int):
+        delta = tick - self._current
+        if delta <= 0:
+            slot = self._ready
+        else:
+            slot = self._overflow
+            for shift, mask, slots in self._levels:
+                if delta < (mask + 1) << shift:
+                    slot = slots[(tick >> shift) & mask]
+                    break
+
+        slot[key] = tick
+        self._index[key] = slot
+
+    def _cascade(self):
+        """Переносит таймеры верхних уровней, интервал которых наступил"""
+        if self._current % self._span == 0:
+            self._replace(self._overflow)
+
+        for shift, mask, slots in reversed(self._levels[1:]):
+            if self._current & ((1 << shift) - 1) == 0:
+                self._replace(slots[(self._current >> shift) & mask])
+
+    def _replace(self, slot: dict):
+        timers = list(slot.items())
+        slot.clear()
+        for key, tick in timers:
+            self._place(key, tick)
+
+    def _fire(self, slot: dict, due: list):
+        for key in slot:
+            del self._index[key]
+            due.append(key)
+        slot.clear()
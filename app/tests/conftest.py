@@ -0,0 +1,83 @@
+"""
+Фикстуры тестов. Тесты с фикстурой services работают с Postgres и Redis
+из .env (docker-compose up -d postgres redis, alembic upgrade head) и
+пропускаются, если они недоступны.
+"""
+
+import base64
+import os
+from types import SimpleNamespace
+
+from cryptography.fernet import Fernet
+
+# Ключи нужны при импорте EncryptionService
+os.environ.setdefault("MASTER_KEY", base64.urlsafe_b64encode(os.urandom(32)).decode())
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+
+import pytest  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+CLIENT = {"ip_address": "127.0.0.1", "user_agent": "pytest"}
+
+
+@pytest.fixture(scope="session")
+def services():
+    """Доступные Postgres и Redis, иначе тест пропускается"""
+    from services.celery_service import get_engine, redis_client
+
+    try:
+        with get_engine(0).connect() as conn:
+            conn.execute(text("SELECT 1"))
+        redis_client.ping()
+    except Exception as e:
+        pytest.skip(f"Postgres и Redis недоступны: {e}")
+
+
+@pytest.fixture
+def client_info():
+    return dict(CLIENT)
+
+
+@pytest.fixture
+def use_master_keys(monkeypatch):
+    """Подменяет мастер-ключи AES-GCM: use_master_keys({1: key}, primary=1)"""
+    from services.ciphers import AesGcmEnvelopeCipher
+    from services.encryption_service import EncryptionService
+
+    def use(master_keys: dict[int, bytes], primary: int):
+        cipher = AesGcmEnvelopeCipher(master_keys, primary)
+        monkeypatch.setattr(EncryptionService, "_aesgcm", cipher)
+        monkeypatch.setattr(EncryptionService, "_cipher", cipher)
+
+    return use
+
+
+@pytest.fixture
+def rotation(monkeypatch):
+    """rotate_shard шарда 0 без паузы между пачками"""
+    from services import celery_service
+
+    monkeypatch.setattr(celery_service, "ROTATION_BATCH_DELAY", 0)
+    task = SimpleNamespace(request=SimpleNamespace(id=None))
+    return lambda: celery_service.rotate_shard(task, 0)
+
+
+@pytest.fixture
+async def api():
+    """Клиент приложения через ASGI с хранилищем в памяти"""
+    import httpx
+
+    from dependencies.store import get_store
+    from main import app
+    from services.memory_store import MemorySecretStore
+
+    store = MemorySecretStore()
+    app.dependency_overrides[get_store] = lambda: store
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
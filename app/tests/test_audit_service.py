@@ -0,0 +1,181 @@
+import asyncio
+import contextlib
+
+import pytest
+from prometheus_client import REGISTRY
+
+from services import audit_service
+from services.audit_service import AuditService
+
+
+class FailingCommit(Exception):
+    pass
+
+
+class RecordingEngine:
+    """Engine шарда: запоминает пакеты, может падать или ждать gate"""
+
+    def __init__(self, failures: int = 0, gate: asyncio.Event | None = None):
+        self.batches = []
+        self.failures = failures
+        self.gate = gate
+
+    @contextlib.asynccontextmanager
+    async def begin(self):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database is unavailable")
+        yield self
+
+    async def execute(self, statement, params):
+        self.batches.append(list(params))
+
+    @property
+    def records(self) -> list[dict]:
+        return [log_data for batch in self.batches for log_data in batch]
+
+
+class RecordingDb:
+    """Соединение запроса: запоминает запросы, commit может падать"""
+
+    def __init__(self, engine=None, fail_commit: bool = False):
+        self.engine = engine or RecordingEngine()
+        self.fail_commit = fail_commit
+        self.executed = []
+
+    async def execute(self, statement, params=None):
+        self.executed.append(params)
+
+    async def commit(self):
+        if self.fail_commit:
+            raise FailingCommit
+
+
+def dropped() -> float:
+    return REGISTRY.get_sample_value("audit_records_dropped_total") or 0
+
+
+@pytest.fixture
+async def audit(monkeypatch):
+    monkeypatch.setattr(audit_service, "AUDIT_FLUSH_INTERVAL", 0.01)
+    monkeypatch.setattr(audit_service, "AUDIT_RETRY_DELAY", 0)
+    await AuditService.start()
+    try:
+        yield AuditService
+    finally:
+        await AuditService.stop()
+
+
+async def test_commit_queues_after_success(audit):
+    db = RecordingDb()
+    await audit.commit(db, {"secret_id": 1, "action": "create"})
+
+    assert db.executed == []
+    await audit.stop()
+    assert [log["secret_id"] for log in db.engine.records] == [1]
+
+
+async def test_failed_commit_is_not_logged(audit):
+    db = RecordingDb(fail_commit=True)
+    with pytest.raises(FailingCommit):
+        await audit.commit(db, {"secret_id": 1, "action": "create"})
+
+    await audit.stop()
+    assert db.engine.records == []
+
+
+async def test_commit_in_transaction_mode():
+    db = RecordingDb()
+    await AuditService.commit(db, {"secret_id": 1, "action": "create"})
+    assert db.executed == [{"secret_id": 1, "action": "create"}]
+
+
+async def test_records_written_in_batches(audit, monkeypatch):
+    monkeypatch.setattr(audit_service, "AUDIT_BATCH_SIZE", 3)
+    engine = RecordingEngine(gate=asyncio.Event())
+    db = RecordingDb(engine)
+
+    for secret_id in range(7):
+        await audit.record(db, {"secret_id": secret_id, "action": "create"})
+    engine.gate.set()
+    await audit.stop()
+
+    assert all(len(batch) <= 3 for batch in engine.batches)
+    assert [log["secret_id"] for log in engine.records] == list(range(7))
+    # У всех записей пакета одинаковый набор полей
+    assert all(log["additional_info"] is None for log in engine.records)
+
+
+async def test_full_queue_blocks_record(monkeypatch):
+    monkeypatch.setattr(audit_service, "AUDIT_QUEUE_SIZE", 2)
+    monkeypatch.setattr(audit_service, "AUDIT_BATCH_SIZE", 1)
+    await AuditService.start()
+    engine = RecordingEngine(gate=asyncio.Event())
+    db = RecordingDb(engine)
+
+    # Первая запись уже у фоновой задачи, две заполняют очередь
+    for secret_id in range(3):
+        await AuditService.record(db, {"secret_id": secret_id})
+        await asyncio.sleep(0)
+    blocked = asyncio.create_task(AuditService.record(db, {"secret_id": 3}))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+
+    engine.gate.set()
+    await asyncio.wait_for(blocked, 1)
+    await AuditService.stop()
+    assert len(engine.records) == 4
+
+
+async def test_stop_flushes_queue(audit, monkeypatch):
+    monkeypatch.setattr(audit_service, "AUDIT_FLUSH_INTERVAL", 60)
+    engine = RecordingEngine()
+    for secret_id in range(5):
+        await audit.record(RecordingDb(engine), {"secret_id": secret_id})
+
+    await audit.stop()
+    assert len(engine.records) == 5
+    assert audit.in_transaction()
+
+
+async def test_failed_batch_retried(audit):
+    engine = RecordingEngine(failures=audit_service.AUDIT_FLUSH_RETRIES)
+    before = dropped()
+    await audit.record(RecordingDb(engine), {"secret_id": 1})
+
+    await audit.stop()
+    assert len(engine.records) == 1
+    assert dropped() == before
+
+
+async def test_batch_dropped_after_retries(audit):
+    engine = RecordingEngine(failures=audit_service.AUDIT_FLUSH_RETRIES + 1)
+    before = dropped()
+    await audit.record(RecordingDb(engine), {"secret_id": 1})
+    await audit.record(RecordingDb(engine), {"secret_id": 2})
+
+    await audit.stop()
+    assert engine.records == []
+    assert dropped() == before + 2
+
+
+async def test_failed_worker_restarted(audit, monkeypatch):
+    next_batch = AuditService._next_batch.__func__
+    failures = [RuntimeError("worker bug")]
+
+    async def failing_next_batch(cls):
+        if failures:
+            raise failures.pop()
+        return await next_batch(cls)
+
+    monkeypatch.setattr(AuditService, "_next_batch", classmethod(failing_next_batch))
+    worker = audit._worker
+    await asyncio.wait([worker])
+    assert audit._worker is not worker
+
+    engine = RecordingEngine()
+    await audit.record(RecordingDb(engine), {"secret_id": 1})
+    await audit.stop()
+    assert len(engine.records) == 1
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+
+from services.ciphers import AesGcmEnvelopeCipher, FernetCipher
+
+
+@pytest.fixture
+def keys():
+    return {1: os.urandom(32), 2: os.urandom(32)}
+
+
+def test_envelope_round_trip(keys):
+    cipher = AesGcmEnvelopeCipher(keys, 1)
+    blob = cipher.encrypt(b"secret")
+
+    assert cipher.decrypt(blob) == b"secret"
+    # Каждый секрет шифруется своим ключом данных
+    assert cipher.encrypt(b"secret") != blob
+
+
+def test_envelope_rotation(keys):
+    blob = AesGcmEnvelopeCipher(keys, 1).encrypt(b"secret")
+    cipher = AesGcmEnvelopeCipher(keys, 2)
+
+    assert cipher.needs_rotation(blob)
+    rotated = cipher.rotate(blob)
+    assert not cipher.needs_rotation(rotated)
+    assert AesGcmEnvelopeCipher({2: keys[2]}, 2).decrypt(rotated) == b"secret"
+
+
+def test_envelope_rejects_tampering(keys):
+    cipher = AesGcmEnvelopeCipher(keys, 1)
+    blob = bytearray(cipher.encrypt(b"secret"))
+    blob[-1] ^= 1
+
+    with pytest.raises(InvalidTag):
+        cipher.decrypt(bytes(blob))
+
+
+def test_envelope_unknown_master_key(keys):
+    blob = AesGcmEnvelopeCipher(keys, 2).encrypt(b"secret")
+
+    with pytest.raises(ValueError):
+        AesGcmEnvelopeCipher({1: keys[1]}, 1).decrypt(blob)
+
+
+def test_envelope_validates_keys(keys):
+    with pytest.raises(ValueError):
+        AesGcmEnvelopeCipher({1: os.urandom(16)}, 1)
+    with pytest.raises(ValueError):
+        AesGcmEnvelopeCipher(keys, 3)
+
+
+def encrypt_stream(cipher, chunks):
+    frames = cipher.stream_encryptor()
+    return frames.header, [
+        frames.encrypt_chunk(chunk, final=i == len(chunks) - 1)
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def test_stream_round_trip_after_header_rotation(keys):
+    header, encrypted = encrypt_stream(
+        AesGcmEnvelopeCipher(keys, 1), [b"a", b"b", b"c"]
+    )
+    cipher = AesGcmEnvelopeCipher(keys, 2)
+    frames = cipher.stream_decryptor(cipher.rotate_stream_header(header))
+
+    assert [
+        frames.decrypt_chunk(frame, final=i == 2) for i, frame in enumerate(encrypted)
+    ] == [b"a", b"b", b"c"]
+
+
+def test_stream_detects_reordering_and_truncation(keys):
+    cipher = AesGcmEnvelopeCipher(keys, 1)
+    header, encrypted = encrypt_stream(cipher, [b"a", b"b", b"c"])
+
+    with pytest.raises(InvalidTag):
+        cipher.stream_decryptor(header).decrypt_chunk(encrypted[1], final=False)
+
+    frames = cipher.stream_decryptor(header)
+    frames.decrypt_chunk(encrypted[0], final=False)
+    # Обрезанный поток: второй фрагмент не помечен последним
+    with pytest.raises(InvalidTag):
+        frames.decrypt_chunk(encrypted[1], final=True)
+
+
+def test_fernet_rotation():
+    old_key, new_key = Fernet.generate_key(), Fernet.generate_key()
+    token = FernetCipher([old_key]).encrypt(b"secret")
+    cipher = FernetCipher([new_key, old_key])
+
+    assert cipher.needs_rotation(token)
+    rotated = cipher.rotate(token)
+    assert not cipher.needs_rotation(rotated)
+    assert FernetCipher([new_key]).decrypt(rotated) == b"secret"
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from services import compression
+from services.compression import ZLIB, compress, decompress
+
+
+@pytest.fixture
+def zlib_compression(monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION", "zlib")
+
+
+def test_compression_off_by_default():
+    data = b"a" * 4096
+    assert compression.COMPRESSION == "off"
+    assert compress(data) == data
+
+
+def test_zlib_round_trip(zlib_compression):
+    data = b"password=hunter2\n" * 256
+    compressed = compress(data)
+
+    assert compressed[0] == ZLIB
+    assert len(compressed) < len(data)
+    assert decompress(compressed) == data
+
+
+def test_small_data_not_compressed(zlib_compression):
+    data = b"a" * (compression.COMPRESSION_MIN_SIZE - 1)
+    assert compress(data) == data
+
+
+def test_random_data_not_compressed(zlib_compression):
+    data = os.urandom(4096)
+    assert compress(data) == data
+
+
+def test_decompress_passes_legacy_plaintext():
+    """Записи, созданные до сжатия, возвращаются как есть"""
+    assert decompress("секрет".encode()) == "секрет".encode()
+    assert decompress(b"") == b""
@@ -0,0 +1,74 @@
+import contextlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from database.shards import format_key
+from services import celery_service
+
+
+class RecordingConnection:
+    """Соединение, у которого ни одна строка ещё не истекла по часам БД"""
+
+    def __init__(self, pending_ids):
+        self.pending_ids = pending_ids
+
+    def begin(self):
+        return contextlib.nullcontext()
+
+    def execute(self, statement, params=None):
+        if statement is celery_service.delete_expired_by_keys:
+            rows = []
+        else:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=5)
+            rows = [
+                SimpleNamespace(secret_key=secret_id, expires_at=expires_at)
+                for secret_id in self.pending_ids
+            ]
+        return SimpleNamespace(all=lambda: rows)
+
+
+class RecordingEngine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connect(self):
+        return contextlib.nullcontext(self.conn)
+
+
+class RecordingRedis:
+    def __init__(self):
+        self.requeued = []
+
+    def zadd(self, key, mapping):
+        self.requeued.append(mapping)
+
+
+def test_drain_stops_when_batch_is_only_pending(monkeypatch):
+    """Пачка, целиком вернувшаяся в индекс, не забирается повторно в том же запуске"""
+    batch_size = 3
+    secret_ids = [uuid.uuid4() for _ in range(batch_size)]
+    claimed = {format_key(0, secret_id): 0.0 for secret_id in secret_ids}
+    claims = []
+
+    def claim_due(shard_id, limit):
+        claims.append(limit)
+        # Защита от зависания теста при регрессии
+        return dict(claimed) if len(claims) < 10 else {}
+
+    redis_client = RecordingRedis()
+    monkeypatch.setattr(celery_service, "CLEANUP_BATCH_SIZE", batch_size)
+    monkeypatch.setattr(celery_service, "claim_due", claim_due)
+    monkeypatch.setattr(celery_service, "redis_client", redis_client)
+    monkeypatch.setattr(
+        celery_service,
+        "get_engine",
+        lambda shard_id: RecordingEngine(RecordingConnection(secret_ids)),
+    )
+
+    result = celery_service.drain_expired_secrets.run(0)
+
+    assert result["deleted"] == 0
+    assert len(claims) == 1
+    assert len(redis_client.requeued) == 1
+    assert set(redis_client.requeued[0]) == set(claimed)
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services import encryption_service
+from services.encryption_service import EncryptionService
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Пул потоков, который запоминает переданные ему задания"""
+
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = RecordingExecutor()
+    monkeypatch.setattr(encryption_service, "ENCRYPTION_OFFLOAD_THRESHOLD", 32)
+    monkeypatch.setattr(EncryptionService, "_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+async def test_offload_threshold_counts_bytes(executor):
+    """Многобайтовый текст короче порога в символах, но не в байтах"""
+    data = "секрет" * 3
+    assert len(data) < 32 <= len(data.encode())
+
+    encrypted = await EncryptionService.aencrypt(data)
+
+    assert executor.submitted == 1
+    assert EncryptionService.decrypt(encrypted) == data
+
+
+async def test_small_data_encrypted_inline(executor):
+    encrypted = await EncryptionService.aencrypt("secret")
+
+    assert executor.submitted == 0
+    assert await EncryptionService.adecrypt(encrypted) == "secret"
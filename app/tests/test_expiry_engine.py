@@ -0,0 +1,127 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from services import expiry_engine
+from services.expiry_engine import ExpiryEngine
+
+
+class ExpiringStore:
+    """Хранилище со сроками в памяти: expire удаляет наступившие"""
+
+    def __init__(self, deadlines: dict[str, float], failures: int = 0):
+        self.deadlines = dict(deadlines)
+        self.failures = failures
+        self.purged = []
+
+    async def pending_expiry(self):
+        for secret_key, deadline in self.deadlines.items():
+            yield secret_key, deadline
+
+    async def expire(self, secret_keys):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database is unavailable")
+
+        now = time.time()
+        pending = {}
+        for secret_key in secret_keys:
+            deadline = self.deadlines.get(secret_key)
+            if deadline is None:
+                continue
+            if deadline <= now:
+                del self.deadlines[secret_key]
+                self.purged.append(secret_key)
+            else:
+                pending[secret_key] = deadline
+        return pending
+
+
+@pytest.fixture
+async def engine(monkeypatch):
+    monkeypatch.setattr(expiry_engine, "EXPIRY_ENGINE", "inprocess")
+    monkeypatch.setattr(expiry_engine, "EXPIRY_TICK", 0.01)
+    monkeypatch.setattr(expiry_engine, "EXPIRY_RETRY_DELAY", 0.05)
+
+    async def start(store):
+        await ExpiryEngine.start(store)
+        return store
+
+    try:
+        yield start
+    finally:
+        await ExpiryEngine.stop()
+
+
+async def wait_purged(store: ExpiringStore, count: int, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while len(store.purged) < count and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def test_loaded_key_purged(engine):
+    now = time.time()
+    store = await engine(ExpiringStore({"due": now + 0.05, "later": now + 3600}))
+
+    await wait_purged(store, 1)
+    assert store.purged == ["due"]
+    assert "later" in store.deadlines
+
+
+async def test_scheduled_and_cancelled_keys(engine):
+    store = await engine(ExpiringStore({}))
+    expires_at = datetime.fromtimestamp(time.time() + 0.05, timezone.utc)
+    for secret_key in ("kept", "read"):
+        store.deadlines[secret_key] = expires_at.timestamp()
+        ExpiryEngine.schedule(secret_key, expires_at)
+    ExpiryEngine.cancel("read")
+
+    await wait_purged(store, 1)
+    await asyncio.sleep(0.1)
+    assert store.purged == ["kept"]
+
+
+async def test_pending_key_rescheduled(engine):
+    # Колесо сработало раньше, чем срок наступил по часам хранилища
+    store = ExpiringStore({})
+    await engine(store)
+    ExpiryEngine.schedule("skewed", datetime.fromtimestamp(time.time(), timezone.utc))
+    store.deadlines["skewed"] = time.time() + 0.1
+
+    await wait_purged(store, 1)
+    assert store.purged == ["skewed"]
+
+
+async def test_failed_batch_retried(engine):
+    store = await engine(ExpiringStore({"due": time.time()}, failures=1))
+
+    await wait_purged(store, 1)
+    assert store.purged == ["due"]
+
+
+async def test_postgres_secret_purged(services, client_info, engine):
+    from sqlalchemy import select
+
+    from database.shards import parse_key
+    from models.secret import Secret
+    from services.celery_service import get_engine
+    from services.encryption_service import EncryptionService
+    from services.postgres_store import PostgresSecretStore
+
+    store = await engine(PostgresSecretStore())
+    secret_key = store.new_key()
+    await store.create(
+        secret_key, EncryptionService.encrypt("expiring"), None, 1, client_info
+    )
+
+    query = select(Secret.id).where(Secret.secret_key == parse_key(secret_key)[1])
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with get_engine(0).connect() as conn:
+            if conn.execute(query).first() is None:
+                break
+        await asyncio.sleep(0.1)
+    else:
+        pytest.fail("expired secret was not purged")
@@ -0,0 +1,67 @@
+import json
+
+from dependencies.limits import SECRET_MAX_BYTES, STREAM_MAX_BYTES
+
+
+def secret_body(size: int) -> bytes:
+    return json.dumps({"secret": "x" * size}).encode()
+
+
+async def test_content_length_over_limit(api):
+    response = await api.post(
+        "/secrets/",
+        content=secret_body(SECRET_MAX_BYTES),
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 413
+
+
+async def test_stream_content_length_checked_before_body(api):
+    # Тело не отправляется, ответ определяется одним заголовком
+    async def nothing():
+        return
+        yield
+
+    response = await api.post(
+        "/secrets/stream",
+        content=nothing(),
+        headers={"Content-Length": str(STREAM_MAX_BYTES + 1)},
+    )
+    assert response.status_code == 413
+
+
+async def test_invalid_content_length(api):
+    response = await api.post(
+        "/secrets/",
+        content=b'{"secret": "x"}',
+        headers={"Content-Length": "abc", "Content-Type": "application/json"},
+    )
+    assert response.status_code == 400
+
+
+async def test_chunked_over_limit(api):
+    body = secret_body(SECRET_MAX_BYTES)
+
+    async def chunks():
+        for start in range(0, len(body), 1024 * 1024):
+            yield body[start : start + 1024 * 1024]
+
+    response = await api.post(
+        "/secrets/", content=chunks(), headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 413
+
+
+async def test_chunked_under_limit(api):
+    async def chunks():
+        yield b'{"secret": '
+        yield b'"small secret"}'
+
+    response = await api.post(
+        "/secrets/", content=chunks(), headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 201
+    secret_key = response.json()["secret_key"]
+    assert (await api.get(f"/secrets/{secret_key}")).json() == {
+        "secret": "small secret"
+    }
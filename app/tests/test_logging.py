@@ -0,0 +1,33 @@
+import logging
+
+import pytest
+
+from services.logging_service import AccessLogFilter
+
+
+def access_record(path: str) -> logging.LogRecord:
+    return logging.LogRecord(
+        "uvicorn.access",
+        logging.INFO,
+        __file__,
+        0,
+        '%s - "%s %s HTTP/%s" %d',
+        ("127.0.0.1:5000", "GET", path, "1.1", 200),
+        None,
+    )
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/secrets/0.3f2b7c1e", "/secrets/***"),
+        ("/secrets/0.3f2b7c1e?passphrase=hunter22", "/secrets/***?passphrase=***"),
+        ("/secrets/stream?ttl_seconds=60", "/secrets/stream?ttl_seconds=60"),
+        ("/secrets/", "/secrets/"),
+        ("/health/", "/health/"),
+    ],
+)
+def test_access_log_hides_secret_key(path, expected):
+    record = access_record(path)
+    assert AccessLogFilter().filter(record)
+    assert record.getMessage() == f'127.0.0.1:5000 - "GET {expected} HTTP/1.1" 200'
@@ -0,0 +1,53 @@
+import pytest
+
+from services.memory_store import MemorySecretStore
+from services.secret_store import SecretExpired, SecretNotFound
+
+
+@pytest.fixture
+def store():
+    return MemorySecretStore()
+
+
+def forbid(passphrase):
+    raise PermissionError
+
+
+async def test_secret_read_once(store, client_info):
+    await store.create("key", b"secret", None, 60, client_info)
+
+    assert await store.consume("key", client_info) == b"secret"
+    with pytest.raises(SecretNotFound):
+        await store.consume("key", client_info)
+    assert [entry["action"] for entry in store.audit_log] == ["create", "delete"]
+
+
+async def test_expired_secret(store, client_info):
+    await store.create("key", b"secret", None, 0, client_info)
+
+    with pytest.raises(SecretExpired):
+        await store.consume("key", client_info)
+    assert store.audit_log[-1]["action"] == "expired_access"
+
+
+async def test_expired_secrets_swept_on_create(store, client_info):
+    await store.create("old", b"secret", None, 0, client_info)
+    await store.create("new", b"secret", None, 60, client_info)
+
+    assert (await store.health())["secrets"] == 1
+    assert [entry["action"] for entry in store.audit_log] == [
+        "create",
+        "auto_delete",
+        "create",
+    ]
+
+
+async def test_delete_checks_passphrase(store, client_info):
+    await store.create("key", b"secret", b"phrase", None, client_info)
+
+    with pytest.raises(PermissionError):
+        await store.delete("key", forbid, client_info)
+    await store.delete("key", lambda passphrase: None, client_info)
+
+    with pytest.raises(SecretNotFound):
+        await store.delete("key", lambda passphrase: None, client_info)
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from database.partitions import ensure_partitions
+
+
+class Result:
+    def __init__(self, rows=(), scalar=None):
+        self.rows = list(rows)
+        self.value = scalar
+
+    def all(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def scalar(self):
+        return self.value
+
+
+class RecordingConnection:
+    """Синхронное соединение, которое запоминает SQL и отвечает на запросы секций"""
+
+    def __init__(self, existing=(), misplaced=False):
+        self.existing = [
+            SimpleNamespace(name=name, lower=lower, upper=upper)
+            for name, lower, upper in existing
+        ]
+        self.misplaced = misplaced
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if "pg_inherits" in sql:
+            return Result(self.existing)
+        if "to_regclass" in sql:
+            return Result(scalar=True)
+        if sql.startswith("SELECT EXISTS"):
+            return Result(scalar=self.misplaced)
+        return Result()
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_ensure_partitions_skips_existing():
+    conn = RecordingConnection(
+        [("secret_logs_legacy", None, utc(2026, 11, 1))], misplaced=False
+    )
+    created = ensure_partitions(conn, ahead=2, now=utc(2026, 10, 18))
+
+    assert created == ["secret_logs_p202611", "secret_logs_p202612"]
+    assert any(
+        "CREATE TABLE IF NOT EXISTS secret_logs_p202611 PARTITION OF secret_logs" in sql
+        for sql in conn.statements
+    )
+    assert "pg_advisory_xact_lock" in conn.statements[0]
+
+
+def test_ensure_partitions_moves_rows_out_of_default():
+    # Секции кончились, записи месяца уже лежат в секции DEFAULT
+    conn = RecordingConnection(misplaced=True)
+    assert ensure_partitions(conn, ahead=0, now=utc(2027, 3, 5)) == [
+        "secret_logs_p202703"
+    ]
+
+    move = [sql for sql in conn.statements if "secret_logs_default" in sql]
+    assert any(sql.startswith("WITH moved AS (DELETE FROM") for sql in move)
+    assert conn.statements[-1].startswith(
+        "ALTER TABLE secret_logs ATTACH PARTITION secret_logs_p202703 FOR VALUES"
+    )
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from database.db import POOL_CHECKED_OUT, instrument
+
+
+def checked_out() -> float:
+    return POOL_CHECKED_OUT._value.get()
+
+
+def test_pool_gauge_follows_checkout_and_checkin(tmp_path):
+    """Выданные соединения считаются по событиям пула, а не функцией процесса"""
+    sync_engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool
+    )
+    instrument(SimpleNamespace(sync_engine=sync_engine, pool=sync_engine.pool))
+    before = checked_out()
+
+    with sync_engine.connect() as first:
+        first.execute(text("SELECT 1"))
+        assert checked_out() == before + 1
+        with sync_engine.connect():
+            assert checked_out() == before + 2
+        assert checked_out() == before + 1
+
+    assert checked_out() == before
+    sync_engine.dispose()
+
+
+def test_pool_gauge_sums_live_processes():
+    assert POOL_CHECKED_OUT._multiprocess_mode == "livesum"
@@ -0,0 +1,64 @@
+import os
+from datetime import datetime
+
+from services import blob_store
+from services.blob_store import BlobStore
+from services.encryption_service import EncryptionService
+from services.postgres_store import PostgresSecretStore
+from services.redis_service import RedisService, _index_key, redis_client
+
+
+async def test_consume_after_rotation_with_warm_cache(
+    services, client_info, use_master_keys, rotation, monkeypatch, tmp_path
+):
+    """Файл секрета читается по digest из строки, а не из кеша"""
+    monkeypatch.setattr(BlobStore, "root", str(tmp_path))
+    monkeypatch.setattr(blob_store, "BLOB_THRESHOLD", 64)
+
+    old_key, new_key = os.urandom(32), os.urandom(32)
+    use_master_keys({1: old_key}, 1)
+
+    store = PostgresSecretStore()
+    secret_key = store.new_key()
+    plaintext = os.urandom(2048).hex()
+    await store.create(
+        secret_key, EncryptionService.encrypt(plaintext), None, 3600, client_info
+    )
+    cached = await RedisService.get_cached_secret(secret_key)
+    assert cached["blob_digest"] is not None
+
+    use_master_keys({1: old_key, 2: new_key}, 2)
+    rotation()
+
+    # Кеш, прогретый до ротации: в нём digest уже удалённого файла
+    assert not os.path.exists(BlobStore.path(cached["blob_digest"]))
+    await RedisService.cache_secret(
+        secret_key, cached, datetime.fromisoformat(cached["expires_at"])
+    )
+
+    encrypted = await store.consume(secret_key, client_info)
+    assert EncryptionService.decrypt(encrypted) == plaintext
+
+
+async def test_unread_stream_released_on_close(services, client_info):
+    """Закрытый до чтения поток освобождает строку и возвращает секрет в индекс"""
+    store = PostgresSecretStore()
+    secret_key = store.new_key()
+    encryptor = EncryptionService.stream_encryptor()
+
+    async def frames():
+        yield encryptor.encrypt_chunk(b"streamed secret", final=True)
+
+    await store.create_stream(
+        secret_key, encryptor.header, None, 3600, frames(), client_info
+    )
+    await redis_client.zrem(_index_key(secret_key), secret_key)
+
+    _, opened = await store.open_stream(secret_key, client_info)
+    await opened.aclose()
+    assert await redis_client.zscore(_index_key(secret_key), secret_key) is not None
+
+    header, opened = await store.open_stream(secret_key, client_info)
+    decryptor = EncryptionService.stream_decryptor(header)
+    data = b"".join([decryptor.decrypt_chunk(f, final) async for f, final in opened])
+    assert data == b"streamed secret"
@@ -0,0 +1,52 @@
+import fakeredis
+import pytest
+
+from services.redis_store import AUDIT_STREAM_KEY, POP_SECRET, RedisSecretStore
+from services.secret_store import SecretNotFound
+
+
+@pytest.fixture
+async def store():
+    """RedisSecretStore поверх fakeredis, скрипты Lua выполняет lupa"""
+    store = RedisSecretStore()
+    store._redis = fakeredis.aioredis.FakeRedis()
+    store._pop_secret = store._redis.register_script(POP_SECRET)
+    yield store
+    await store.stop()
+
+
+async def actions(store) -> list[bytes]:
+    entries = await store._redis.xrange(AUDIT_STREAM_KEY)
+    return [fields[b"action"] for _, fields in entries]
+
+
+async def test_secret_read_once(store, client_info):
+    await store.create("key", b"\x00secret", None, 60, client_info)
+
+    assert 0 < await store._redis.ttl("secret-store:key") <= 60
+    assert await store.consume("key", client_info) == b"\x00secret"
+    with pytest.raises(SecretNotFound):
+        await store.consume("key", client_info)
+    assert await actions(store) == [b"create", b"delete"]
+
+
+async def test_secret_without_ttl(store, client_info):
+    await store.create("key", b"secret", None, None, client_info)
+
+    assert await store._redis.ttl("secret-store:key") == -1
+
+
+async def test_delete_checks_passphrase(store, client_info):
+    await store.create("key", b"secret", b"phrase", None, client_info)
+
+    def forbid(passphrase):
+        assert passphrase == b"phrase"
+        raise PermissionError
+
+    with pytest.raises(PermissionError):
+        await store.delete("key", forbid, client_info)
+    await store.delete("key", lambda passphrase: None, client_info)
+
+    with pytest.raises(SecretNotFound):
+        await store.delete("key", lambda passphrase: None, client_info)
+    assert await actions(store) == [b"create", b"delete"]
@@ -0,0 +1,75 @@
+import os
+import threading
+
+from sqlalchemy import select
+
+from database.shards import parse_key
+from models.secret import Secret
+from services.celery_service import get_engine
+from services.encryption_service import EncryptionService
+from services.postgres_store import PostgresSecretStore
+from services.redis_service import RedisService
+
+
+async def create_secret(client_info, plaintext: str) -> str:
+    store = PostgresSecretStore()
+    secret_key = store.new_key()
+    await store.create(
+        secret_key,
+        EncryptionService.encrypt(plaintext),
+        EncryptionService.encrypt("passphrase"),
+        3600,
+        client_info,
+    )
+    return secret_key
+
+
+def stored_secret(secret_key: str) -> bytes:
+    with get_engine(0).connect() as conn:
+        return conn.execute(
+            select(Secret.secret).where(Secret.secret_key == parse_key(secret_key)[1])
+        ).scalar_one()
+
+
+async def test_rotation_drops_cached_ciphertext(
+    services, client_info, use_master_keys, rotation
+):
+    old_key, new_key = os.urandom(32), os.urandom(32)
+    use_master_keys({1: old_key}, 1)
+    secret_key = await create_secret(client_info, "cached secret")
+    assert await RedisService.get_cached_secret(secret_key) is not None
+
+    use_master_keys({1: old_key, 2: new_key}, 2)
+    rotation()
+
+    assert await RedisService.get_cached_secret(secret_key) is None
+    # Прежний ключ больше не нужен
+    use_master_keys({2: new_key}, 2)
+    encrypted = await PostgresSecretStore().consume(secret_key, client_info)
+    assert EncryptionService.decrypt(encrypted) == "cached secret"
+
+
+async def test_rotation_revisits_locked_rows(
+    services, client_info, use_master_keys, rotation
+):
+    old_key, new_key = os.urandom(32), os.urandom(32)
+    use_master_keys({1: old_key}, 1)
+    secret_key = await create_secret(client_info, "locked secret")
+
+    use_master_keys({1: old_key, 2: new_key}, 2)
+    # Строка заблокирована, пока идёт основной проход ротации
+    locker = get_engine(0).connect()
+    locker.execute(
+        select(Secret.id)
+        .where(Secret.secret_key == parse_key(secret_key)[1])
+        .with_for_update()
+    )
+    release = threading.Timer(1.0, locker.rollback)
+    release.start()
+    try:
+        rotation()
+    finally:
+        release.join()
+        locker.close()
+
+    assert not EncryptionService.needs_rotation(stored_secret(secret_key))
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+from database import routing
+from database.routing import ReplicaRouter
+
+
+class RecordingEngine:
+    """Engine, который отдаёт своё имя вместо соединения или падает при подключении"""
+
+    def __init__(self, name: str, fail: bool = False):
+        self.name = name
+        self.fail = fail
+        self.url = SimpleNamespace(host=name, port=5432)
+        self.connects = 0
+
+    def open(self):
+        self.connects += 1
+        if self.fail:
+            raise OSError(f"{self.name} is down")
+        return self.name
+
+
+class AsyncEngine(RecordingEngine):
+    async def connect(self):
+        return self.open()
+
+
+class SyncEngine(RecordingEngine):
+    def connect(self):
+        return self.open()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(routing.time, "monotonic", lambda: now[0])
+    return now
+
+
+async def test_round_robin_over_replicas(clock):
+    router = ReplicaRouter(
+        AsyncEngine("primary"), [AsyncEngine("r1"), AsyncEngine("r2")]
+    )
+    assert [await router.connect() for _ in range(4)] == ["r1", "r2", "r1", "r2"]
+
+
+async def test_failed_replica_ejected(clock):
+    broken = AsyncEngine("r1", fail=True)
+    router = ReplicaRouter(AsyncEngine("primary"), [broken, AsyncEngine("r2")])
+
+    assert [await router.connect() for _ in range(3)] == ["r2", "r2", "r2"]
+    assert broken.connects == 1
+    assert router.status() == [
+        {"host": "r1:5432", "healthy": False},
+        {"host": "r2:5432", "healthy": True},
+    ]
+
+    # После DB_REPLICA_EJECT_SECONDS реплика снова получает запросы
+    clock[0] += routing.DB_REPLICA_EJECT_SECONDS
+    broken.fail = False
+    assert {await router.connect() for _ in range(2)} == {"r1", "r2"}
+
+
+async def test_primary_when_no_replica_available(clock):
+    router = ReplicaRouter(AsyncEngine("primary"), [AsyncEngine("r1", fail=True)])
+    assert await router.connect() == "primary"
+    assert await router.connect() == "primary"
+
+    assert await ReplicaRouter(AsyncEngine("primary"), []).connect() == "primary"
+
+
+async def test_primary_error_not_swallowed(clock):
+    router = ReplicaRouter(AsyncEngine("primary", fail=True), [])
+    with pytest.raises(OSError):
+        await router.connect()
+
+
+def test_sync_router(clock):
+    router = ReplicaRouter(
+        SyncEngine("primary"), [SyncEngine("r1"), SyncEngine("r2", fail=True)]
+    )
+    assert [router.connect_sync() for _ in range(3)] == ["r1", "r1", "r1"]
+
+    router = ReplicaRouter(SyncEngine("primary"), [SyncEngine("r1", fail=True)])
+    assert router.connect_sync() == "primary"
+
+
+def test_writes_use_primary():
+    # Запись идёт через engine шарда, роутер только для чтения падает на него же
+    from database.db import engine, replica_router, shard_engines
+
+    assert shard_engines[0] is engine
+    assert replica_router.primary is engine
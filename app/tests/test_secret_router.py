@@ -0,0 +1,20 @@
+from dependencies.store import get_store
+from main import app
+from services.postgres_store import PostgresSecretStore
+
+
+async def test_unknown_shard_not_found(api):
+    # Ключ с номером шарда, которого нет в DB_SHARDS, до базы не доходит
+    app.dependency_overrides[get_store] = PostgresSecretStore
+    secret_key = "99-AAAAAAAAAAAAAAAAAAAAAA"
+
+    assert (await api.get(f"/secrets/{secret_key}")).status_code == 404
+    assert (await api.delete(f"/secrets/{secret_key}")).status_code == 404
+
+
+async def test_malformed_key_not_found(api):
+    app.dependency_overrides[get_store] = PostgresSecretStore
+
+    for secret_key in ("not-a-key", "0-AAAA", "12345678-abc"):
+        assert (await api.get(f"/secrets/{secret_key}")).status_code == 404
+        assert (await api.delete(f"/secrets/{secret_key}")).status_code == 404
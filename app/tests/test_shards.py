@@ -0,0 +1,50 @@
+import uuid
+
+import pytest
+
+from database.shards import ShardRing, encode_uuid, format_key, parse_key
+
+
+def test_parse_key_round_trip():
+    value = uuid.uuid4()
+    secret_key = format_key(3, value)
+
+    assert len(encode_uuid(value)) == 22
+    assert parse_key(secret_key) == (3, value)
+
+
+def test_parse_key_accepts_legacy_formats():
+    value = uuid.uuid4()
+
+    assert parse_key(str(value)) == (0, value)
+    assert parse_key(f"5-{value}") == (5, value)
+
+
+@pytest.mark.parametrize(
+    "secret_key", ["not-a-key", "0-AAAA", "12345678-abc", "", "1-" + "!" * 22]
+)
+def test_parse_key_rejects_malformed(secret_key):
+    assert parse_key(secret_key) is None
+
+
+def test_ring_places_keys_on_every_shard():
+    ring = ShardRing([0, 1, 2])
+    keys = [ring.new_key() for _ in range(300)]
+    groups = ShardRing.group(keys)
+
+    assert set(groups) == {0, 1, 2}
+    for shard_id, shard_keys in groups.items():
+        for secret_key in shard_keys:
+            assert parse_key(secret_key)[0] == shard_id
+
+
+def test_ring_keeps_placement_when_shard_added():
+    """Новый шард забирает часть ключей, остальные остаются на своих шардах"""
+    values = [uuid.uuid4().bytes for _ in range(1000)]
+    before = ShardRing([0, 1, 2])
+    after = ShardRing([0, 1, 2, 3])
+
+    moved = [value for value in values if before.place(value) != after.place(value)]
+
+    assert all(after.place(value) == 3 for value in moved)
+    assert len(moved) < len(values) / 2
@@ -0,0 +1,76 @@
+import os
+
+from dependencies.store import get_store
+from main import app
+from services.encryption_service import EncryptionService
+from services.memory_store import MemorySecretStore
+
+
+class Frames:
+    """Итератор фрагментов, который запоминает, что его закрыли"""
+
+    def __init__(self, frames: list[bytes]):
+        self.frames = frames
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed or not self.frames:
+            raise StopAsyncIteration
+        frame = self.frames.pop(0)
+        return frame, not self.frames
+
+    async def aclose(self):
+        self.closed = True
+
+
+class StreamingStore(MemorySecretStore):
+    streaming = True
+
+    def __init__(self, header: bytes, frames: Frames):
+        super().__init__()
+        self.opened = (header, frames)
+
+    async def open_stream(self, secret_key, client):
+        return self.opened
+
+
+def encrypted_stream(chunks: list[bytes]) -> tuple[bytes, Frames]:
+    encryptor = EncryptionService.stream_encryptor()
+    frames = [
+        encryptor.encrypt_chunk(chunk, final=index == len(chunks) - 1)
+        for index, chunk in enumerate(chunks)
+    ]
+    return encryptor.header, Frames(frames)
+
+
+async def test_stream_closed_after_response(api):
+    header, frames = encrypted_stream([b"first ", b"second"])
+    app.dependency_overrides[get_store] = lambda: StreamingStore(header, frames)
+
+    response = await api.get("/secrets/streamed")
+    assert response.content == b"first second"
+    assert frames.closed
+
+
+async def test_stream_closed_when_header_invalid(api):
+    _, frames = encrypted_stream([b"data"])
+    app.dependency_overrides[get_store] = lambda: StreamingStore(b"broken", frames)
+
+    response = await api.get("/secrets/streamed")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Secret cannot be decrypted"}
+    assert frames.closed
+
+
+async def test_stream_with_unknown_key_not_found(api, use_master_keys):
+    use_master_keys({7: os.urandom(32)}, 7)
+    header, frames = encrypted_stream([b"data"])
+    use_master_keys({8: os.urandom(32)}, 8)
+    app.dependency_overrides[get_store] = lambda: StreamingStore(header, frames)
+
+    response = await api.get("/secrets/streamed")
+    assert response.status_code == 404
+    assert frames.closed
@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+from services.timing_wheel import TimingWheel
+
+
+def run(wheel: TimingWheel, until: int, start: int = 1) -> dict:
+    """Сдвигает колесо по тику и возвращает ключ -> момент срабатывания"""
+    fired = {}
+    for now in range(start, until + 1):
+        for key in wheel.advance(now):
+            fired[key] = now
+    return fired
+
+
+def test_fires_at_deadline():
+    wheel = TimingWheel(1.0, 0)
+    wheel.add("a", 5)
+    wheel.add("b", 7.5)
+
+    assert wheel.advance(4) == []
+    assert wheel.advance(5) == ["a"]
+    assert wheel.advance(7) == []
+    assert wheel.advance(8) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_cancel():
+    wheel = TimingWheel(1.0, 0)
+    wheel.add("a", 5)
+
+    assert "a" in wheel
+    assert wheel.cancel("a")
+    assert not wheel.cancel("a")
+    assert "a" not in wheel
+    assert wheel.advance(10) == []
+
+
+def test_readd_reschedules():
+    wheel = TimingWheel(1.0, 0)
+    wheel.add("a", 5)
+    wheel.add("a", 500)
+
+    assert len(wheel) == 1
+    assert run(wheel, 600) == {"a": 500}
+
+
+def test_cascade_between_levels():
+    # Уровни по 4 слота: 0 - тики 0..3, 1 - до 16 тиков вперёд
+    wheel = TimingWheel(1.0, 0, level_bits=(2, 2))
+    for deadline in (3, 4, 6, 13, 15):
+        wheel.add(deadline, deadline)
+
+    assert run(wheel, 20) == {3: 3, 4: 4, 6: 6, 13: 13, 15: 15}
+
+
+def test_overflow_past_top_level():
+    wheel = TimingWheel(1.0, 0, level_bits=(2, 2))
+    wheel.add("far", 100)
+    wheel.add("farther", 257)
+
+    assert run(wheel, 300) == {"far": 100, "farther": 257}
+
+
+def test_past_due_fires_on_next_advance():
+    wheel = TimingWheel(1.0, 100)
+    wheel.add("late", 42)
+
+    assert wheel.advance(100) == ["late"]
+
+
+def test_jump_over_many_ticks():
+    wheel = TimingWheel(0.5, 0, level_bits=(2, 2))
+    wheel.add("a", 3)
+    wheel.add("b", 40)
+
+    assert wheel.advance(39.9) == ["a"]
+    assert wheel.advance(1000) == ["b"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_naive_model(seed):
+    rng = random.Random(seed)
+    wheel = TimingWheel(1.0, 0, level_bits=(3, 2, 2))
+    deadlines = {}
+
+    for now in range(1, 1500):
+        for _ in range(rng.randrange(3)):
+            key = rng.randrange(200)
+            action = rng.random()
+            if action < 0.2 and key in deadlines:
+                wheel.cancel(key)
+                del deadlines[key]
+            elif action >= 0.2:
+                deadline = now + rng.choice([-3, 0, 1, 7, 31, 200, 600]) + rng.random()
+                wheel.add(key, deadline)
+                deadlines[key] = deadline
+
+        for key in wheel.advance(now):
+            # Не раньше срока
+            assert deadlines[key] <= now
+            del deadlines[key]
+
+        # И не позже: всё, что осталось, ещё не наступило
+        assert all(deadline > now for deadline in deadlines.values())
+        assert len(wheel) == len(deadlines)